@@ -0,0 +1,237 @@
+import asyncio
+import hashlib
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from llm_cache import LLMCache, default_cache
+from logging_utils import setup_logger, log_api_call
+
+# Default model for AI interactions
+MODEL = "gpt-4o-mini"
+
+# Completion settings per kind of decision
+MAX_TOKENS = {'word': 10, 'guess': 30}
+TEMPERATURE = {'word': 0.7, 'guess': 0.3}
+
+# Words the rule-based builder cycles through
+RULE_WORDS = ['thing', 'big', 'small', 'very', 'often', 'found', 'used', 'people', 'like',
+              'old', 'new', 'every', 'day', 'home', 'outside', 'good', 'many', 'kind']
+
+logger = setup_logger('ai_backend', 'ai_backend.log')
+
+
+class Decision:
+    """Something an AI player needs decided: its next word or its next guess"""
+
+    __slots__ = ('kind', 'sentence', 'subject', 'last_error', 'wrong_guesses')
+
+    def __init__(self, kind: str, sentence: List[str], subject: Optional[str] = None,
+                 last_error: Optional[str] = None, wrong_guesses: Optional[List[str]] = None):
+        self.kind = kind  # 'word' or 'guess'
+        self.sentence = sentence
+        self.subject = subject  # Only known to word builders
+        self.last_error = last_error
+        # Guesses already made this game. Being part of the prompt, they are
+        # also part of the cache key, so a retry never gets a cached wrong guess
+        self.wrong_guesses = wrong_guesses or []
+
+    def prompt(self) -> str:
+        current_text = ' '.join(self.sentence)
+        error_context = ""
+        if self.last_error:
+            error_context = f"\nPrevious attempt failed: {self.last_error}"
+        if self.kind == 'guess' and self.wrong_guesses:
+            error_context += f"\nThese guesses were wrong, so guess something else: {', '.join(self.wrong_guesses)}"
+
+        if self.kind == 'word':
+            return f"""You are playing a word game. The secret subject is "{self.subject}".
+Current sentence: "{current_text}"
+Generate a single word that would help describe the subject without making it too obvious.
+The word should be a valid English word and contain only letters. Respond with just the word, nothing else.
+Make sure the word is common and simple.{error_context}"""
+        return f"""You are playing a word guessing game. Players are building a sentence to describe a secret subject.
+Current sentence: "{current_text}"
+Based on this sentence, what do you think is the secret subject?
+Your guess can be a single word or multiple words. Respond with just your guess, nothing else.
+The subject could be anything - a common word, a phrase, a name, etc.{error_context}"""
+
+    def params(self) -> dict:
+        return {
+            "model": MODEL,
+            "messages": [{"role": "user", "content": self.prompt()}],
+            "max_tokens": MAX_TOKENS[self.kind],
+            "temperature": TEMPERATURE[self.kind]
+        }
+
+
+class InferenceBackend(ABC):
+    """Turns an AI player's decision into the word or guess to send"""
+
+    name = 'backend'
+
+    @abstractmethod
+    async def decide(self, decision: Decision) -> str:
+        ...
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class ChatBackend(InferenceBackend):
+    """One chat completion per decision, through the completion cache"""
+
+    name = 'chat'
+
+    def __init__(self, llm: Optional[LLMCache] = None):
+        self.llm = llm or default_cache()
+
+    async def decide(self, decision: Decision) -> str:
+        params = decision.params()
+        log_api_call(logger, "POST", "/chat/completions", params)
+        return await self.llm.complete(params)
+
+    def stats(self) -> Dict[str, int]:
+        return self.llm.stats()
+
+
+class BatchingBackend(InferenceBackend):
+    """Collects decisions from every player in the process into batched requests.
+
+    Decisions of the same kind arriving within ``window`` seconds of each
+    other are sent as one numbered prompt, and the model answers with a
+    JSON array. A batch is sent early once it reaches ``max_batch``. If a
+    batched answer can't be parsed, each decision falls back to its own
+    request.
+    """
+
+    name = 'batch'
+
+    def __init__(self, llm: Optional[LLMCache] = None, window: float = 0.05, max_batch: int = 16):
+        self.llm = llm or default_cache()
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[str, List[Tuple[Decision, asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks = set()  # Keep running batches referenced until they finish
+        self.batches = 0
+        self.batched_decisions = 0
+        self.fallbacks = 0
+
+    async def decide(self, decision: Decision) -> str:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(decision.kind, [])
+        pending.append((decision, future))
+        if len(pending) >= self.max_batch:
+            self._flush(decision.kind)
+        elif decision.kind not in self._timers:
+            self._timers[decision.kind] = loop.call_later(self.window, self._flush, decision.kind)
+        return await future
+
+    def _flush(self, kind: str) -> None:
+        timer = self._timers.pop(kind, None)
+        if timer:
+            timer.cancel()
+        batch = self._pending.pop(kind, [])
+        if batch:
+            task = asyncio.create_task(self._run(kind, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, kind: str, batch: List[Tuple[Decision, asyncio.Future]]) -> None:
+        decisions = [decision for decision, _ in batch]
+        if len(batch) == 1:
+            answers = await asyncio.gather(self._single(decisions[0]), return_exceptions=True)
+        else:
+            try:
+                answers = await self._batched(kind, decisions)
+            except Exception as e:
+                logger.warning(f"Batch of {len(batch)} failed ({e}), sending decisions one by one")
+                self.fallbacks += 1
+                answers = await asyncio.gather(*(self._single(d) for d in decisions),
+                                               return_exceptions=True)
+        for (_, future), answer in zip(batch, answers):
+            if future.done():
+                continue
+            if isinstance(answer, Exception):
+                future.set_exception(answer)
+            else:
+                future.set_result(answer)
+
+    async def _single(self, decision: Decision) -> str:
+        params = decision.params()
+        log_api_call(logger, "POST", "/chat/completions", params)
+        return await self.llm.complete(params)
+
+    async def _batched(self, kind: str, decisions: List[Decision]) -> List[str]:
+        tasks = '\n\n'.join(f"Task {i + 1}:\n{d.prompt()}" for i, d in enumerate(decisions))
+        prompt = f"""You are playing several independent rounds of a word game at once.
+Answer each numbered task below on its own, following its instructions.
+Respond with only a JSON array of {len(decisions)} strings, one answer per task, in order.
+
+{tasks}"""
+        params = {
+            "model": MODEL,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": (MAX_TOKENS[kind] + 8) * len(decisions) + 16,
+            "temperature": TEMPERATURE[kind]
+        }
+        log_api_call(logger, "POST", "/chat/completions", params)
+        text = await self.llm.complete(params)
+
+        # Models sometimes wrap the array in a code fence or a sentence
+        answers = json.loads(text[text.find('['):text.rfind(']') + 1])
+        if (not isinstance(answers, list) or len(answers) != len(decisions)
+                or not all(isinstance(a, str) for a in answers)):
+            raise ValueError(f"Expected {len(decisions)} answers, got {text!r}")
+        self.batches += 1
+        self.batched_decisions += len(decisions)
+        return answers
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.llm.stats(), batches=self.batches,
+                    batched_decisions=self.batched_decisions, fallbacks=self.fallbacks)
+
+
+class RuleBasedBackend(InferenceBackend):
+    """Deterministic answers without any model, for tests and load runs.
+
+    Builders pick a stock word from a hash of the game state, so the same
+    state always gives the same word. The guesser guesses the longest word
+    in the sentence.
+    """
+
+    name = 'rules'
+
+    def __init__(self):
+        self.decisions = 0
+
+    async def decide(self, decision: Decision) -> str:
+        self.decisions += 1
+        if decision.kind == 'guess':
+            candidates = [w for w in decision.sentence if w not in decision.wrong_guesses]
+            return max(candidates, key=len, default='thing')
+        state = f"{decision.subject}|{' '.join(decision.sentence)}|{decision.last_error}"
+        n = int.from_bytes(hashlib.blake2b(state.encode('utf-8'), digest_size=4).digest(), 'little')
+        words = [w for w in RULE_WORDS if w != decision.subject]
+        return words[n % len(words)]
+
+    def stats(self) -> Dict[str, int]:
+        return {'decisions': self.decisions}
+
+
+BACKENDS = {
+    'chat': ChatBackend,
+    'batch': BatchingBackend,
+    'rules': RuleBasedBackend
+}
+
+
+def create_backend(name: Optional[str] = None) -> InferenceBackend:
+    """Create a backend by name, defaulting to the ``AI_BACKEND`` environment variable"""
+    name = name or os.environ.get('AI_BACKEND', 'chat')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown AI backend: {name} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
@@ -2,16 +2,14 @@ import socketio
 import asyncio
 import random
 import os
-from openai import AsyncOpenAI
 import sys
 from typing import Optional
-from logging_utils import setup_logger, log_socket_event, log_api_call
-
-# Default model for AI interactions
-MODEL = "gpt-4o-mini"
+from ai_backends import Decision, InferenceBackend, create_backend
+from logging_utils import setup_logger, log_socket_event
 
 class AIPlayer:
-    def __init__(self, name: str, game_code: str, max_retries: int = 3, retry_delay: float = 2.0):
+    def __init__(self, name: str, game_code: str, max_retries: int = 3, retry_delay: float = 2.0,
+                 backend: Optional[InferenceBackend] = None):
         self.name = name
         self.game_code = game_code
         self.logger = setup_logger(f'ai_player_{name}', f'ai_player_{name}.log')
@@ -21,6 +19,9 @@ class AIPlayer:
         self.is_guesser = False
         self.subject = None
         self.current_sentence = []
+        self.wrong_guesses = []  # Our guesses this game, so we don't repeat them
+        self.last_seq = 0  # Sequence number of the last applied game event
+        self.resume_token = None  # Lets us take our seat back after a dropped connection
         self.my_turn = False
         self.connected = False
         self.in_game = False
@@ -28,18 +29,24 @@ class AIPlayer:
         self.retry_delay = retry_delay
         self.last_error = None
         self.game_ended = False
-        self.openai_client = AsyncOpenAI()  # Make sure OPENAI_API_KEY is set in environment
+        self.backend = backend or create_backend()  # Share one backend between players to batch and cache
         self.current_task = None  # Track current async task
 
         # Register event handlers
         self.sio.on('connect', self.on_connect)
         self.sio.on('disconnect', self.on_disconnect)
+        self.sio.on('player_joined', self.on_player_joined)
         self.sio.on('game_started', self.on_game_started)
         self.sio.on('sentence_updated', self.on_sentence_updated)
         self.sio.on('guess_result', self.on_guess_result)
+        self.sio.on('game_snapshot', self.on_game_snapshot)
         self.sio.on('game_ended', self.on_game_ended)
         self.sio.on('error', self.on_error)
         self.sio.on('player_left', self.on_player_left)
+        self.sio.on('turn_passed', self.on_turn_passed)
+        self.sio.on('resume_token', self.on_resume_token)
+        self.sio.on('session_resumed', self.on_session_resumed)
+        self.sio.on('game_expired', self.on_game_expired)
 
     async def connect_and_join(self) -> bool:
         """Connect to the server and join the game with retry logic"""
@@ -51,7 +58,11 @@ class AIPlayer:
                     await self.sio.connect('http://localhost:5000')
                     self.connected = True
                 
-                if not self.in_game:
+                if not self.in_game and self.resume_token:
+                    resume_data = {'token': self.resume_token, 'lastSeq': self.last_seq}
+                    self.logger.info("Resuming our seat in the game")
+                    await self.sio.emit('resume_session', resume_data)
+                elif not self.in_game:
                     join_data = {
                         'gameCode': self.game_code,
                         'playerName': self.name
@@ -85,20 +96,64 @@ class AIPlayer:
             self.logger.info("Attempting to reconnect...")
             asyncio.create_task(self.connect_and_join())
 
-    def on_game_started(self, data):
+    def on_player_joined(self, data):
+        log_socket_event(self.logger, "RECEIVED", "player_joined", data)
+        # player_joined carries the full roster, so it resets our sequence
+        self.last_seq = data['seq']
+        self.in_game = True
+
+    def on_resume_token(self, data):
+        # Not logged, since the token is all it takes to play as us
+        self.resume_token = data['token']
+
+    def on_session_resumed(self, data):
+        log_socket_event(self.logger, "RECEIVED", "session_resumed", data)
+        self.logger.info(f"Resumed game {data['gameCode']}; missed events or a snapshot follow")
+        self.in_game = True
+
+    def accept_seq(self, seq: int) -> bool:
+        """Check an event's sequence number, requesting a snapshot on a gap"""
+        if seq <= self.last_seq:
+            return False
+        if seq != self.last_seq + 1:
+            self.logger.info(f"Missed events {self.last_seq + 1}..{seq - 1}, requesting snapshot")
+            asyncio.create_task(self.sio.emit('request_snapshot', {}))
+            return False
+        self.last_seq = seq
+        return True
+
+    async def on_game_started(self, data):
         log_socket_event(self.logger, "RECEIVED", "game_started", data)
+        self.last_seq = data['seq']
         self.is_guesser = data['isGuesser']
         self.subject = data.get('subject')
+        self.current_sentence = []
+        self.wrong_guesses = []
         self.in_game = True
         self.logger.info(f"Game started. Role: {'Guesser' if self.is_guesser else 'Word Builder'}")
         if not self.is_guesser:
             self.logger.info(f"Subject is: {self.subject}")
+        await self.on_turn_changed(data['currentTurn'])
+
+    async def on_game_snapshot(self, data):
+        log_socket_event(self.logger, "RECEIVED", "game_snapshot", data)
+        if data['seq'] < self.last_seq or data['state'] != 'playing':
+            return
+        self.last_seq = data['seq']
+        self.current_sentence = data['sentence']
+        self.wrong_guesses = [g['guess'] for g in data['guesses']]
+        await self.on_turn_changed(data['currentTurn'])
 
     async def on_sentence_updated(self, data):
         log_socket_event(self.logger, "RECEIVED", "sentence_updated", data)
+        if not self.accept_seq(data['seq']):
+            return
+        # Only the new word is sent, so append it to our copy of the sentence
+        self.current_sentence.append(data['word'])
+        await self.on_turn_changed(data['currentTurn'])
+
+    async def on_turn_changed(self, current_turn: str):
         try:
-            self.current_sentence = data['sentence']
-            current_turn = data['currentTurn']
             self.my_turn = current_turn == self.name
             
             current_text = ' '.join(word_data['word'] for word_data in self.current_sentence)
@@ -131,6 +186,9 @@ class AIPlayer:
 
     async def on_guess_result(self, data):
         log_socket_event(self.logger, "RECEIVED", "guess_result", data)
+        if not self.accept_seq(data['seq']):
+            return
+        self.wrong_guesses.append(data['guess'])
         if not data['correct'] and self.is_guesser:
             self.logger.info("Incorrect guess, trying again after delay")
             await asyncio.sleep(self.retry_delay)
@@ -170,102 +228,88 @@ class AIPlayer:
             self.name = f"{self.name}_{random.randint(1, 999)}"
             self.logger.info(f"Name {old_name} taken, retrying with {self.name}")
             asyncio.create_task(self.connect_and_join())
+        elif "session expired" in error_msg.lower():
+            self.logger.error("Our seat was given up while we were disconnected")
+            self.game_ended = True
+            asyncio.create_task(self.sio.disconnect())
         elif "not your turn" in error_msg.lower():
             self.my_turn = False
+        elif data.get('suggestions') and self.my_turn and not self.is_guesser:
+            # Our word was rejected; the server's closest match costs no inference call
+            word = data['suggestions'][0]
+            self.logger.info(f"Word rejected, using suggestion: {word}")
+            self.last_error = None
+            emit_data = {'word': word}
+            log_socket_event(self.logger, "SENDING", "add_word", emit_data)
+            asyncio.create_task(self.sio.emit('add_word', emit_data))
 
-    def on_player_left(self, data):
+    async def on_player_left(self, data):
         log_socket_event(self.logger, "RECEIVED", "player_left", data)
+        if not self.accept_seq(data['seq']):
+            return
         self.logger.info(f"Player left. Remaining players: {', '.join(data['players'])}")
+        # The turn moves on if it belonged to the player who left
+        if data.get('currentTurn') and (data['currentTurn'] == self.name) != self.my_turn:
+            await self.on_turn_changed(data['currentTurn'])
+
+    async def on_turn_passed(self, data):
+        log_socket_event(self.logger, "RECEIVED", "turn_passed", data)
+        if not self.accept_seq(data['seq']):
+            return
+        self.logger.info(f"{data['player']} ran out of time")
+        await self.on_turn_changed(data['currentTurn'])
+
+    def on_game_expired(self, data):
+        log_socket_event(self.logger, "RECEIVED", "game_expired", data)
+        self.logger.info("Game expired after going idle")
+        self.game_ended = True
+        self.in_game = False
+        if self.current_task and not self.current_task.done():
+            self.current_task.cancel()
+        asyncio.create_task(self.sio.disconnect())
 
     async def add_word(self):
-        """Add a word to the sentence with retry logic for invalid words"""
-        retries = 0
-        while retries < self.max_retries and self.my_turn:
-            try:
-                current_text = ' '.join(word_data['word'] for word_data in self.current_sentence)
-                
-                error_context = ""
-                if self.last_error:
-                    error_context = f"\nPrevious attempt failed: {self.last_error}"
-                
-                prompt = f"""You are playing a word game. The secret subject is "{self.subject}".
-Current sentence: "{current_text}"
-Generate a single word that would help describe the subject without making it too obvious.
-The word should be a valid English word and contain only letters. Respond with just the word, nothing else.
-Make sure the word is common and simple.{error_context}"""
+        """Add a word to the sentence, falling back to a filler word if the backend fails"""
+        if not self.my_turn:
+            return
+        decision = Decision('word', [w['word'] for w in self.current_sentence],
+                            subject=self.subject, last_error=self.last_error)
+        self.logger.info(f"Requesting word from {self.backend.name} backend")
+        try:
+            word = (await self.backend.decide(decision)).strip().lower()
+            self.logger.info(f"Generated word: {word}")
+        except Exception as e:
+            # The shared client has already retried rate limits and server errors
+            self.logger.error(f"Error generating word: {e}")
+            word = random.choice(['the', 'is', 'a', 'an', 'it'])
+            self.logger.info(f"Using fallback word: {word}")
 
-                self.logger.info("Requesting word from OpenAI API")
-                params = {
-                    "model": MODEL,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": 10,
-                    "temperature": 0.7
-                }
-                log_api_call(self.logger, "POST", "/chat/completions", params)
-                response = await self.openai_client.chat.completions.create(**params)
-                word = response.choices[0].message.content.strip().lower()
-                self.logger.info(f"Generated word: {word}")
-                
-                self.last_error = None
-                emit_data = {'word': word}
-                log_socket_event(self.logger, "SENDING", "add_word", emit_data)
-                await self.sio.emit('add_word', emit_data)
-                break
-            except Exception as e:
-                retries += 1
-                self.logger.error(f"Error generating word (attempt {retries}): {e}")
-                if retries < self.max_retries:
-                    await asyncio.sleep(self.retry_delay)
-                else:
-                    fallback_words = ['the', 'is', 'a', 'an', 'it']
-                    fallback_word = random.choice(fallback_words)
-                    self.logger.info(f"Using fallback word: {fallback_word}")
-                    emit_data = {'word': fallback_word}
-                    log_socket_event(self.logger, "SENDING", "add_word", emit_data)
-                    await self.sio.emit('add_word', emit_data)
+        self.last_error = None
+        emit_data = {'word': word}
+        log_socket_event(self.logger, "SENDING", "add_word", emit_data)
+        await self.sio.emit('add_word', emit_data)
 
     async def make_guess(self):
-        """Make a guess with retry logic"""
-        retries = 0
-        while retries < self.max_retries:
-            try:
-                current_text = ' '.join(word_data['word'] for word_data in self.current_sentence)
-                
-                error_context = ""
-                if self.last_error:
-                    error_context = f"\nPrevious attempt failed: {self.last_error}"
-                
-                prompt = f"""You are playing a word guessing game. Players are building a sentence to describe a secret subject.
-Current sentence: "{current_text}"
-Based on this sentence, what do you think is the secret subject?
-Your guess can be a single word or multiple words. Respond with just your guess, nothing else.
-The subject could be anything - a common word, a phrase, a name, etc.{error_context}"""
+        """Make a guess, skipping this chance if the backend fails"""
+        decision = Decision('guess', [w['word'] for w in self.current_sentence],
+                            last_error=self.last_error, wrong_guesses=self.wrong_guesses)
+        self.logger.info(f"Requesting guess from {self.backend.name} backend")
+        try:
+            guess = (await self.backend.decide(decision)).strip().lower()
+        except Exception as e:
+            # The shared client has already retried rate limits and server errors;
+            # the next sentence update gives another chance to guess
+            self.logger.error(f"Error generating guess: {e}")
+            return
+        self.logger.info(f"Generated guess: {guess}")
 
-                self.logger.info("Requesting guess from OpenAI API")
-                params = {
-                    "model": MODEL,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": 30,
-                    "temperature": 0.3
-                }
-                log_api_call(self.logger, "POST", "/chat/completions", params)
-                response = await self.openai_client.chat.completions.create(**params)
-                guess = response.choices[0].message.content.strip().lower()
-                self.logger.info(f"Generated guess: {guess}")
-                
-                self.last_error = None
-                emit_data = {'guess': guess}
-                log_socket_event(self.logger, "SENDING", "make_guess", emit_data)
-                await self.sio.emit('make_guess', emit_data)
-                break
-            except Exception as e:
-                retries += 1
-                self.logger.error(f"Error generating guess (attempt {retries}): {e}")
-                if retries < self.max_retries:
-                    await asyncio.sleep(self.retry_delay)
+        self.last_error = None
+        emit_data = {'guess': guess}
+        log_socket_event(self.logger, "SENDING", "make_guess", emit_data)
+        await self.sio.emit('make_guess', emit_data)
 
-async def run_ai_player(name: str, game_code: str):
-    player = AIPlayer(name, game_code)
+async def run_ai_player(name: str, game_code: str, backend: Optional[InferenceBackend] = None):
+    player = AIPlayer(name, game_code, backend=backend)
     if await player.connect_and_join():
         try:
             # Keep the process running until the game ends
@@ -274,4 +318,5 @@ async def run_ai_player(name: str, game_code: str):
         except KeyboardInterrupt:
             player.logger.info("Received interrupt, disconnecting")
             await player.sio.disconnect()
+        player.logger.info(f"Backend stats: {player.backend.stats()}")
         player.logger.info("AI player process ending")
@@ -0,0 +1,87 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+from typing import Dict
+
+try:
+    import brotli
+except ImportError:  # Brotli variants are optional; `pip install brotli` to build them
+    brotli = None
+
+STATIC_DIR = 'static'
+ASSET_DIR = 'static/dist'
+MANIFEST_NAME = 'manifest.json'
+ASSET_EXTENSIONS = ('.js', '.css')
+
+# Compressing tiny files gains nothing once headers are counted
+MIN_COMPRESS_SIZE = 256
+
+
+def hashed_name(path: str, content: bytes) -> str:
+    """js/main.js -> js/main.<first 12 hex digits of its SHA-256>.js"""
+    root, ext = os.path.splitext(path)
+    return f'{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}'
+
+
+def build(static_dir: str = STATIC_DIR, output_dir: str = ASSET_DIR) -> Dict[str, str]:
+    """Write hashed copies of the assets, with .gz and .br variants, and the manifest"""
+    manifest = {}
+    for dirpath, dirnames, filenames in os.walk(static_dir):
+        # Don't pick up earlier builds
+        dirnames[:] = [d for d in dirnames
+                       if os.path.normpath(os.path.join(dirpath, d)) != os.path.normpath(output_dir)]
+        for filename in sorted(filenames):
+            if not filename.endswith(ASSET_EXTENSIONS):
+                continue
+            source = os.path.join(dirpath, filename)
+            path = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                content = f.read()
+            name = hashed_name(path, content)
+            manifest[path] = name
+
+            target = os.path.join(output_dir, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(content)
+            if len(content) >= MIN_COMPRESS_SIZE:
+                # mtime=0 keeps the output identical across builds
+                with open(f'{target}.gz', 'wb') as f:
+                    f.write(gzip.compress(content, compresslevel=9, mtime=0))
+                if brotli:
+                    with open(f'{target}.br', 'wb') as f:
+                        f.write(brotli.compress(content, quality=11))
+
+    # Written last and swapped in, so a server never reads a manifest whose
+    # files aren't there yet
+    tmp_path = os.path.join(output_dir, f'{MANIFEST_NAME}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(output_dir, MANIFEST_NAME))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build content-hashed, precompressed static assets')
+    parser.add_argument('--static', default=STATIC_DIR, help=f'Source directory (default: {STATIC_DIR})')
+    parser.add_argument('-o', '--output', default=ASSET_DIR, help=f'Output directory (default: {ASSET_DIR})')
+    parser.add_argument('--clean', action='store_true',
+                        help='Remove earlier builds first (pages already served may still link to them)')
+    args = parser.parse_args()
+
+    if args.clean and os.path.isdir(args.output):
+        shutil.rmtree(args.output)
+    os.makedirs(args.output, exist_ok=True)
+    manifest = build(args.static, args.output)
+    for path, name in sorted(manifest.items()):
+        print(f"{path} -> {name}", file=sys.stderr)
+    if not brotli:
+        print("brotli is not installed, so only gzip variants were written", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
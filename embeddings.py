@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from typing import List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Closeness feedback is optional; `pip install numpy` to enable it
+    np = None
+
+from word_index import INDEX_PATH as WORD_INDEX_PATH, WordIndex
+
+EMBEDDINGS_PATH = 'data/embeddings.npy'
+EMBEDDING_MODEL = 'text-embedding-3-small'
+DIMENSIONS = 256
+BATCH_SIZE = 1000
+
+WORD_PATTERN = re.compile(r'[a-z]+')
+
+
+def meta_path(path: str) -> str:
+    """Sidecar recording which word index and model a table was built from"""
+    return os.path.splitext(path)[0] + '.json'
+
+
+class EmbeddingTable:
+    """Unit-length embeddings for every target and dictionary word.
+
+    Rows are the targets in targets-file order, then the words in word
+    index order, so no vocabulary is stored alongside. The matrix is opened
+    with ``mmap_mode='r'``, so every worker shares the same pages and
+    nothing is copied at startup. A guess that isn't a target is the mean
+    of its dictionary words' vectors.
+    """
+
+    def __init__(self, words: WordIndex, path: str = EMBEDDINGS_PATH):
+        with open(meta_path(path)) as f:
+            meta = json.load(f)
+        if meta['fingerprint'] != words.fingerprint():
+            raise ValueError(f"{path} was built from a different word index")
+        self.words = words
+        self.matrix = np.load(path, mmap_mode='r')
+        if self.matrix.shape[0] != words.target_count + len(words):
+            raise ValueError(f"{path} has {self.matrix.shape[0]} rows, expected "
+                             f"{words.target_count + len(words)}")
+        self._target_rows = {target.lower(): i for i, target in enumerate(words.targets())}
+        self._word_rows = self.matrix[words.target_count:]
+
+    def vector(self, text: str) -> Optional['np.ndarray']:
+        text = text.strip().lower()
+        row = self._target_rows.get(text)
+        if row is not None:
+            return self.matrix[row]
+        positions = [self.words.find(word) for word in WORD_PATTERN.findall(text)]
+        rows = [self.words.target_count + p for p in positions if p >= 0]
+        if not rows:
+            return None
+        vector = self.matrix[rows].mean(axis=0)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def closeness(self, subject: str, guess: str) -> Optional[Tuple[float, int]]:
+        """Cosine similarity of a guess to the subject, and its rank among
+        all dictionary words by the same measure (1 is the closest)"""
+        target = self.vector(subject)
+        guessed = self.vector(guess)
+        if target is None or guessed is None:
+            return None
+        similarity = float(guessed @ target)
+        # One pass over the table: how many words are closer than the guess
+        rank = int(np.count_nonzero(self._word_rows @ target > similarity)) + 1
+        return similarity, rank
+
+
+def load(words: WordIndex, path: str = EMBEDDINGS_PATH, logger=None) -> Optional[EmbeddingTable]:
+    """Open the table, or None (with a warning) if numpy or the table is missing"""
+    if np is None:
+        reason = "numpy is not installed"
+    elif not os.path.exists(path):
+        reason = f"{path} not found, build it with embeddings.py"
+    else:
+        try:
+            return EmbeddingTable(words, path)
+        except (OSError, ValueError, KeyError) as e:
+            reason = str(e)
+    if logger:
+        logger.warning(f"Guess closeness disabled: {reason}")
+    return None
+
+
+def build_table(words: WordIndex, output_path: str = EMBEDDINGS_PATH, model: str = EMBEDDING_MODEL,
+                dimensions: int = DIMENSIONS, batch_size: int = BATCH_SIZE) -> None:
+    """Embed every target and word with the OpenAI API and write the table"""
+    from openai import OpenAI
+    client = OpenAI(max_retries=5)
+
+    texts: List[str] = list(words.targets()) + [words.word(i) for i in range(len(words))]
+    # Written straight into a memory-mapped .npy, then swapped in, so
+    # concurrent readers never see a partial table
+    tmp_path = f'{output_path}.{os.getpid()}.tmp.npy'
+    matrix = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                       shape=(len(texts), dimensions))
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        response = client.embeddings.create(model=model, input=batch, dimensions=dimensions)
+        rows = np.array([item.embedding for item in response.data], dtype=np.float32)
+        matrix[start:start + len(batch)] = rows / np.linalg.norm(rows, axis=1, keepdims=True)
+        print(f"Embedded {start + len(batch)}/{len(texts)}", file=sys.stderr)
+    matrix.flush()
+    del matrix
+    os.replace(tmp_path, output_path)
+    with open(meta_path(output_path), 'w') as f:
+        json.dump({'fingerprint': words.fingerprint(), 'model': model, 'dimensions': dimensions,
+                   'targets': words.target_count, 'words': len(words)}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the embedding table for guess closeness feedback')
+    parser.add_argument('--words', default=WORD_INDEX_PATH,
+                        help=f'Compiled word index (default: {WORD_INDEX_PATH})')
+    parser.add_argument('-o', '--output', default=EMBEDDINGS_PATH,
+                        help=f'Output table (default: {EMBEDDINGS_PATH})')
+    parser.add_argument('--model', default=EMBEDDING_MODEL, help=f'Embedding model (default: {EMBEDDING_MODEL})')
+    parser.add_argument('--dimensions', type=int, default=DIMENSIONS,
+                        help=f'Vector size (default: {DIMENSIONS})')
+    args = parser.parse_args()
+    if np is None:
+        parser.error("numpy is required: pip install numpy")
+
+    start = time.perf_counter()
+    build_table(WordIndex(args.words), args.output, args.model, args.dimensions)
+    print(f"Wrote {args.output}: {os.path.getsize(args.output)} bytes in "
+          f"{time.perf_counter() - start:.0f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
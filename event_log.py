@@ -0,0 +1,41 @@
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+DEFAULT_SIZE = 64
+
+
+class EventLog:
+    """The last few sequenced events broadcast to each game's room.
+
+    Lets a player who reconnects get just the events they missed. Only
+    events sent identically to the whole room are kept; when the missed
+    range isn't fully covered (too many missed, per-player events in
+    between, or another process sent them) the caller sends a snapshot.
+    """
+
+    def __init__(self, size: int = DEFAULT_SIZE):
+        self.size = size
+        self._events: Dict[str, Deque[Tuple[int, str, dict]]] = {}
+        self._lock = threading.Lock()
+
+    def append(self, code: str, seq: int, event: str, data: dict) -> None:
+        with self._lock:
+            events = self._events.get(code)
+            if events is None:
+                events = self._events[code] = deque(maxlen=self.size)
+            events.append((seq, event, data))
+
+    def since(self, code: str, seq: int, current_seq: int) -> Optional[List[Tuple[str, dict]]]:
+        """Events after ``seq`` up to ``current_seq``, or None if some are missing"""
+        if seq >= current_seq:
+            return []
+        with self._lock:
+            missed = [(s, event, data) for s, event, data in self._events.get(code, ()) if s > seq]
+        if len(missed) != current_seq - seq or missed[0][0] != seq + 1:
+            return None
+        return [(event, data) for _, event, data in missed]
+
+    def drop(self, code: str) -> None:
+        with self._lock:
+            self._events.pop(code, None)
@@ -0,0 +1,73 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterator
+
+
+class Actor:
+    """Runs the messages sent to one key one at a time, in arrival order.
+
+    Each caller takes a ticket, which is its place in the actor's inbox,
+    and runs its own message once every earlier ticket is done. Running on
+    the caller's thread or greenlet rather than a dedicated one keeps
+    Flask-SocketIO's request context, so handlers can still reply with
+    ``emit``.
+    """
+
+    __slots__ = ('users', '_cond', '_next_ticket', '_serving')
+
+    def __init__(self):
+        self.users = 0  # Messages queued or running; guarded by the registry
+        self._cond = threading.Condition(threading.Lock())
+        self._next_ticket = 0
+        self._serving = 0
+
+    @contextmanager
+    def turn(self) -> Iterator[None]:
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while ticket != self._serving:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._serving += 1
+                self._cond.notify_all()
+
+
+class ActorRegistry:
+    """Actors by key, created on first use and dropped when idle.
+
+    The registry lock is only held to look up or count an actor, never
+    while a message runs, so different keys run fully in parallel. As an
+    actor only exists while it has messages, the registry stays as small as
+    the number of keys in use at that moment.
+    """
+
+    def __init__(self):
+        self._actors: Dict[Hashable, Actor] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._actors)
+
+    @contextmanager
+    def acting_for(self, key: Hashable) -> Iterator[None]:
+        """Wait for ``key``'s earlier messages, then run the body as the next one"""
+        if key is None:
+            yield
+            return
+        with self._lock:
+            actor = self._actors.get(key)
+            if actor is None:
+                actor = self._actors[key] = Actor()
+            actor.users += 1
+        try:
+            with actor.turn():
+                yield
+        finally:
+            with self._lock:
+                actor.users -= 1
+                if not actor.users:
+                    del self._actors[key]
@@ -0,0 +1,93 @@
+import hashlib
+import secrets
+
+from game_store import GameStore
+
+# No 0/O or 1/I, so codes are easy to read out and type
+DEFAULT_ALPHABET = '23456789ABCDEFGHJKLMNPQRSTUVWXYZ'
+DEFAULT_LENGTH = 5
+FEISTEL_ROUNDS = 4
+# Random codes tried once the counter and the released codes have run out
+RANDOM_CODE_TRIES = 20
+
+
+class CodeAllocator:
+    """Hands out unique game codes in O(1).
+
+    A shared counter is passed through a keyed permutation of the code
+    space, so consecutive games get unrelated codes but no code repeats
+    until the whole space has been used. After that, codes released by
+    deleted games are reused, oldest first. The counter, the released codes
+    and the permutation key all live in the game store, so workers sharing a
+    store never hand out the same code.
+
+    Codes are only released once this process has seen the counter run out;
+    until then the counter can't reach them again, so keeping them would
+    just grow the pool. Codes freed before that are found again by trying
+    random codes when the pool is empty.
+    """
+
+    def __init__(self, store: GameStore, length: int = DEFAULT_LENGTH,
+                 alphabet: str = DEFAULT_ALPHABET):
+        if len(set(alphabet)) != len(alphabet) or len(alphabet) < 2:
+            raise ValueError("Game code alphabet needs at least 2 distinct characters")
+        self.store = store
+        self.length = length
+        self.alphabet = alphabet
+        self.space = len(alphabet) ** length
+        self._case_insensitive = alphabet.upper() == alphabet
+        self._half_bits = ((self.space - 1).bit_length() + 1) // 2
+        self._mask = (1 << self._half_bits) - 1
+        self._key = bytes.fromhex(store.setting('game_code_key', secrets.token_hex(16)))
+        self.exhausted = False
+
+    def allocate(self) -> str:
+        if not self.exhausted:
+            n = self.store.next_code_number()
+            if n < self.space:
+                return self._encode(self._permute(n))
+            self.exhausted = True
+        # A released code may have been picked at random since, so check
+        # every code against the live games
+        while (code := self.store.pop_released_code()) is not None:
+            if self.store.get(code) is None:
+                return code
+        for _ in range(RANDOM_CODE_TRIES):
+            code = self._encode(secrets.randbelow(self.space))
+            if self.store.get(code) is None:
+                return code
+        raise RuntimeError("No game codes left")
+
+    def release(self, code: str) -> None:
+        """Let a deleted game's code be handed out again"""
+        if self.exhausted:
+            self.store.release_code(code)
+
+    def normalize(self, code) -> str:
+        """Clean up a code typed in by a player"""
+        code = str(code or '').strip()
+        return code.upper() if self._case_insensitive else code
+
+    def _encode(self, n: int) -> str:
+        chars = []
+        for _ in range(self.length):
+            n, digit = divmod(n, len(self.alphabet))
+            chars.append(self.alphabet[digit])
+        return ''.join(reversed(chars))
+
+    def _permute(self, n: int) -> int:
+        # The Feistel network permutes a power-of-two domain at least as big
+        # as the code space; walking the cycle until we land back inside the
+        # code space keeps the mapping a bijection on [0, space)
+        while True:
+            n = self._feistel(n)
+            if n < self.space:
+                return n
+
+    def _feistel(self, n: int) -> int:
+        left, right = n >> self._half_bits, n & self._mask
+        for round_number in range(FEISTEL_ROUNDS):
+            digest = hashlib.blake2b(right.to_bytes(8, 'little') + bytes([round_number]),
+                                     key=self._key, digest_size=8).digest()
+            left, right = right, left ^ (int.from_bytes(digest, 'little') & self._mask)
+        return (left << self._half_bits) | right
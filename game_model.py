@@ -0,0 +1,297 @@
+import secrets
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+# Pastel colors for players
+PLAYER_COLORS = [
+    '#FFB3BA',  # pastel pink
+    '#BAFFC9',  # pastel green
+    '#BAE1FF',  # pastel blue
+    '#FFFFBA',  # pastel yellow
+    '#FFB3FF',  # pastel purple
+    '#FFD9BA',  # pastel orange
+]
+
+# Colours would repeat beyond this
+MAX_PLAYERS = len(PLAYER_COLORS)
+
+STARTING_SCORE = 10
+FREE_WORDS = 3  # Words that can be added before the score starts dropping
+WORD_PENALTY = 1
+WRONG_GUESS_PENALTY = 2
+
+
+class Player:
+    """A player seated in a game"""
+    __slots__ = ('sid', 'name', 'color', 'is_host', 'token', 'disconnected_at')
+
+    def __init__(self, sid: str, name: str, color: str, is_host: bool = False,
+                 token: Optional[str] = None, disconnected_at: Optional[float] = None):
+        self.sid = sid
+        self.name = name
+        self.color = color
+        self.is_host = is_host
+        self.token = token or secrets.token_urlsafe(16)  # Lets the player resume after a dropped connection
+        self.disconnected_at = disconnected_at  # Set while their seat is held for them
+
+
+class Game:
+    """State of a single game, with O(1) player lookup by SID"""
+    __slots__ = ('code', 'public', 'players', 'by_sid', 'by_name', 'by_token', 'guesser', 'turn',
+                 'subject', 'state', 'sentence', 'guesses', 'score', 'seq',
+                 'started_at', 'last_activity', 'turn_started', 'spectators', 'spectated_words',
+                 'spectated_guesses', 'spectated_at', 'spectator_update_at', '_roster')
+
+    def __init__(self, code: str, public: bool = False):
+        self.code = code
+        self.public = public  # Listed in the lobby for anyone to join
+        self.players: List[Player] = []  # Seating order, which is also turn order
+        self.by_sid: Dict[str, Player] = {}
+        self.by_name: Dict[str, Player] = {}
+        self.by_token: Dict[str, Player] = {}
+        self.guesser: Optional[Player] = None
+        self.turn: Optional[Player] = None  # Player whose turn it is to add a word
+        self.subject: Optional[str] = None
+        self.state = 'waiting'
+        self.sentence: List[dict] = []
+        self.guesses: List[dict] = []
+        self.score = STARTING_SCORE
+        self.seq = 0  # Sequence number of the last event broadcast to the room
+        self.started_at: Optional[float] = None
+        self.last_activity = time.time()  # Last join, start, word or guess
+        self.turn_started = self.last_activity  # When the current turn began
+        self.spectators = 0  # Clients watching, on any server process
+        # Words and guesses already sent to spectators, when they were sent,
+        # and when the next update is due (None if nothing is waiting)
+        self.spectated_words = 0
+        self.spectated_guesses = 0
+        self.spectated_at = 0.0
+        self.spectator_update_at: Optional[float] = None
+        self._roster: Optional[List[dict]] = None
+
+    def get_player(self, sid: str) -> Optional[Player]:
+        return self.by_sid.get(sid)
+
+    def add_player(self, sid: str, name: str) -> Player:
+        """Seat a new player, making the first one the host"""
+        # Assign next available color
+        color = PLAYER_COLORS[len(self.players) % len(PLAYER_COLORS)]
+        player = Player(sid, name, color, is_host=not self.players)
+        self.players.append(player)
+        self.by_sid[sid] = player
+        self.by_name[name] = player
+        self.by_token[player.token] = player
+        self._roster = None
+        self.last_activity = time.time()
+        return player
+
+    def open_slots(self) -> int:
+        """Seats a lobby player could take: none unless listed and waiting"""
+        if not self.public or self.state != 'waiting':
+            return 0
+        return max(MAX_PLAYERS - len(self.players), 0)
+
+    def lobby_entry(self) -> dict:
+        """How the game is listed in the lobby"""
+        return {
+            'gameCode': self.code,
+            'host': next((p.name for p in self.players if p.is_host), None),
+            'players': len(self.players),
+            'openSlots': self.open_slots()
+        }
+
+    def hold_seat(self, player: Player) -> None:
+        """Keep a disconnected player's seat until they resume or time out"""
+        del self.by_sid[player.sid]
+        player.disconnected_at = time.time()
+
+    def resume(self, player: Player, sid: str) -> None:
+        """Seat a player again under their new connection"""
+        self.by_sid.pop(player.sid, None)
+        player.sid = sid
+        player.disconnected_at = None
+        self.by_sid[sid] = player
+
+    def remove_player(self, player: Player) -> None:
+        """Remove a player, passing the turn on if it was theirs"""
+        self.by_sid.pop(player.sid, None)
+        if player is self.turn:
+            self.advance_turn(leaving=True)
+        if player is self.turn:
+            # Nobody else is left to take the turn
+            self.turn = None
+        if player is self.guesser:
+            self.guesser = None
+        self.players.remove(player)
+        del self.by_name[player.name]
+        del self.by_token[player.token]
+        self._roster = None
+
+    def start(self, subject: str, guesser: Player) -> None:
+        """Start the game, giving the first turn to the player after the guesser"""
+        self.state = 'playing'
+        self.subject = subject
+        self.guesser = guesser
+        self.turn = guesser
+        self.advance_turn()
+        self._roster = None
+        self.started_at = self.last_activity = time.time()
+
+    def advance_turn(self, leaving: bool = False) -> None:
+        """Pass the turn to the next player, skipping the guesser and, unless
+        nobody else is left, players whose seats are being held. The turn
+        stays with its player if nobody else can take it, unless they are
+        ``leaving``."""
+        index = self.players.index(self.turn)
+        builders = [self.players[(index + offset) % len(self.players)]
+                    for offset in range(1, len(self.players) + (0 if leaving else 1))]
+        builders = [p for p in builders if p is not self.guesser]
+        if not builders:
+            return
+        self.turn = next((p for p in builders if p.disconnected_at is None), builders[0])
+        self.turn_started = time.time()
+
+    def add_word(self, player: Player, word: str) -> dict:
+        """Append a word to the sentence and move on to the next turn"""
+        word_data = {
+            'word': word,
+            'color': player.color,
+            'player': player.name
+        }
+        self.sentence.append(word_data)
+        self.last_activity = time.time()
+
+        # Apply score penalty once the free words have been used up
+        if len(self.sentence) > FREE_WORDS:
+            self.score -= WORD_PENALTY
+
+        self.advance_turn()
+        return word_data
+
+    def add_guess(self, player: Player, guess: str) -> Tuple[dict, bool]:
+        """Record a guess, finishing the game if it matches the subject"""
+        guess_data = {
+            'guess': guess,
+            'player': player.name,
+            'color': player.color,
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }
+        self.guesses.append(guess_data)
+        self.last_activity = time.time()
+
+        # Only check if the guess matches the subject
+        correct = guess == self.subject.lower()
+        if correct:
+            self.state = 'finished'
+        else:
+            self.score -= WRONG_GUESS_PENALTY
+        return guess_data, correct
+
+    def next_seq(self) -> int:
+        """Advance and return the event sequence number"""
+        self.seq += 1
+        return self.seq
+
+    def roster(self) -> List[dict]:
+        """Serialized player list, cached until the players or roles change"""
+        if self._roster is None:
+            self._roster = [{
+                'name': p.name,
+                'color': p.color,
+                'isGuesser': p is self.guesser,
+                'isHost': p.is_host
+            } for p in self.players]
+        return self._roster
+
+    def snapshot_for(self, sid: str) -> dict:
+        """Full game state as seen by the player with the given SID"""
+        is_guesser = self.guesser is not None and self.guesser.sid == sid
+        return {
+            'seq': self.seq,
+            'gameCode': self.code,
+            'state': self.state,
+            'isGuesser': is_guesser,
+            'subject': None if is_guesser else self.subject,
+            'sentence': self.sentence,
+            'guesses': self.guesses,
+            'currentTurn': self.turn.name if self.turn else None,
+            'score': self.score,
+            'players': self.roster()
+        }
+
+    def _spectator_view(self, words_from: int, guesses_from: int) -> dict:
+        # Only what every player can see: never the subject
+        return {
+            'gameCode': self.code,
+            'state': self.state,
+            'sentenceFrom': words_from,
+            'sentence': self.sentence[words_from:],
+            'guessesFrom': guesses_from,
+            'guesses': self.guesses[guesses_from:],
+            'currentTurn': self.turn.name if self.turn else None,
+            'score': self.score,
+            'players': self.roster()
+        }
+
+    def spectator_snapshot(self) -> dict:
+        """Full game state as seen by spectators"""
+        return self._spectator_view(0, 0)
+
+    def spectator_update(self) -> dict:
+        """Everything that changed since the last spectator update, which this now is"""
+        update = self._spectator_view(self.spectated_words, self.spectated_guesses)
+        self.spectated_words = len(self.sentence)
+        self.spectated_guesses = len(self.guesses)
+        self.spectated_at = time.time()
+        self.spectator_update_at = None
+        return update
+
+    def to_dict(self) -> dict:
+        """Plain representation for storing the game outside this process"""
+        return {
+            'code': self.code,
+            'public': self.public,
+            'players': [[p.sid, p.name, p.color, p.is_host, p.token, p.disconnected_at]
+                        for p in self.players],
+            'guesser': self.players.index(self.guesser) if self.guesser else None,
+            'turn': self.players.index(self.turn) if self.turn else None,
+            'subject': self.subject,
+            'state': self.state,
+            'sentence': self.sentence,
+            'guesses': self.guesses,
+            'score': self.score,
+            'seq': self.seq,
+            'started_at': self.started_at,
+            'last_activity': self.last_activity,
+            'turn_started': self.turn_started,
+            'spectators': [self.spectators, self.spectated_words, self.spectated_guesses,
+                           self.spectated_at, self.spectator_update_at]
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Game':
+        game = cls(data['code'], data['public'])
+        for sid, name, color, is_host, token, disconnected_at in data['players']:
+            player = Player(sid, name, color, is_host, token, disconnected_at)
+            game.players.append(player)
+            if disconnected_at is None:
+                game.by_sid[sid] = player
+            game.by_name[name] = player
+            game.by_token[token] = player
+        if data['guesser'] is not None:
+            game.guesser = game.players[data['guesser']]
+        if data['turn'] is not None:
+            game.turn = game.players[data['turn']]
+        game.subject = data['subject']
+        game.state = data['state']
+        game.sentence = data['sentence']
+        game.guesses = data['guesses']
+        game.score = data['score']
+        game.seq = data['seq']
+        game.started_at = data['started_at']
+        game.last_activity = data['last_activity']
+        game.turn_started = data['turn_started']
+        (game.spectators, game.spectated_words, game.spectated_guesses,
+         game.spectated_at, game.spectator_update_at) = data['spectators']
+        return game
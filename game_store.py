@@ -0,0 +1,467 @@
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from game_model import MAX_PLAYERS, Game
+
+# A player waiting for a game: SID, name and wire encoding
+QueuedPlayer = Tuple[str, str, str]
+
+
+class GameStore(ABC):
+    """Where games, the SID → game code map and connected users live,
+    along with the lobby's index of open games and the matchmaking queue.
+
+    Handlers run every read-modify-write inside ``transaction()``, already
+    as their game's actor, so a transaction only has to keep other server
+    processes out. Games returned by ``get`` may be copies, so changes must
+    be written back with ``save`` before the transaction ends.
+    """
+
+    @contextmanager
+    @abstractmethod
+    def transaction(self) -> Iterator[None]:
+        ...
+
+    @abstractmethod
+    def get(self, code: str) -> Optional[Game]:
+        ...
+
+    @abstractmethod
+    def add(self, game: Game) -> bool:
+        """Store a new game; returns False if the code is already taken"""
+
+    @abstractmethod
+    def save(self, game: Game) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, code: str) -> None:
+        ...
+
+    @abstractmethod
+    def game_code_for(self, sid: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def bind(self, sid: str, code: str) -> None:
+        """Record that a player is in a game and mark them connected"""
+
+    @abstractmethod
+    def unbind(self, sid: str) -> None:
+        """Forget a player's game and connection"""
+
+    @abstractmethod
+    def connected_count(self) -> int:
+        ...
+
+    @abstractmethod
+    def count_by_state(self) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def setting(self, name: str, default: str) -> str:
+        """Get a shared setting, storing ``default`` if it isn't set yet"""
+
+    @abstractmethod
+    def next_code_number(self) -> int:
+        """Atomically take the next value of the game code counter"""
+
+    @abstractmethod
+    def release_code(self, code: str) -> None:
+        """Add a game code to the end of the reuse pool"""
+
+    @abstractmethod
+    def pop_released_code(self) -> Optional[str]:
+        """Take the longest-released game code, if any"""
+
+    @abstractmethod
+    def best_open_game(self) -> Optional[str]:
+        """The listed game with the fewest open slots, longest waiting first"""
+
+    @abstractmethod
+    def open_games(self, limit: int) -> List[str]:
+        """Up to ``limit`` listed games, best first"""
+
+    @abstractmethod
+    def open_game_count(self) -> int:
+        ...
+
+    @abstractmethod
+    def enqueue_player(self, player: QueuedPlayer) -> int:
+        """Add a player to the matchmaking queue; returns how many are waiting"""
+
+    @abstractmethod
+    def dequeue_players(self, most: int, least: int = 1) -> List[QueuedPlayer]:
+        """Take up to ``most`` of the longest-waiting players, or nobody if
+        fewer than ``least`` are waiting"""
+
+    @abstractmethod
+    def remove_queued(self, sid: str) -> None:
+        ...
+
+    @abstractmethod
+    def queued_count(self) -> int:
+        ...
+
+
+class MemoryStore(GameStore):
+    """Keeps everything in this process's dicts.
+
+    Listed games are kept in buckets by open slots, so finding the best one
+    looks at no more than MAX_PLAYERS buckets however many games are open.
+    """
+
+    def __init__(self):
+        self.games: Dict[str, Game] = {}  # Store game states
+        self.players: Dict[str, str] = {}  # Map player SIDs to game codes
+        self.connected_users: Set[str] = set()  # Track connected user session IDs
+        self.settings: Dict[str, str] = {}
+        self.code_counter = 0
+        self.released_codes: deque = deque()
+        # Open slots → listed game codes, in the order they got that many
+        self.open_slots: Dict[int, Dict[str, None]] = {}
+        self.listed: Dict[str, int] = {}  # Listed game code → its open slots
+        self.queue: Dict[str, QueuedPlayer] = {}  # By SID, in arrival order
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        # Each game's events already run one at a time, and the shared maps
+        # are only touched by the short locked or atomic operations below,
+        # so games don't need to wait on each other here
+        yield
+
+    def get(self, code: str) -> Optional[Game]:
+        return self.games.get(code)
+
+    def add(self, game: Game) -> bool:
+        with self._lock:
+            if game.code in self.games:
+                return False
+            self.games[game.code] = game
+            self._list(game.code, game.open_slots())
+            return True
+
+    def save(self, game: Game) -> None:
+        # Games are live objects, so only the lobby index needs updating
+        self._list(game.code, game.open_slots())
+
+    def delete(self, code: str) -> None:
+        if self.games.pop(code, None) is not None:
+            self._list(code, 0)
+
+    def _list(self, code: str, slots: int) -> None:
+        """Move a game to the bucket for its open slots (none to unlist it)"""
+        with self._lock:
+            listed = self.listed.get(code, 0)
+            if listed == slots:
+                return
+            if listed:
+                del self.open_slots[listed][code]
+                del self.listed[code]
+            if slots:
+                self.open_slots.setdefault(slots, {})[code] = None
+                self.listed[code] = slots
+
+    def game_code_for(self, sid: str) -> Optional[str]:
+        return self.players.get(sid)
+
+    def bind(self, sid: str, code: str) -> None:
+        self.players[sid] = code
+        self.connected_users.add(sid)
+
+    def unbind(self, sid: str) -> None:
+        self.players.pop(sid, None)
+        self.connected_users.discard(sid)
+
+    def connected_count(self) -> int:
+        return len(self.connected_users)
+
+    def count_by_state(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for game in list(self.games.values()):
+            counts[game.state] = counts.get(game.state, 0) + 1
+        return counts
+
+    def setting(self, name: str, default: str) -> str:
+        return self.settings.setdefault(name, default)
+
+    def next_code_number(self) -> int:
+        with self._lock:
+            n = self.code_counter
+            self.code_counter += 1
+            return n
+
+    def release_code(self, code: str) -> None:
+        self.released_codes.append(code)
+
+    def pop_released_code(self) -> Optional[str]:
+        try:
+            return self.released_codes.popleft()
+        except IndexError:
+            return None
+
+    def best_open_game(self) -> Optional[str]:
+        best = self.open_games(1)
+        return best[0] if best else None
+
+    def open_games(self, limit: int) -> List[str]:
+        codes: List[str] = []
+        with self._lock:
+            for slots in range(1, MAX_PLAYERS + 1):
+                codes.extend(islice(self.open_slots.get(slots, ()), limit - len(codes)))
+                if len(codes) >= limit:
+                    break
+        return codes
+
+    def open_game_count(self) -> int:
+        return len(self.listed)
+
+    def enqueue_player(self, player: QueuedPlayer) -> int:
+        with self._lock:
+            self.queue.setdefault(player[0], player)
+            return len(self.queue)
+
+    def dequeue_players(self, most: int, least: int = 1) -> List[QueuedPlayer]:
+        with self._lock:
+            if len(self.queue) < least:
+                return []
+            players = list(islice(self.queue.values(), most))
+            for sid, _, _ in players:
+                del self.queue[sid]
+            return players
+
+    def remove_queued(self, sid: str) -> None:
+        with self._lock:
+            self.queue.pop(sid, None)
+
+    def queued_count(self) -> int:
+        return len(self.queue)
+
+
+class SQLiteStore(GameStore):
+    """Keeps everything in a SQLite database shared by every server process.
+
+    Transactions take the database write lock up front (BEGIN IMMEDIATE),
+    so read-modify-write cycles from different processes never interleave.
+    Each thread (or green thread) has its own connection, and nothing else
+    is locked while a transaction runs. Waiting for another writer sleeps
+    in Python rather than in SQLite's busy handler, which under eventlet or
+    gevent would block the very green thread holding the write lock.
+    """
+
+    def __init__(self, path: str, timeout: float = 10.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        conn = self._conn()
+        with self._lock:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS games (
+                    code TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS players (
+                    sid TEXT PRIMARY KEY,
+                    code TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS settings (
+                    name TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS released_codes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    code TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS open_games (
+                    code TEXT PRIMARY KEY,
+                    open_slots INTEGER NOT NULL,
+                    listed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS open_games_best ON open_games (open_slots, listed_at);
+                CREATE TABLE IF NOT EXISTS match_queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sid TEXT NOT NULL UNIQUE,
+                    name TEXT NOT NULL,
+                    encoding TEXT NOT NULL
+                );
+            ''')
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            with self._lock:
+                conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+                conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _begin(self, conn: sqlite3.Connection) -> None:
+        """BEGIN IMMEDIATE, sleeping between tries while another connection writes"""
+        conn.execute('PRAGMA busy_timeout = 0')
+        try:
+            deadline = time.monotonic() + self.timeout
+            delay = 0.001
+            while True:
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                    return
+                except sqlite3.OperationalError as e:
+                    if 'locked' not in str(e) or time.monotonic() >= deadline:
+                        raise
+                time.sleep(delay)
+                delay = min(delay * 2, 0.05)
+        finally:
+            conn.execute(f'PRAGMA busy_timeout = {int(self.timeout * 1000)}')
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        conn = self._conn()
+        if conn.in_transaction:
+            # Nested transaction; the outermost one commits
+            yield
+            return
+        self._begin(conn)
+        try:
+            yield
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def get(self, code: str) -> Optional[Game]:
+        row = self._conn().execute('SELECT data FROM games WHERE code = ?', (code,)).fetchone()
+        return Game.from_dict(json.loads(row[0])) if row else None
+
+    def add(self, game: Game) -> bool:
+        with self.transaction():
+            cursor = self._conn().execute(
+                'INSERT OR IGNORE INTO games (code, state, data) VALUES (?, ?, ?)',
+                (game.code, game.state, json.dumps(game.to_dict())))
+            if cursor.rowcount != 1:
+                return False
+            self._list(game)
+            return True
+
+    def save(self, game: Game) -> None:
+        with self.transaction():
+            self._conn().execute(
+                'UPDATE games SET state = ?, data = ? WHERE code = ?',
+                (game.state, json.dumps(game.to_dict()), game.code))
+            self._list(game)
+
+    def delete(self, code: str) -> None:
+        with self.transaction():
+            conn = self._conn()
+            if conn.execute('DELETE FROM games WHERE code = ?', (code,)).rowcount:
+                conn.execute('DELETE FROM open_games WHERE code = ?', (code,))
+
+    def _list(self, game: Game) -> None:
+        """Keep a game's row in the lobby index in step with its open slots"""
+        slots = game.open_slots()
+        if slots:
+            # listed_at only moves when the slots change, as in MemoryStore
+            self._conn().execute(
+                'INSERT INTO open_games (code, open_slots, listed_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (code) DO UPDATE SET open_slots = excluded.open_slots, '
+                'listed_at = excluded.listed_at WHERE open_slots != excluded.open_slots',
+                (game.code, slots, time.time()))
+        else:
+            self._conn().execute('DELETE FROM open_games WHERE code = ?', (game.code,))
+
+    def game_code_for(self, sid: str) -> Optional[str]:
+        row = self._conn().execute('SELECT code FROM players WHERE sid = ?', (sid,)).fetchone()
+        return row[0] if row else None
+
+    def bind(self, sid: str, code: str) -> None:
+        self._conn().execute('INSERT OR REPLACE INTO players (sid, code) VALUES (?, ?)', (sid, code))
+
+    def unbind(self, sid: str) -> None:
+        self._conn().execute('DELETE FROM players WHERE sid = ?', (sid,))
+
+    def connected_count(self) -> int:
+        return self._conn().execute('SELECT COUNT(*) FROM players').fetchone()[0]
+
+    def count_by_state(self) -> Dict[str, int]:
+        rows = self._conn().execute('SELECT state, COUNT(*) FROM games GROUP BY state')
+        return dict(rows.fetchall())
+
+    def setting(self, name: str, default: str) -> str:
+        with self.transaction():
+            conn = self._conn()
+            conn.execute('INSERT OR IGNORE INTO settings (name, value) VALUES (?, ?)', (name, default))
+            return conn.execute('SELECT value FROM settings WHERE name = ?', (name,)).fetchone()[0]
+
+    def next_code_number(self) -> int:
+        with self.transaction():
+            conn = self._conn()
+            conn.execute("INSERT OR IGNORE INTO settings (name, value) VALUES ('code_counter', '0')")
+            n = int(conn.execute("SELECT value FROM settings WHERE name = 'code_counter'").fetchone()[0])
+            conn.execute("UPDATE settings SET value = ? WHERE name = 'code_counter'", (str(n + 1),))
+            return n
+
+    def release_code(self, code: str) -> None:
+        self._conn().execute('INSERT INTO released_codes (code) VALUES (?)', (code,))
+
+    def pop_released_code(self) -> Optional[str]:
+        with self.transaction():
+            conn = self._conn()
+            row = conn.execute('SELECT id, code FROM released_codes ORDER BY id LIMIT 1').fetchone()
+            if row is None:
+                return None
+            conn.execute('DELETE FROM released_codes WHERE id = ?', (row[0],))
+            return row[1]
+
+    def best_open_game(self) -> Optional[str]:
+        best = self.open_games(1)
+        return best[0] if best else None
+
+    def open_games(self, limit: int) -> List[str]:
+        # Read straight off the open_games_best index
+        rows = self._conn().execute(
+            'SELECT code FROM open_games ORDER BY open_slots, listed_at LIMIT ?', (limit,))
+        return [row[0] for row in rows]
+
+    def open_game_count(self) -> int:
+        return self._conn().execute('SELECT COUNT(*) FROM open_games').fetchone()[0]
+
+    def enqueue_player(self, player: QueuedPlayer) -> int:
+        with self.transaction():
+            conn = self._conn()
+            conn.execute('INSERT OR IGNORE INTO match_queue (sid, name, encoding) VALUES (?, ?, ?)', player)
+            return conn.execute('SELECT COUNT(*) FROM match_queue').fetchone()[0]
+
+    def dequeue_players(self, most: int, least: int = 1) -> List[QueuedPlayer]:
+        with self.transaction():
+            conn = self._conn()
+            rows = conn.execute('SELECT id, sid, name, encoding FROM match_queue ORDER BY id LIMIT ?',
+                                (most,)).fetchall()
+            if len(rows) < least:
+                return []
+            conn.execute('DELETE FROM match_queue WHERE id <= ?', (rows[-1][0],))
+            return [tuple(row[1:]) for row in rows]
+
+    def remove_queued(self, sid: str) -> None:
+        self._conn().execute('DELETE FROM match_queue WHERE sid = ?', (sid,))
+
+    def queued_count(self) -> int:
+        return self._conn().execute('SELECT COUNT(*) FROM match_queue').fetchone()[0]
+
+
+def create_store(url: str) -> GameStore:
+    """Create a store from a URL: ``memory`` or ``sqlite:///path/to/file.db``"""
+    if url == 'memory':
+        return MemoryStore()
+    if url.startswith('sqlite:///'):
+        return SQLiteStore(url[len('sqlite:///'):])
+    raise ValueError(f"Unknown game store: {url}")
@@ -0,0 +1,237 @@
+import argparse
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import time
+from typing import List, Optional
+
+from game_model import Game
+from logging_utils import setup_logger
+from native_threads import NativeThread, SimpleQueue
+
+HISTORY_PATH = 'data/history.db'
+
+logger = setup_logger('history', 'history.log')
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS games (
+        id INTEGER PRIMARY KEY,
+        code TEXT NOT NULL,
+        outcome TEXT NOT NULL,          -- solved, expired or abandoned
+        subject TEXT NOT NULL,
+        winner TEXT,
+        score INTEGER NOT NULL,
+        words INTEGER NOT NULL,
+        guesses INTEGER NOT NULL,
+        players INTEGER NOT NULL,
+        started_at REAL NOT NULL,
+        ended_at REAL NOT NULL,
+        data TEXT NOT NULL              -- Sentence and guesses as JSON
+    );
+    CREATE TABLE IF NOT EXISTS game_players (
+        game_id INTEGER NOT NULL REFERENCES games (id),
+        name TEXT NOT NULL,
+        role TEXT NOT NULL,             -- guesser or builder
+        words INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS games_subject ON games (subject);
+    CREATE INDEX IF NOT EXISTS games_ended_at ON games (ended_at);
+    CREATE INDEX IF NOT EXISTS game_players_name ON game_players (name);
+    CREATE INDEX IF NOT EXISTS game_players_game ON game_players (game_id);
+'''
+
+
+def connect(path: str) -> sqlite3.Connection:
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class HistoryWriter:
+    """Appends ended games to a SQLite history database off the hot path.
+
+    ``record`` only puts a small tuple on a bounded queue; a background
+    OS thread (a real one even under eventlet or gevent, so commits never
+    stall the event loop) writes them in batches of up to ``batch_size``,
+    one transaction per batch. If the writer falls behind and the queue
+    fills up, further games are dropped (and counted) rather than slowing
+    down handlers.
+    """
+
+    def __init__(self, path: str = HISTORY_PATH, batch_size: int = 200,
+                 flush_interval: float = 1.0, max_queue: int = 10_000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.queue: SimpleQueue = SimpleQueue()
+        self.written = 0
+        self.dropped = 0
+        self._thread = NativeThread(self._run)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, game: Game, outcome: str, winner: Optional[str] = None) -> None:
+        """Queue an ended game; never blocks"""
+        # The game is deleted right after this, so its lists can be handed
+        # over without copying
+        entry = (game.code, outcome, game.subject, winner, game.score, game.sentence, game.guesses,
+                 [(p.name, p is game.guesser) for p in game.players], game.started_at, time.time())
+        # SimpleQueue has no bound of its own; a slightly stale size is fine here
+        if self.queue.qsize() < self.max_queue:
+            self.queue.put(entry)
+        else:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"History queue full, {self.dropped} games dropped so far")
+
+    def close(self) -> None:
+        """Write out everything queued and stop the writer thread"""
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join(timeout=10)
+
+    def _run(self) -> None:
+        conn = connect(self.path)
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    entry = self.queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+            if batch:
+                try:
+                    self._write(conn, batch)
+                    self.written += len(batch)
+                except sqlite3.Error:
+                    logger.exception(f"Failed to write {len(batch)} games to history")
+        conn.close()
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, batch: List[tuple]) -> None:
+        conn.execute('BEGIN')
+        try:
+            for (code, outcome, subject, winner, score, sentence, guesses,
+                 players, started_at, ended_at) in batch:
+                game_id = conn.execute(
+                    'INSERT INTO games (code, outcome, subject, winner, score, words, guesses, players, '
+                    'started_at, ended_at, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (code, outcome, subject, winner, score, len(sentence), len(guesses), len(players),
+                     started_at, ended_at,
+                     json.dumps({'sentence': sentence, 'guesses': guesses}, separators=(',', ':')))
+                ).lastrowid
+                words_by_player = {}
+                for word_data in sentence:
+                    words_by_player[word_data['player']] = words_by_player.get(word_data['player'], 0) + 1
+                conn.executemany(
+                    'INSERT INTO game_players (game_id, name, role, words) VALUES (?, ?, ?, ?)',
+                    [(game_id, name, 'guesser' if is_guesser else 'builder', words_by_player.get(name, 0))
+                     for name, is_guesser in players])
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+
+def subject_stats(conn: sqlite3.Connection, subject: Optional[str] = None,
+                  min_games: int = 1, limit: int = 20) -> List[dict]:
+    """Per target: games played, solve rate and average words and guesses to solve"""
+    rows = conn.execute('''
+        SELECT subject, COUNT(*),
+               AVG(outcome = 'solved'),
+               AVG(CASE WHEN outcome = 'solved' THEN words END),
+               AVG(CASE WHEN outcome = 'solved' THEN guesses END),
+               AVG(CASE WHEN outcome = 'solved' THEN ended_at - started_at END)
+        FROM games
+        WHERE (? IS NULL OR subject = ?)
+        GROUP BY subject
+        HAVING COUNT(*) >= ?
+        ORDER BY COUNT(*) DESC
+        LIMIT ?
+    ''', (subject, subject, min_games, limit))
+    return [{
+        'subject': row[0],
+        'games': row[1],
+        'solve_rate': row[2],
+        'avg_words_to_solve': row[3],
+        'avg_guesses_to_solve': row[4],
+        'avg_seconds_to_solve': row[5]
+    } for row in rows]
+
+
+def player_stats(conn: sqlite3.Connection, name: str) -> dict:
+    """Games played, wins as guesser and words contributed by one player"""
+    row = conn.execute('''
+        SELECT COUNT(*),
+               SUM(gp.role = 'guesser'),
+               SUM(g.winner = gp.name),
+               SUM(gp.words),
+               AVG(g.score)
+        FROM game_players gp JOIN games g ON g.id = gp.game_id
+        WHERE gp.name = ?
+    ''', (name,)).fetchone()
+    return {
+        'name': name,
+        'games': row[0],
+        'games_as_guesser': row[1] or 0,
+        'wins': row[2] or 0,
+        'words': row[3] or 0,
+        'avg_score': row[4]
+    }
+
+
+def recent_games(conn: sqlite3.Connection, since: float = 0, limit: int = 20) -> List[dict]:
+    rows = conn.execute('''
+        SELECT code, outcome, subject, winner, score, words, guesses, players, started_at, ended_at
+        FROM games WHERE ended_at >= ? ORDER BY ended_at DESC LIMIT ?
+    ''', (since, limit))
+    keys = ('code', 'outcome', 'subject', 'winner', 'score', 'words', 'guesses', 'players',
+            'started_at', 'ended_at')
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the finished game history')
+    parser.add_argument('--db', default=os.environ.get('HISTORY_DB', HISTORY_PATH),
+                        help=f'History database (default: HISTORY_DB or {HISTORY_PATH})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    subjects = commands.add_parser('subjects', help='Solve rate and words-to-solve per target')
+    subjects.add_argument('subject', nargs='?', help='Only this target')
+    subjects.add_argument('--min-games', type=int, default=1, help='Skip targets with fewer games (default: 1)')
+    subjects.add_argument('-n', '--limit', type=int, default=20, help='Rows to show (default: 20)')
+
+    player = commands.add_parser('player', help='Stats for one player name')
+    player.add_argument('name')
+
+    recent = commands.add_parser('recent', help='Most recently ended games')
+    recent.add_argument('--hours', type=float, help='Only games that ended in the last N hours')
+    recent.add_argument('-n', '--limit', type=int, default=20, help='Rows to show (default: 20)')
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.command == 'subjects':
+        result = subject_stats(conn, args.subject, args.min_games, args.limit)
+    elif args.command == 'player':
+        result = player_stats(conn, args.name)
+    else:
+        since = time.time() - args.hours * 3600 if args.hours else 0
+        result = recent_games(conn, since, args.limit)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
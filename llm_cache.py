@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from llm_client import CompletionBackend, shared_client
+
+CACHE_PATH = 'cache/llm_cache.db'
+DEFAULT_TTL = 7 * 24 * 3600  # One week
+DEFAULT_MEMORY_ENTRIES = 1024
+DEFAULT_DISK_ENTRIES = 100_000
+
+
+class DiskStore:
+    """SQLite table of cached responses with TTL and size-based eviction"""
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS completions_used_at ON completions (used_at)')
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM completions WHERE key = ? AND expires_at > ?',
+                (key, now)).fetchone()
+            if row:
+                self._conn.execute('UPDATE completions SET used_at = ? WHERE key = ?', (now, key))
+        return row
+
+    def put(self, key: str, value: str, expires_at: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO completions (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)',
+                (key, value, expires_at, now))
+            # Drop expired entries, then the least recently used beyond the limit
+            self._conn.execute('DELETE FROM completions WHERE expires_at <= ?', (now,))
+            self._conn.execute('''
+                DELETE FROM completions WHERE key IN (
+                    SELECT key FROM completions ORDER BY used_at DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+
+
+class LLMCache:
+    """Memoizes completions from a backend.
+
+    Responses are keyed on the full request parameters (model, prompt,
+    temperature, ...). An in-memory LRU sits in front of an optional
+    on-disk store, and both expire entries after ``ttl`` seconds.
+    """
+
+    def __init__(self, backend: CompletionBackend, path: Optional[str] = CACHE_PATH,
+                 ttl: float = DEFAULT_TTL, max_memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+                 max_disk_entries: int = DEFAULT_DISK_ENTRIES):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self._memory: 'OrderedDict[str, Tuple[str, float]]' = OrderedDict()
+        self._disk = DiskStore(path, max_disk_entries) if path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(params: dict) -> str:
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+    async def complete(self, params: dict) -> str:
+        key = self.key(params)
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry and entry[1] > now:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return entry[0]
+
+        if self._disk:
+            entry = await asyncio.to_thread(self._disk.get, key)
+            if entry:
+                self.disk_hits += 1
+                self._remember(key, entry)
+                return entry[0]
+
+        self.misses += 1
+        value = await self.backend.complete(params)
+        entry = (value, now + self.ttl)
+        self._remember(key, entry)
+        if self._disk:
+            await asyncio.to_thread(self._disk.put, key, *entry)
+        return value
+
+    def _remember(self, key: str, entry: Tuple[str, float]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses
+        }
+
+
+_default_cache: Optional[LLMCache] = None
+
+
+def default_cache() -> LLMCache:
+    """Process-wide cache in front of the shared OpenAI client, configured from the environment.
+
+    ``LLM_CACHE_PATH`` sets the on-disk store (empty for memory only) and
+    ``LLM_CACHE_TTL`` the entry lifetime in seconds.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = LLMCache(
+            shared_client(),
+            path=os.environ.get('LLM_CACHE_PATH', CACHE_PATH) or None,
+            ttl=float(os.environ.get('LLM_CACHE_TTL', DEFAULT_TTL)))
+    return _default_cache
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional, Union
+
+from openai import (APIConnectionError, APIStatusError, APITimeoutError, AsyncOpenAI,
+                    RateLimitError)
+
+
+class CompletionBackend(ABC):
+    """Turns chat completion parameters into the response text"""
+
+    @abstractmethod
+    async def complete(self, params: dict) -> str:
+        ...
+
+
+class StubBackend(CompletionBackend):
+    """Answers from a fixed list or function, for running without network access"""
+
+    def __init__(self, responses: Union[List[str], Callable[[dict], str]] = ('the',)):
+        self.responses = responses
+        self.calls: List[dict] = []
+
+    async def complete(self, params: dict) -> str:
+        self.calls.append(params)
+        if callable(self.responses):
+            return self.responses(params)
+        return self.responses[(len(self.calls) - 1) % len(self.responses)]
+
+
+class TokenBucket:
+    """Allows ``rate`` units per minute, with bursts of up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate / 60
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        # Requests bigger than the bucket would never fit, so cap them
+        amount = min(amount, self.capacity)
+        # The lock keeps waiters in order, so big requests are not starved
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def adjust(self, amount: float) -> None:
+        """Charge (or refund, if negative) units once the real cost is known"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class SharedLLMClient(CompletionBackend):
+    """One OpenAI client shared by every AI player in the process.
+
+    Calls are limited by a concurrency semaphore and by request and token
+    buckets sized to the provider's per-minute limits. Rate limit (429),
+    server (5xx) and connection errors are retried with exponential backoff
+    and full jitter, honouring Retry-After when the provider sends it.
+    """
+
+    def __init__(self, client: Optional[AsyncOpenAI] = None, max_concurrency: int = 8,
+                 requests_per_minute: float = 500, tokens_per_minute: float = 200_000,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 30.0):
+        self._client = client
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            # Retries are ours, so the SDK's own retry loop is switched off
+            self._client = AsyncOpenAI(max_retries=0)  # Make sure OPENAI_API_KEY is set in environment
+        return self._client
+
+    @staticmethod
+    def estimate_tokens(params: dict) -> int:
+        """Rough token cost of a request: ~4 characters per prompt token plus the reply"""
+        prompt_chars = sum(len(m.get('content') or '') for m in params.get('messages', []))
+        return prompt_chars // 4 + params.get('max_tokens', 256)
+
+    async def complete(self, params: dict) -> str:
+        estimate = self.estimate_tokens(params)
+        for attempt in range(self.max_retries + 1):
+            await self.requests.acquire()
+            await self.tokens.acquire(estimate)
+            try:
+                async with self.semaphore:
+                    response = await self.client.chat.completions.create(**params)
+            except (RateLimitError, APIConnectionError, APITimeoutError, APIStatusError) as e:
+                # A failed attempt used no tokens, and the retry charges again
+                self.tokens.adjust(-estimate)
+                if not self._retryable(e) or attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+                continue
+            if response.usage is not None:
+                self.tokens.adjust(response.usage.total_tokens - estimate)
+            return response.choices[0].message.content
+
+    @staticmethod
+    def _retryable(error: Exception) -> bool:
+        if isinstance(error, APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+        return True
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after) + random.uniform(0, self.base_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+_shared_client: Optional[SharedLLMClient] = None
+
+
+def shared_client() -> SharedLLMClient:
+    """Process-wide client, configured from the environment.
+
+    ``LLM_MAX_CONCURRENCY``, ``LLM_REQUESTS_PER_MINUTE`` and
+    ``LLM_TOKENS_PER_MINUTE`` should match the provider account's limits,
+    divided by the number of bot processes.
+    """
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = SharedLLMClient(
+            max_concurrency=int(os.environ.get('LLM_MAX_CONCURRENCY', 8)),
+            requests_per_minute=float(os.environ.get('LLM_REQUESTS_PER_MINUTE', 500)),
+            tokens_per_minute=float(os.environ.get('LLM_TOKENS_PER_MINUTE', 200_000)))
+    return _shared_client
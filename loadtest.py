@@ -0,0 +1,310 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import socketio
+
+import word_index
+from game_model import MAX_PLAYERS
+
+WORD_PATTERN = re.compile(r'^[a-z]+$')
+
+
+class Stats:
+    """Latency samples, event counts and errors collected during a run"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)  # Milliseconds per event type
+        self.errors: Dict[str, int] = defaultdict(int)  # Count per error message
+        self.games_started = 0
+        self.games_finished = 0
+
+    def record(self, event: str, seconds: float) -> None:
+        self.latencies[event].append(seconds * 1000)
+
+    def error(self, message: str) -> None:
+        self.errors[message] += 1
+
+    def summary(self, duration: float) -> dict:
+        events = {}
+        for event, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            events[event] = {
+                'count': len(samples),
+                'p50_ms': percentile(samples, 50),
+                'p95_ms': percentile(samples, 95),
+                'p99_ms': percentile(samples, 99),
+                'max_ms': samples[-1],
+                'per_second': len(samples) / duration
+            }
+        requests = sum(len(samples) for samples in self.latencies.values())
+        error_count = sum(self.errors.values())
+        return {
+            'duration_s': duration,
+            'games_started': self.games_started,
+            'games_finished': self.games_finished,
+            'requests': requests,
+            'requests_per_second': requests / duration,
+            'error_count': error_count,
+            'error_rate': error_count / max(1, requests + error_count),
+            'errors': dict(self.errors),
+            'events': events
+        }
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, min(len(sorted_samples) - 1, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[rank]
+
+
+class ScriptedPlayer:
+    """A headless client that sends one request at a time and times the reply"""
+
+    def __init__(self, name: str, stats: Stats, timeout: float):
+        self.name = name
+        self.stats = stats
+        self.timeout = timeout
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self._waiters: List[tuple] = []
+        for event in ('game_created', 'player_joined', 'game_started', 'sentence_updated',
+                      'guess_result', 'game_ended', 'game_snapshot', 'player_left', 'turn_passed',
+                      'game_expired', 'error'):
+            self.sio.on(event, self._make_handler(event))
+
+    def _make_handler(self, event: str) -> Callable:
+        def handler(data):
+            for waiter in list(self._waiters):
+                events, predicate, future = waiter
+                if event in events and not future.done() and predicate(event, data):
+                    future.set_result((event, data))
+                    self._waiters.remove(waiter)
+        return handler
+
+    async def connect(self, url: str) -> None:
+        start = time.perf_counter()
+        await self.sio.connect(url, transports=['websocket'])
+        self.stats.record('connect', time.perf_counter() - start)
+
+    async def request(self, event: str, data: dict, replies: tuple,
+                      predicate: Callable = lambda event, data: True) -> Optional[dict]:
+        """Emit an event and wait for the first matching reply or an error"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((replies + ('error',), predicate, future))
+        start = time.perf_counter()
+        await self.sio.emit(event, data)
+        try:
+            reply_event, reply = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.stats.error(f'{event}: timeout')
+            return None
+        if reply_event == 'error':
+            self.stats.error(f"{event}: {reply.get('message')}")
+            return None
+        self.stats.record(event, time.perf_counter() - start)
+        return reply
+
+    async def wait_for(self, events: tuple) -> Optional[dict]:
+        """Wait for an event pushed by the server"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((events, lambda event, data: True, future))
+        try:
+            return (await asyncio.wait_for(future, self.timeout))[1]
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self) -> None:
+        if self.sio.connected:
+            await self.sio.disconnect()
+
+
+async def play_game(game_number: int, args, words: List[str], stats: Stats) -> None:
+    """Create a game, fill it with scripted players and play it to the end"""
+    players = [ScriptedPlayer(f'Bot{game_number}_{i}', stats, args.timeout)
+               for i in range(args.players)]
+    try:
+        await asyncio.gather(*(p.connect(args.url) for p in players))
+        host = players[0]
+        created = await host.request('create_game', {'playerName': host.name}, ('game_created',))
+        if not created:
+            return
+        code = created['gameCode']
+        for player in players[1:]:
+            joined = await player.request(
+                'join_game', {'gameCode': code, 'playerName': player.name}, ('player_joined',),
+                lambda event, data, name=player.name: any(p['name'] == name for p in data['players']))
+            if not joined:
+                return
+
+        # Every player gets its own game_started; the word builders learn the subject
+        started_waiters = [asyncio.ensure_future(p.wait_for(('game_started',))) for p in players[1:]]
+        host_started = await host.request('start_game', {}, ('game_started',))
+        if not host_started:
+            return
+        started = [host_started] + await asyncio.gather(*started_waiters)
+        if any(s is None for s in started):
+            stats.error('start_game: not delivered to every player')
+            return
+        stats.games_started += 1
+        by_name = {p.name: p for p in players}
+        guesser = next(p for p, s in zip(players, started) if s['isGuesser'])
+        subject = next(s['subject'] for s in started if not s['isGuesser'])
+
+        # Builders take turns adding words, then the guesser guesses
+        turn = host_started['currentTurn']
+        for _ in range(args.words):
+            await asyncio.sleep(random.expovariate(1 / args.word_interval) if args.word_interval else 0)
+            player = by_name[turn]
+            updated = await player.request(
+                'add_word', {'word': random.choice(words)}, ('sentence_updated',),
+                lambda event, data, name=player.name: data['word']['player'] == name)
+            if not updated:
+                return
+            turn = updated['currentTurn']
+
+        for _ in range(args.wrong_guesses):
+            await asyncio.sleep(args.guess_interval)
+            if not await guesser.request('make_guess', {'guess': random.choice(words)}, ('guess_result',)):
+                return
+        await asyncio.sleep(args.guess_interval)
+        if await guesser.request('make_guess', {'guess': subject}, ('game_ended',)):
+            stats.games_finished += 1
+    except Exception as e:
+        stats.error(f'{type(e).__name__}: {e}')
+    finally:
+        await asyncio.gather(*(p.close() for p in players), return_exceptions=True)
+
+
+def read_rss_kb(pid: int) -> Optional[int]:
+    """Resident set size of a local process, from /proc"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+async def sample_memory(pid: int, samples: List[int], interval: float = 1.0) -> None:
+    while True:
+        rss = read_rss_kb(pid)
+        if rss is not None:
+            samples.append(rss)
+        await asyncio.sleep(interval)
+
+
+async def run(args) -> dict:
+    index = word_index.load_or_build()
+    words = [w for w in (index.word(random.randrange(len(index))) for _ in range(5000))
+             if WORD_PATTERN.match(w)]
+    stats = Stats()
+    memory: List[int] = []
+    sampler = asyncio.create_task(sample_memory(args.server_pid, memory)) if args.server_pid else None
+
+    # Start games at the requested rate, with at most `concurrency` in flight
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(game_number: int) -> None:
+        async with semaphore:
+            await play_game(game_number, args, words, stats)
+
+    start = time.perf_counter()
+    tasks = []
+    for game_number in range(args.games):
+        tasks.append(asyncio.create_task(bounded(game_number)))
+        if args.ramp:
+            await asyncio.sleep(1 / args.ramp)
+    await asyncio.gather(*tasks)
+    duration = time.perf_counter() - start
+
+    if sampler:
+        sampler.cancel()
+    result = stats.summary(duration)
+    if memory:
+        result['server_rss_kb'] = {'start': memory[0], 'peak': max(memory), 'end': memory[-1]}
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result: dict, baseline: Optional[dict] = None) -> None:
+    print(f"{result['games_finished']}/{result['games_started']} games finished in "
+          f"{result['duration_s']:.1f}s, {result['requests_per_second']:.1f} req/s, "
+          f"error rate {result['error_rate']:.2%}")
+    print(f"{'event':<18}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for event, row in result['events'].items():
+        line = (f"{event:<18}{row['count']:>8}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+                f"{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}")
+        if baseline and event in baseline['events']:
+            before = baseline['events'][event]['p95_ms']
+            line += f"   p95 {row['p95_ms'] - before:+.1f} ms vs {baseline.get('commit') or 'baseline'}"
+        print(line)
+    for message, count in sorted(result['errors'].items(), key=lambda item: -item[1]):
+        print(f"  error x{count}: {message}")
+    if 'server_rss_kb' in result:
+        rss = result['server_rss_kb']
+        print(f"server RSS: start {rss['start'] / 1024:.1f} MB, peak {rss['peak'] / 1024:.1f} MB, "
+              f"end {rss['end'] / 1024:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play many scripted games against a running server')
+    parser.add_argument('--url', default='http://localhost:5000', help='Server URL (default: http://localhost:5000)')
+    parser.add_argument('-g', '--games', type=int, default=100, help='Number of games to play (default: 100)')
+    parser.add_argument('-p', '--players', type=int, default=4, help=f'Players per game, 2 to {MAX_PLAYERS} (default: 4)')
+    parser.add_argument('-c', '--concurrency', type=int, default=50, help='Games in flight at once (default: 50)')
+    parser.add_argument('--ramp', type=float, default=0, help='Games started per second, 0 for all at once (default: 0)')
+    parser.add_argument('--words', type=int, default=8, help='Words added per game (default: 8)')
+    parser.add_argument('--word-interval', type=float, default=0.2, help='Mean seconds between words (default: 0.2)')
+    parser.add_argument('--wrong-guesses', type=int, default=2, help='Wrong guesses before the right one (default: 2)')
+    parser.add_argument('--guess-interval', type=float, default=0.2, help='Seconds between guesses (default: 0.2)')
+    parser.add_argument('--timeout', type=float, default=10, help='Seconds to wait for a reply (default: 10)')
+    parser.add_argument('--server-pid', type=int, help='PID of a local server process to sample memory from')
+    parser.add_argument('-o', '--output-dir', default='loadtest_results', help='Where to save results (default: loadtest_results)')
+    parser.add_argument('--compare', help='Earlier results file to compare p95 latencies against')
+    args = parser.parse_args()
+    if args.players < 2:
+        parser.error('A game needs at least 2 players')
+    if args.players > MAX_PLAYERS:
+        parser.error(f'A game takes at most {MAX_PLAYERS} players')
+
+    result = asyncio.run(run(args))
+    result['commit'] = git_commit()
+    result['timestamp'] = datetime.now().isoformat()
+    result['config'] = {k: v for k, v in vars(args).items() if k not in ('output_dir', 'compare')}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir,
+                        f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{result['commit'] or 'nogit'}.json")
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved results to {path}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
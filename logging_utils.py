@@ -1,66 +1,151 @@
 import os
+import atexit
 import logging
+import logging.handlers
 import json
-from datetime import datetime
+import random
 from typing import Any, Dict
 
-def setup_logger(name: str, log_file: str, level=logging.DEBUG) -> logging.Logger:
-    """Set up a logger with file and console handlers"""
+from native_threads import NativeThread, SimpleQueue
+
+# Socket payloads are only logged at DEBUG, so production can run at INFO
+# without paying for them at all
+SOCKET_EVENT_LEVEL = logging.DEBUG
+
+# Payloads longer than this (in JSON characters) are cut off
+MAX_PAYLOAD_CHARS = int(os.environ.get('LOG_MAX_PAYLOAD_CHARS', 2000))
+# Fraction of socket events whose payload is written out
+PAYLOAD_SAMPLE_RATE = float(os.environ.get('LOG_PAYLOAD_SAMPLE_RATE', 1.0))
+# Added to log file names so processes sharing logs/ don't write the same
+# files; serve.py sets it to each worker's port
+LOG_FILE_SUFFIX = os.environ.get('LOG_FILE_SUFFIX', '')
+
+
+class NativeQueueListener(logging.handlers.QueueListener):
+    """QueueListener whose writer stays a real OS thread under eventlet or gevent"""
+
+    def start(self) -> None:
+        self._thread = NativeThread(self._monitor)
+        self._thread.start()
+
+
+# Background writers, keyed by logger name
+_listeners: Dict[str, NativeQueueListener] = {}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format records as one compact JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%d %H:%M:%S'),
+            'level': record.levelname,
+            'where': f'{record.filename}:{record.lineno}',
+            'message': record.getMessage()
+        }
+        line = json.dumps(entry, default=str)
+        if hasattr(record, 'data_json'):
+            # Splice the payload in as raw JSON so it isn't encoded twice
+            line = f'{line[:-1]}, "data": {record.data_json}}}'
+        return line
+
+
+def setup_logger(name: str, log_file: str, level=logging.DEBUG,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5) -> logging.Logger:
+    """Set up a logger that hands records to a background writer thread.
+
+    The file gets JSON lines and is rotated instead of truncated on start;
+    the console only gets warnings and errors. ``LOG_LEVEL`` in the
+    environment overrides ``level``.
+    """
     # Create logs directory if it doesn't exist
     os.makedirs('logs', exist_ok=True)
-    
-    # Create formatter with code location
-    formatter = logging.Formatter(
-        '%(asctime)s [%(levelname)s] [%(filename)s:%(lineno)d] %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    # Create file handler with mode='w' to overwrite
-    file_handler = logging.FileHandler(f'logs/{log_file}', mode='w')
-    file_handler.setFormatter(formatter)
-    file_handler.setLevel(level)  # File gets all logs
-    
+    level = os.environ.get('LOG_LEVEL', level)
+    if LOG_FILE_SUFFIX:
+        root, ext = os.path.splitext(log_file)
+        log_file = f'{root}.{LOG_FILE_SUFFIX}{ext}'
+
+    # Create rotating file handler; the file gets all logs
+    file_handler = logging.handlers.RotatingFileHandler(
+        f'logs/{log_file}', maxBytes=max_bytes, backupCount=backup_count)
+    file_handler.setFormatter(JsonLinesFormatter())
+    file_handler.setLevel(level)
+
     # Create console handler for warnings and errors only
     console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    console_handler.setLevel(logging.WARNING)  # Console only gets warnings and errors
-    
+    console_handler.setFormatter(logging.Formatter(
+        '%(asctime)s [%(levelname)s] [%(filename)s:%(lineno)d] %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    ))
+    console_handler.setLevel(logging.WARNING)
+
+    # Stop any previous writer for this logger before replacing it
+    old_listener = _listeners.pop(name, None)
+    if old_listener is not None:
+        old_listener.stop()
+
+    # Handlers run on the listener's thread; callers only enqueue records
+    log_queue: SimpleQueue = SimpleQueue()
+    listener = NativeQueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    _listeners[name] = listener
+
     # Create logger
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    
+    logger.propagate = False
+
     # Remove any existing handlers
     logger.handlers.clear()
-    
-    # Add handlers
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
     return logger
 
+
+@atexit.register
+def _stop_listeners() -> None:
+    """Flush and stop every background writer"""
+    while _listeners:
+        _listeners.popitem()[1].stop()
+
+
 def format_data(data: Any) -> str:
-    """Format data for logging"""
+    """Format data for logging as compact JSON, truncated to MAX_PAYLOAD_CHARS"""
     try:
-        if isinstance(data, (dict, list)):
-            return json.dumps(data, indent=2)
-        return str(data)
+        text = json.dumps(data, separators=(',', ':'), default=str)
     except Exception as e:
-        return f"<Error formatting data: {e}>"
+        return json.dumps(f"<Error formatting data: {e}>")
+    if len(text) > MAX_PAYLOAD_CHARS:
+        return json.dumps(f"{text[:MAX_PAYLOAD_CHARS]}... <{len(text)} chars>")
+    return text
+
 
 def log_socket_event(logger: logging.Logger, direction: str, event: str, data: Any = None) -> None:
-    """Log a socket.io event"""
-    message = f"{direction} Socket Event: {event}"
-    if data is not None:
-        message += f"\nData: {format_data(data)}"
-    logger.info(message)
+    """Log a socket.io event.
+
+    Does nothing unless the logger is enabled for SOCKET_EVENT_LEVEL. The
+    payload is formatted right away, since callers pass live game state
+    that may change before the writer thread gets to the record.
+    """
+    if not logger.isEnabledFor(SOCKET_EVENT_LEVEL):
+        return
+    extra = None
+    if data is not None and (PAYLOAD_SAMPLE_RATE >= 1.0 or random.random() < PAYLOAD_SAMPLE_RATE):
+        extra = {'data_json': format_data(data)}
+    logger.log(SOCKET_EVENT_LEVEL, "%s Socket Event: %s", direction, event, extra=extra, stacklevel=2)
+
 
 def log_api_call(logger: logging.Logger, method: str, url: str, request_data: Any = None, response_data: Any = None, error: Exception = None) -> None:
     """Log an API call"""
-    message = f"API {method} {url}"
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    payload = {}
     if request_data is not None:
-        message += f"\nRequest: {format_data(request_data)}"
+        payload['request'] = request_data
     if response_data is not None:
-        message += f"\nResponse: {format_data(response_data)}"
+        payload['response'] = response_data
     if error is not None:
-        message += f"\nError: {str(error)}"
-    logger.info(message) 
\ No newline at end of file
+        payload['error'] = str(error)
+    logger.info("API %s %s", method, url, extra={'data_json': format_data(payload)} if payload else None,
+                stacklevel=2)
@@ -0,0 +1,199 @@
+import bisect
+import functools
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+PREFIX = 'polycephaly_'
+
+# Handler latency buckets in seconds, from 100µs to 2.5s
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Emitted payload sizes in bytes
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536)
+# Recipients per emit
+FANOUT_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 32, 64)
+
+# Fraction of emits whose payload is encoded to measure its size
+EMIT_SIZE_SAMPLE_RATE = float(os.environ.get('METRICS_EMIT_SIZE_SAMPLE_RATE', 0.1))
+
+# Quoted player input in error messages, e.g. 'Invalid word "xyz"', is
+# dropped from the label so the number of series stays bounded
+QUOTED = re.compile(r'"[^"]*"')
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Counter:
+    """A monotonically increasing count per label set"""
+
+    type = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_labels(self.labelnames, key)} {value}' for key, value in values]
+
+
+class Histogram:
+    """Observations counted into fixed buckets per label set"""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (last is +Inf)..., sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                series = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(series)) for key, series in self._values.items()]
+        lines = []
+        for key, series in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket_labels = _labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {series[-1]}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+
+class Gauge:
+    """Values read from a callback when metrics are scraped"""
+
+    type = 'gauge'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str],
+                 callback: Callable[[], Dict[LabelValues, float]]):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def collect(self) -> List[str]:
+        return [f'{self.name}{_labels(self.labelnames, key)} {value}'
+                for key, value in self.callback().items()]
+
+
+class Registry:
+    """Every metric in this process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics: list = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HANDLER_SECONDS = REGISTRY.register(Histogram(
+    'socket_handler_seconds', 'Time spent in socket event handlers, including store locks', ['event']))
+HANDLER_EXCEPTIONS = REGISTRY.register(Counter(
+    'socket_handler_exceptions_total', 'Socket handlers that raised', ['event']))
+ERRORS = REGISTRY.register(Counter(
+    'socket_errors_total', 'Error replies sent to clients, by message', ['message']))
+EMITS = REGISTRY.register(Counter(
+    'socket_emits_total', 'Events emitted, by event', ['event']))
+EMIT_RECIPIENTS = REGISTRY.register(Histogram(
+    'socket_emit_recipients', 'Clients on this process reached by one emit', ['event'], FANOUT_BUCKETS))
+EMIT_BYTES = REGISTRY.register(Histogram(
+    'socket_emit_bytes', 'JSON size of a sample of emitted payloads', ['event'], SIZE_BUCKETS))
+EMIT_BYTES_SAVED = REGISTRY.register(Counter(
+    'socket_emit_bytes_saved_total',
+    'Estimated bytes not re-encoded because one packet was shared by several recipients', ['event']))
+GAMES_CREATED = REGISTRY.register(Counter('games_created_total', 'Games created'))
+GAMES_FINISHED = REGISTRY.register(Counter('games_finished_total', 'Games finished with a correct guess'))
+GAMES_EXPIRED = REGISTRY.register(Counter('games_expired_total', 'Games removed after going idle'))
+TURNS_PASSED = REGISTRY.register(Counter('turns_passed_total', 'Turns passed on after timing out'))
+GAMES_MATCHED = REGISTRY.register(Counter('games_matched_total', 'Games formed from the matchmaking queue'))
+SPECTATOR_UPDATES = REGISTRY.register(Counter('spectator_updates_total', 'Coalesced updates sent to spectators'))
+SPECTATOR_CHANGES_COALESCED = REGISTRY.register(Counter(
+    'spectator_changes_coalesced_total', 'Game changes folded into a spectator update already due'))
+
+
+def instrument(event: str):
+    """Record a socket handler's latency and exceptions"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            except Exception:
+                HANDLER_EXCEPTIONS.inc(event)
+                raise
+            finally:
+                HANDLER_SECONDS.observe(time.perf_counter() - start, event)
+        return wrapper
+    return decorator
+
+
+def record_emit(event: str, data, recipients: int) -> None:
+    """Count an emitted event, and measure a sample of payload sizes"""
+    EMITS.inc(event)
+    EMIT_RECIPIENTS.observe(recipients, event)
+    if event == 'error':
+        ERRORS.inc(QUOTED.sub('"…"', str(data.get('message', ''))))
+    if random.random() < EMIT_SIZE_SAMPLE_RATE:
+        size = len(data) if isinstance(data, bytes) else len(json.dumps(data, separators=(',', ':')))
+        EMIT_BYTES.observe(size, event)
+        if recipients > 1:
+            # Scaled up, since only a sample of emits is measured
+            EMIT_BYTES_SAVED.inc(event, amount=size * (recipients - 1) / EMIT_SIZE_SAMPLE_RATE)
+
+
+def register_gauge(name: str, help: str, labelnames: Sequence[str],
+                   callback: Callable[[], Dict[LabelValues, float]]) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labelnames, callback))
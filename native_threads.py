@@ -0,0 +1,78 @@
+"""Background threads that stay real OS threads under eventlet or gevent.
+
+serve.py monkey patches ``threading`` so handlers run as green threads. A
+``threading.Thread`` started after that is a green thread too, and anything
+it does that blocks in C (a SQLite commit, a file write) stalls the whole
+event loop. The writers here use the interpreter's original thread
+primitives instead, and ``_queue.SimpleQueue``, which is never patched, to
+talk to them.
+"""
+import importlib
+import sys
+import _queue
+from typing import Callable, Optional, Sequence, Tuple
+
+# A queue that is safe to share between green threads and real ones
+SimpleQueue = _queue.SimpleQueue
+
+
+def green_library() -> Optional[str]:
+    """'eventlet' or 'gevent' if it has monkey patched threading, else None"""
+    if 'eventlet' in sys.modules:
+        from eventlet import patcher
+        if patcher.is_monkey_patched('thread'):
+            return 'eventlet'
+    if 'gevent' in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            return 'gevent'
+    return None
+
+
+def _originals(module: str, names: Sequence[str]) -> Tuple:
+    """Attributes of a module as they were before monkey patching"""
+    library = green_library()
+    if library == 'eventlet':
+        from eventlet import patcher
+        original = patcher.original(module)
+        return tuple(getattr(original, name) for name in names)
+    if library == 'gevent':
+        from gevent import monkey
+        return tuple(monkey.get_original(module, names))
+    original = importlib.import_module(module)
+    return tuple(getattr(original, name) for name in names)
+
+
+def sleep(seconds: float) -> None:
+    """time.sleep for native threads; the patched one needs the event loop"""
+    _originals('time', ('sleep',))[0](seconds)
+
+
+class NativeThread:
+    """Just enough of ``threading.Thread`` to run one target on an OS thread.
+
+    Like a daemon thread it doesn't keep the interpreter alive, so owners
+    should join it from an atexit hook after telling it to stop.
+    """
+
+    def __init__(self, target: Callable[[], None]):
+        self.target = target
+        self._start_new_thread, allocate_lock = _originals('_thread', ('start_new_thread', 'allocate_lock'))
+        self._done = allocate_lock()
+
+    def start(self) -> None:
+        self._done.acquire()
+        self._start_new_thread(self._run, ())
+
+    def _run(self) -> None:
+        try:
+            self.target()
+        finally:
+            self._done.release()
+
+    def is_alive(self) -> bool:
+        return self._done.locked()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._done.acquire(timeout=-1 if timeout is None else timeout):
+            self._done.release()
@@ -0,0 +1,197 @@
+import cProfile
+import functools
+import os
+import random
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import native_threads
+from logging_utils import setup_logger
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+MODES = ('cprofile', 'sample')
+MAX_SECONDS = 600
+
+logger = setup_logger('profiling', 'profiling.log')
+
+# Handlers that can be profiled, and the sessions running on them right now.
+# Wrapped handlers only look at _sessions, so with nothing running the cost
+# is one truthiness check per event.
+PROFILABLE: List[str] = []
+_sessions: Dict[str, 'Session'] = {}
+_finished: List[dict] = []
+_lock = threading.Lock()
+
+
+class Session:
+    """Profiles one handler for a fixed window, or a fraction of its calls.
+
+    ``cprofile`` mode traces every call deterministically and writes a
+    ``.prof`` file for pstats, snakeviz or flameprof. ``sample`` mode has a
+    background OS thread sample the handler's stack every ``interval``
+    seconds and writes collapsed stacks (``.folded``) for flamegraph.pl or
+    speedscope; it adds almost nothing to the handler itself.
+
+    The sampler looks at whatever each OS thread is running and keeps the
+    stacks that pass through this session's ``run``, so it works the same
+    whether handlers are threads or eventlet/gevent green threads.
+    cProfile can't tell green threads apart, so that mode is refused once
+    threading is monkey patched.
+    """
+
+    def __init__(self, event: str, mode: str, seconds: float, fraction: float, interval: float):
+        self.event = event
+        self.mode = mode
+        self.seconds = seconds
+        self.fraction = fraction
+        self.interval = interval
+        self.started = datetime.now()
+        self.calls = 0
+        self.stopped = False
+        self._timer = threading.Timer(seconds, stop, (event,))
+        self._timer.daemon = True
+        if mode == 'cprofile':
+            self.profile = cProfile.Profile()
+            self._profile_lock = threading.Lock()
+        else:
+            self.stacks: Counter = Counter()
+            self._sampler = native_threads.NativeThread(self._sample)
+
+    def start(self) -> None:
+        self._timer.start()
+        if self.mode == 'sample':
+            self._sampler.start()
+
+    def run(self, handler, args, kwargs):
+        if self.fraction < 1 and random.random() >= self.fraction:
+            return handler(*args, **kwargs)
+        self.calls += 1
+        if self.mode == 'cprofile':
+            # A profiler can only trace one call at a time; concurrent calls
+            # on other threads just run unprofiled
+            if not self._profile_lock.acquire(blocking=False):
+                return handler(*args, **kwargs)
+            try:
+                return self.profile.runcall(handler, *args, **kwargs)
+            finally:
+                self._profile_lock.release()
+        # In sample mode the sampler recognises the call by this frame
+        return handler(*args, **kwargs)
+
+    def _sample(self) -> None:
+        run_code = Session.run.__code__
+        while not self.stopped:
+            native_threads.sleep(self.interval)
+            for frame in sys._current_frames().values():
+                stack = []
+                sampled = False
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                    if code is run_code and frame.f_locals.get('self') is self:
+                        sampled = True
+                    frame = frame.f_back
+                if sampled:
+                    self.stacks[';'.join(reversed(stack))] += 1
+
+    def finish(self) -> Optional[str]:
+        """Stop profiling and write the results, returning the file path"""
+        self.stopped = True
+        self._timer.cancel()
+        if self.mode == 'sample':
+            self._sampler.join()
+        if not self.calls:
+            return None
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = f"{self.event}-{self.started.strftime('%Y%m%d-%H%M%S')}"
+        if self.mode == 'cprofile':
+            path = os.path.join(PROFILE_DIR, f'{name}.prof')
+            with self._profile_lock:
+                self.profile.dump_stats(path)
+        else:
+            path = os.path.join(PROFILE_DIR, f'{name}.folded')
+            with open(path, 'w') as f:
+                for stack, count in self.stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+        return path
+
+    def describe(self) -> dict:
+        return {
+            'event': self.event,
+            'mode': self.mode,
+            'seconds': self.seconds,
+            'fraction': self.fraction,
+            'started': self.started.isoformat(),
+            'calls': self.calls
+        }
+
+
+def profiled(event: str):
+    """Let a socket handler be profiled on demand"""
+    PROFILABLE.append(event)
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            session = _sessions.get(event) if _sessions else None
+            if session is None:
+                return handler(*args, **kwargs)
+            return session.run(handler, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def start(events: List[str], mode: str = 'cprofile', seconds: float = 30,
+          fraction: float = 1.0, interval: float = 0.005) -> List[dict]:
+    """Start profiling the given handlers; raises ValueError on bad options"""
+    unknown = [e for e in events if e not in PROFILABLE]
+    if not events or unknown:
+        raise ValueError(f"Unknown handlers: {', '.join(unknown) or '(none given)'}")
+    if mode not in MODES:
+        raise ValueError(f"Mode must be one of: {', '.join(MODES)}")
+    if mode == 'cprofile' and native_threads.green_library():
+        raise ValueError(f"cprofile mode can't separate {native_threads.green_library()} green threads, "
+                         f"use sample mode")
+    if not 0 < seconds <= MAX_SECONDS:
+        raise ValueError(f"Seconds must be between 0 and {MAX_SECONDS}")
+    if not 0 < fraction <= 1:
+        raise ValueError("Fraction must be between 0 and 1")
+    if not 0.001 <= interval <= 1:
+        raise ValueError("Interval must be between 0.001 and 1 seconds")
+
+    with _lock:
+        busy = [e for e in events if e in _sessions]
+        if busy:
+            raise ValueError(f"Already profiling: {', '.join(busy)}")
+        sessions = [Session(e, mode, seconds, fraction, interval) for e in events]
+        for session in sessions:
+            session.start()
+            _sessions[session.event] = session
+    logger.info(f"Profiling {', '.join(events)} ({mode}) for {seconds}s, fraction {fraction}")
+    return [s.describe() for s in sessions]
+
+
+def stop(event: Optional[str] = None) -> List[dict]:
+    """Stop one handler's session, or all of them, and write out the results"""
+    with _lock:
+        events = [event] if event else list(_sessions)
+        sessions = [_sessions.pop(e) for e in events if e in _sessions]
+    results = []
+    for session in sessions:
+        path = session.finish()
+        result = dict(session.describe(), file=os.path.basename(path) if path else None)
+        logger.info(f"Profile of {session.event} finished: {session.calls} calls, written to {path}")
+        results.append(result)
+    _finished.extend(results)
+    return results
+
+
+def status() -> dict:
+    return {
+        'profilable': PROFILABLE,
+        'active': [s.describe() for s in list(_sessions.values())],
+        'finished': _finished
+    }
@@ -1,20 +1,25 @@
 import argparse
 import asyncio
+from typing import Optional
+from ai_backends import BACKENDS, create_backend
 from ai_player import run_ai_player
 
-async def run_multiple_ai_players(game_code: str, num_players: int = 4):
+async def run_multiple_ai_players(game_code: str, num_players: int = 4, backend_name: Optional[str] = None):
     """
     Spin up multiple AI players concurrently using asyncio.
     
     Args:
         game_code (str): The game code to join
         num_players (int): Number of AI players to create (default: 4)
+        backend_name (str): Inference backend shared by all players (default: AI_BACKEND or chat)
     """
     ai_names = [f"AI_Player_{i+1}" for i in range(num_players)]
+    # One backend for everyone, so decisions can be batched and cached together
+    backend = create_backend(backend_name)
     
     # Create tasks for all AI players
     tasks = [
-        asyncio.create_task(run_ai_player(name, game_code))
+        asyncio.create_task(run_ai_player(name, game_code, backend))
         for name in ai_names
     ]
     
@@ -34,13 +39,15 @@ def main():
     parser = argparse.ArgumentParser(description='Run AI players for the word guessing game')
     parser.add_argument('-n', '--num_players', type=int, default=4,
                        help='Number of AI players to create (default: 4)')
+    parser.add_argument('-b', '--backend', choices=list(BACKENDS),
+                       help='Inference backend: chat, batch or rules (default: AI_BACKEND or chat)')
     args = parser.parse_args()
 
     game_code = input("Enter game code: ")
     
     # Run the async main function
     try:
-        asyncio.run(run_multiple_ai_players(game_code, args.num_players))
+        asyncio.run(run_multiple_ai_players(game_code, args.num_players, args.backend))
     except KeyboardInterrupt:
         print("\nShutdown complete.")
 
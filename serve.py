@@ -0,0 +1,209 @@
+"""Production launcher for the game server.
+
+Picks and sets up the async mode before the server module is imported,
+applies the Socket.IO settings from config/config.json, runs one or more
+worker processes and drains games on SIGTERM. ``python server.py`` stays
+the development server.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+CONFIG_PATH = 'config/config.json'
+
+# Overridden by the "server" section of the config file, then by flags
+DEFAULTS = {
+    'async_mode': 'auto',          # eventlet, gevent or auto
+    'host': '0.0.0.0',
+    'port': 5000,
+    'workers': 1,                  # Processes, listening on port, port + 1, ...
+    'ping_interval': 25.0,         # Seconds between heartbeats
+    'ping_timeout': 20.0,          # Seconds without a pong before a client is dropped
+    'max_message_size': 65536,     # Largest client message in bytes
+    'drain_timeout': 300.0,        # Seconds to let games finish after SIGTERM
+}
+# The threading mode would mean werkzeug's development server; that is what
+# python server.py is for
+ASYNC_MODES = ('eventlet', 'gevent')
+
+
+def load_config(path: str) -> dict:
+    """The "server" section of the config file over the defaults"""
+    options = dict(DEFAULTS)
+    if os.path.exists(path):
+        with open(path) as f:
+            section = json.load(f).get('server', {})
+        unknown = set(section) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown server options in {path}: {', '.join(sorted(unknown))}")
+        options.update(section)
+    return options
+
+
+def resolve_async_mode(mode: str) -> str:
+    """The first installed of eventlet and gevent for 'auto'; raises ValueError if it isn't installed"""
+    candidates = ASYNC_MODES if mode == 'auto' else (mode,)
+    for candidate in candidates:
+        if importlib.util.find_spec(candidate):
+            return candidate
+    raise ValueError(f"{' or '.join(candidates)} is needed to serve in production "
+                     f"(pip install {candidates[0]}); use python server.py for development")
+
+
+def worker_args(options: dict, port: int, config_path: str) -> List[str]:
+    args = [sys.executable, os.path.abspath(__file__), '--config', config_path, '--workers', '1',
+            '--port', str(port)]
+    for name in ('async_mode', 'host', 'ping_interval', 'ping_timeout', 'max_message_size', 'drain_timeout'):
+        args += [f"--{name.replace('_', '-')}", str(options[name])]
+    return args
+
+
+def run_workers(options: dict, config_path: str) -> int:
+    """Start one process per worker and stop them all together"""
+    from logging_utils import setup_logger
+    logger = setup_logger('serve', 'serve.log')
+
+    ports = [options['port'] + i for i in range(options['workers'])]
+    # Each worker writes its own log files, suffixed with its port, rather
+    # than several processes rotating the same ones
+    children: Dict[int, subprocess.Popen] = {
+        port: subprocess.Popen(worker_args(options, port, config_path),
+                               env=dict(os.environ, LOG_FILE_SUFFIX=str(port)))
+        for port in ports
+    }
+    logger.info(f"Started {len(children)} workers on ports {ports[0]}-{ports[-1]}")
+
+    stopping = False
+
+    def forward(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for child in children.values():
+            if child.poll() is None:
+                child.send_signal(signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+
+    # If one worker dies on its own, stop the rest so a supervisor restarts
+    # the whole set rather than running short-handed
+    status = 0
+    while any(child.poll() is None for child in children.values()):
+        for port, child in children.items():
+            if not stopping and child.poll() is not None:
+                logger.error(f"Worker on port {port} exited with status {child.returncode}, stopping")
+                status = 1
+                forward(signal.SIGTERM, None)
+        time.sleep(0.5)
+    return status
+
+
+def run_worker(options: dict) -> None:
+    """Serve in this process until SIGTERM has drained it, or SIGINT"""
+    async_mode = options['async_mode']
+    # Patching has to come before anything else creates sockets, threads or locks
+    if async_mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    else:
+        from gevent import monkey
+        monkey.patch_all()
+
+    os.environ['SOCKETIO_ASYNC_MODE'] = async_mode
+    os.environ['SOCKETIO_PING_INTERVAL'] = str(options['ping_interval'])
+    os.environ['SOCKETIO_PING_TIMEOUT'] = str(options['ping_timeout'])
+    os.environ['SOCKETIO_MAX_MESSAGE_SIZE'] = str(options['max_message_size'])
+
+    import greenlet
+    import server
+    logger = server.logger
+    # The greenlet that runs the server loop, so the drain can stop it
+    serving = greenlet.getcurrent()
+
+    def drain():
+        """Let games in play here finish, then stop serving"""
+        deadline = time.monotonic() + options['drain_timeout']
+        next_report = 0.0
+        while (games := server.local_games_in_play()) and time.monotonic() < deadline:
+            if time.monotonic() >= next_report:
+                logger.info(f"Draining: {games} games still in play")
+                next_report = time.monotonic() + 30
+            server.socketio.sleep(1)
+        if games:
+            logger.warning(f"Drain timeout reached with {games} games still in play")
+        # Stop the server loop directly; a SIGINT to ourselves would do
+        # nothing when the supervisor started us with SIGINT ignored
+        serving.throw(SystemExit)
+
+    def on_sigterm(signum, frame):
+        if server.draining:
+            raise KeyboardInterrupt  # A second SIGTERM stops at once
+        server.draining = True
+        logger.info("SIGTERM received, no longer accepting games")
+        server.socketio.start_background_task(drain)
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+
+    logger.info(f"Serving on {options['host']}:{options['port']} ({async_mode}, pid {os.getpid()})")
+    try:
+        server.socketio.run(server.app, host=options['host'], port=options['port'],
+                            debug=False, use_reloader=False, log_output=False)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    if server.history:
+        server.history.close()
+    logger.info("Server stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the game server in production')
+    parser.add_argument('--config', default=CONFIG_PATH,
+                        help=f'Config file with a "server" section (default: {CONFIG_PATH})')
+    parser.add_argument('--async-mode', choices=('auto',) + ASYNC_MODES,
+                        help='Concurrency model (default: auto, the first of eventlet and gevent installed)')
+    parser.add_argument('--host', help=f"Address to listen on (default: {DEFAULTS['host']})")
+    parser.add_argument('--port', type=int, help=f"First worker's port (default: {DEFAULTS['port']})")
+    parser.add_argument('--workers', type=int,
+                        help='Worker processes, each on its own port (default: 1)')
+    parser.add_argument('--ping-interval', type=float,
+                        help=f"Seconds between heartbeats (default: {DEFAULTS['ping_interval']})")
+    parser.add_argument('--ping-timeout', type=float,
+                        help=f"Seconds to wait for a heartbeat reply (default: {DEFAULTS['ping_timeout']})")
+    parser.add_argument('--max-message-size', type=int,
+                        help=f"Largest client message in bytes (default: {DEFAULTS['max_message_size']})")
+    parser.add_argument('--drain-timeout', type=float,
+                        help=f"Seconds games may run on after SIGTERM (default: {DEFAULTS['drain_timeout']})")
+    args = parser.parse_args()
+
+    try:
+        options = load_config(args.config)
+    except ValueError as e:
+        parser.error(str(e))
+    options.update({name: value for name, value in vars(args).items()
+                    if value is not None and name != 'config'})
+
+    if options['async_mode'] not in ('auto',) + ASYNC_MODES:
+        parser.error(f"async_mode must be auto or one of {', '.join(ASYNC_MODES)}")
+    try:
+        options['async_mode'] = resolve_async_mode(options['async_mode'])
+    except ValueError as e:
+        parser.error(str(e))
+    if options['workers'] < 1:
+        parser.error("workers must be at least 1")
+    if options['workers'] > 1:
+        # Workers only see each other's games and broadcasts through a shared
+        # store and message queue
+        if os.environ.get('GAME_STORE', 'memory') == 'memory' or not os.environ.get('SOCKETIO_MESSAGE_QUEUE'):
+            parser.error("Several workers need a shared GAME_STORE and SOCKETIO_MESSAGE_QUEUE")
+        sys.exit(run_workers(options, args.config))
+    run_worker(options)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,287 +1,823 @@
-from flask import Flask, render_template, request, session
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from flask import Flask, Response, abort, g, jsonify, render_template, request, send_from_directory, session, url_for
+from flask_socketio import SocketIO, emit as socketio_emit, join_room, leave_room
 import os
+import functools
+import hmac
 import json
-from datetime import datetime
+import mimetypes
 import random
-from typing import Dict, List, Set
 import re
+import threading
+import time
+from game_actors import ActorRegistry
+from game_codes import CodeAllocator, DEFAULT_ALPHABET, DEFAULT_LENGTH
+from game_model import MAX_PLAYERS, Game
+from game_store import create_store
+from event_log import EventLog
+from history_store import HISTORY_PATH, HistoryWriter
 from logging_utils import setup_logger, log_socket_event
+from timers import TimerScheduler
+import metrics
+import wire
+import profiling
+import word_index
+from build_assets import ASSET_DIR, MANIFEST_NAME
+import embeddings
+import suggest_index
 
 # Set up logger
 logger = setup_logger('server', 'server.log')
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.urandom(24)
-socketio = SocketIO(app, cors_allowed_origins="*")
+# With a message queue (e.g. redis://...), room broadcasts reach clients
+# connected to any server process
+# serve.py sets the rest from config/config.json; unset, Flask-SocketIO
+# picks the async mode and the engine.io defaults apply
+socketio_options = {name: convert(os.environ[var]) for var, name, convert in (
+    ('SOCKETIO_ASYNC_MODE', 'async_mode', str),
+    ('SOCKETIO_PING_INTERVAL', 'ping_interval', float),
+    ('SOCKETIO_PING_TIMEOUT', 'ping_timeout', float),
+    ('SOCKETIO_MAX_MESSAGE_SIZE', 'max_http_buffer_size', int),
+) if os.environ.get(var)}
+socketio = SocketIO(app, cors_allowed_origins="*",
+                    message_queue=os.environ.get('SOCKETIO_MESSAGE_QUEUE'),
+                    **socketio_options)
 
-# Game state
-games: Dict[str, dict] = {}  # Store game states
-players: Dict[str, str] = {}  # Map player SIDs to game codes
-connected_users: Set[str] = set()  # Track connected user session IDs
+# Game state: 'memory' for a single process, or a shared backend such as
+# 'sqlite:///games.db' so several processes can host games
+store = create_store(os.environ.get('GAME_STORE', 'memory'))
+game_codes = CodeAllocator(store,
+                           length=int(os.environ.get('GAME_CODE_LENGTH', DEFAULT_LENGTH)),
+                           alphabet=os.environ.get('GAME_CODE_ALPHABET', DEFAULT_ALPHABET))
 
-# Load targets from file
-with open('data/targets.txt', 'r') as f:
-    TARGETS = [line.strip() for line in f if line.strip()]
-    logger.info(f"Loaded {len(TARGETS)} targets")
+# Ended games are appended to an analytics database by a background
+# writer; set HISTORY_DB to an empty string to turn this off
+HISTORY_DB = os.environ.get('HISTORY_DB', HISTORY_PATH)
+history = HistoryWriter(HISTORY_DB) if HISTORY_DB else None
 
-# Load wordlist from file
-with open('data/words_alpha.txt', 'r') as f:
-    VALID_WORDS = {line.strip().lower() for line in f if line.strip()}
-    logger.info(f"Loaded {len(VALID_WORDS)} valid words")
+# Seconds a player has to add a word before the turn passes on, and how
+# long waiting and playing games may go without a join, word or guess
+# before they are removed; 0 turns a limit off
+TURN_TIMEOUT = float(os.environ.get('TURN_TIMEOUT', 60))
+WAITING_GAME_TTL = float(os.environ.get('WAITING_GAME_TTL', 600))
+PLAYING_GAME_TTL = float(os.environ.get('PLAYING_GAME_TTL', 1800))
+# Seconds a disconnected player's seat is held for them to resume (0 to
+# remove players as soon as they disconnect)
+RESUME_GRACE = float(os.environ.get('RESUME_GRACE', 30))
+
+# Spectators get at most one update per game this often, covering every
+# change since the last one, however many moves were made in between
+SPECTATOR_INTERVAL = float(os.environ.get('SPECTATOR_INTERVAL', 1))
+
+# Public games are listed in the lobby. New subscribers get up to
+# LOBBY_LISTING_LIMIT of the best ones; after that they get at most one
+# update every LOBBY_INTERVAL seconds with the listings that changed
+LOBBY_ROOM = 'lobby'
+LOBBY_LISTING_LIMIT = int(os.environ.get('LOBBY_LISTING_LIMIT', 50))
+LOBBY_INTERVAL = float(os.environ.get('LOBBY_INTERVAL', 1))
+# Quick-joining players wait in a queue when no game is open, and get a new
+# game of their own once this many are waiting
+MATCH_SIZE = min(int(os.environ.get('MATCH_SIZE', 4)), MAX_PLAYERS)
+
+# Listing changes made by this process since the last lobby update, by
+# game code; None for games no longer listed
+lobby_changes = {}
+lobby_lock = threading.Lock()
+
+# Set when the process is shutting down: games in progress carry on, but no
+# new games are created or joined here
+draining = False
+
+# Each client's events run one at a time in the order they arrived, and so
+# do each game's, whether from its players or its timers. Different games
+# run in parallel
+client_actors = ActorRegistry()
+game_actors = ActorRegistry()
+
+# Recent room events per game, replayed to players who resume
+event_log = EventLog()
+
+# One scheduler drives every turn timeout and idle check in this process
+timers = TimerScheduler()
+socketio.start_background_task(timers.run_forever, socketio.sleep)
+
+# Map the compiled word list and targets, building the index if needed
+WORDS = word_index.load_or_build()
+logger.info(f"Loaded {len(WORDS)} valid words and {WORDS.target_count} targets")
+# "Did you mean" suggestions for rejected words, building the index if it
+# is missing or out of date, so they are there from the first rejection
+suggester = suggest_index.load_or_build(WORDS, logger=logger)
+# Embeddings of every target and word, for telling guessers how close they
+# were; None if the table (built with embeddings.py) or numpy is missing
+embedding_table = embeddings.load(WORDS, logger=logger)
+
+# Content-hashed asset names from build_assets.py; without a build, pages
+# link to the plain files in static/
+try:
+    with open(os.path.join(ASSET_DIR, MANIFEST_NAME)) as f:
+        ASSET_MANIFEST = json.load(f)
+    logger.info(f"Serving {len(ASSET_MANIFEST)} built assets")
+except FileNotFoundError:
+    ASSET_MANIFEST = {}
+# Hashed assets never change, so browsers may keep them for a year
+ASSET_MAX_AGE = 365 * 24 * 3600
 
 # Regex pattern for word validation - only letters allowed
 WORD_PATTERN = re.compile(r'^[a-zA-Z]+$')
 
-# Pastel colors for players
-PLAYER_COLORS = [
-    '#FFB3BA',  # pastel pink
-    '#BAFFC9',  # pastel green
-    '#BAE1FF',  # pastel blue
-    '#FFFFBA',  # pastel yellow
-    '#FFB3FF',  # pastel purple
-    '#FFD9BA',  # pastel orange
-]
+# Live games and players, read from the store whenever metrics are scraped
+metrics.register_gauge('games', 'Games in the store, by state', ['state'],
+                       lambda: {(state,): n for state, n in store.count_by_state().items()})
+metrics.register_gauge('connected_players', 'Players bound to a game', [],
+                       lambda: {(): store.connected_count()})
+metrics.register_gauge('history_queue', 'Ended games waiting to be written to the history database', [],
+                       lambda: {(): history.queue.qsize() if history else 0})
+metrics.register_gauge('busy_games', 'Games with events running or waiting to run', [],
+                       lambda: {(): len(game_actors)})
+metrics.register_gauge('open_games', 'Public games listed in the lobby with seats free', [],
+                       lambda: {(): store.open_game_count()})
+metrics.register_gauge('matchmaking_queue', 'Players waiting for a game to open', [],
+                       lambda: {(): store.queued_count()})
+metrics.register_gauge('pending_timers', 'Turn timeouts and idle checks waiting to fire', [],
+                       lambda: {(): len(timers)})
+
+def room_size(room: str) -> int:
+    """Clients in a room that are connected to this process"""
+    return len(socketio.server.manager.rooms.get('/', {}).get(room, ()))
+
+def emit(event, data, room=None, skip_sid=None):
+    """Emit an event to the sender or a room, recording it in the metrics"""
+    recipients = 1 if room is None else room_size(room) - (skip_sid is not None)
+    metrics.record_emit(event, data, recipients)
+    socketio_emit(event, data, room=room, skip_sid=skip_sid)
+
+def emit_by_role(game, event, builder_data, guesser_data):
+    """Send one payload to all the word builders and another to the guesser.
+
+    A room emit is encoded once and the same packet goes to every member,
+    so this costs two encodings however many players there are.
+    """
+    log_socket_event(logger, "SENT", event, builder_data)
+    emit(event, builder_data, room=game.code, skip_sid=game.guesser.sid)
+    log_socket_event(logger, "SENT", event, guesser_data)
+    emit(event, guesser_data, room=game.guesser.sid)
+
+def join_game_rooms(game_code, sid=None, encoding=None):
+    """Join a client (by default the one being handled) to a game's room, and
+    the room for its encoding of hot events"""
+    join_room(game_code, sid=sid)
+    join_room(f"{game_code}:{encoding or session.get('encoding', 'json')}", sid=sid)
+
+def leave_game_rooms(game_code, sid):
+    for room in (game_code, *(f'{game_code}:{encoding}' for encoding in wire.ENCODINGS)):
+        leave_room(room, sid=sid)
+
+def spectator_room(game_code):
+    """Spectators have a room of their own, so nothing meant for players reaches them"""
+    return f'{game_code}:spectators'
+
+def close_game_rooms(game_code):
+    """Take everyone out of a game's rooms, on every server process"""
+    for room in (game_code, *(f'{game_code}:{encoding}' for encoding in wire.ENCODINGS),
+                 spectator_room(game_code)):
+        socketio.close_room(room)
+
+def emit_hot(game, event, data):
+    """Send a frequent room event, compactly encoded to the clients that asked for it"""
+    log_socket_event(logger, "SENT", event, data)
+    event_log.append(game.code, data['seq'], event, data)
+    emit(event, data, room=f'{game.code}:json')
+    if wire.msgpack:
+        emit(event, wire.encode(event, data), room=f'{game.code}:msgpack')
+
+def broadcast(event, data, room):
+    """Emit to a room from outside a socket handler, e.g. from a timer"""
+    metrics.record_emit(event, data, room_size(room))
+    log_socket_event(logger, "SENT", event, data)
+    socketio.emit(event, data, to=room)
+
+def broadcast_to_game(game, event, data):
+    """Send a sequenced event to a game's room, keeping it for resuming players"""
+    event_log.append(game.code, data['seq'], event, data)
+    broadcast(event, data, game.code)
+
+def notify_spectators(game):
+    """Note that a game changed, for the next spectator update to pick up.
+
+    Only the first change after an update schedules another; later ones
+    are folded into it, so a move costs the same however many watch.
+    """
+    if not game.spectators:
+        return
+    now = time.time()
+    # An update long overdue was lost with the process that scheduled it
+    if game.spectator_update_at is not None and game.spectator_update_at > now - SPECTATOR_INTERVAL:
+        metrics.SPECTATOR_CHANGES_COALESCED.inc()
+        return
+    game.spectator_update_at = max(now, game.spectated_at + SPECTATOR_INTERVAL)
+    timers.call_at(game.spectator_update_at, update_spectators, game.code)
+
+def update_spectators(game_code):
+    """Send spectators everything that changed since their last update"""
+    with game_actors.acting_for(game_code), store.transaction():
+        game = store.get(game_code)
+        if not game or game.spectator_update_at is None:
+            return
+        response_data = game.spectator_update()
+        store.save(game)
+        broadcast('spectator_update', response_data, spectator_room(game_code))
+        metrics.SPECTATOR_UPDATES.inc()
+
+def stop_watching(sid):
+    """Take a spectator out of the game they were watching"""
+    game_code = session.pop('watching', None)
+    if not game_code:
+        return
+    leave_room(spectator_room(game_code), sid=sid)
+    game = store.get(game_code)
+    if game:
+        game.spectators = max(game.spectators - 1, 0)
+        store.save(game)
+
+def notify_lobby(game, removed=False):
+    """Note a public game's listing change for the next lobby update"""
+    if not game.public:
+        return
+    with lobby_lock:
+        first = not lobby_changes
+        lobby_changes[game.code] = game.lobby_entry() if game.open_slots() and not removed else None
+    if first:
+        timers.call_later(LOBBY_INTERVAL, update_lobby)
+
+def update_lobby():
+    """Send lobby subscribers every listing that changed since the last update"""
+    global lobby_changes
+    with lobby_lock:
+        changes, lobby_changes = lobby_changes, {}
+    broadcast('lobby_update', {
+        'games': [entry for entry in changes.values() if entry],
+        'removed': [code for code, entry in changes.items() if entry is None]
+    }, LOBBY_ROOM)
+
+def free_name(game, name):
+    """The name, numbered if someone in the game already has it"""
+    candidate, n = name, 2
+    while candidate in game.by_name:
+        candidate, n = f'{name} {n}', n + 1
+    return candidate
+
+def leave_queue():
+    """Take the client being handled out of the matchmaking queue"""
+    if session.pop('queued', None):
+        store.remove_queued(request.sid)
+
+def seat_player(game, name):
+    """Seat the client being handled in a waiting game and tell everyone in it"""
+    sid = request.sid
+    leave_queue()
+    player = game.add_player(sid, free_name(game, name))
+    store.bind(sid, game.code)
+    join_game_rooms(game.code)
+    response_data = {'gameCode': game.code, 'playerName': player.name}
+    log_socket_event(logger, "SENT", "matched", response_data)
+    emit('matched', response_data)
+    send_resume_token(game, player)
+
+    # Send updated player list with colors
+    response_data = {
+        'seq': game.next_seq(),
+        'players': game.roster(),
+        'gameCode': game.code
+    }
+    notify_spectators(game)
+    notify_lobby(game)
+    store.save(game)
+    log_socket_event(logger, "SENT", "player_joined", response_data)
+    event_log.append(game.code, response_data['seq'], 'player_joined', response_data)
+    emit('player_joined', response_data, room=game.code)
+
+def offer_seats(game, players):
+    """Tell players taken off the matchmaking queue about an open game.
+
+    Each takes a seat with a quick_join of its own, so it is seated as its
+    own client's event, and is queued again if the game has filled by then.
+    """
+    for sid, _, _ in players:
+        response_data = {'gameCode': game.code}
+        log_socket_event(logger, "SENT", "game_found", response_data)
+        emit('game_found', response_data, room=sid)
+
+def create_matched_game(name, game_code):
+    """Start a public game for the client being handled, offering its other
+    seats to MATCH_SIZE - 1 queued players; returns False, releasing the
+    code, if too few are waiting after all"""
+    players = store.dequeue_players(MATCH_SIZE - 1, MATCH_SIZE - 1)
+    # Players who joined a game by code while queued are done waiting
+    waiting = [p for p in players if not store.game_code_for(p[0])]
+    if len(waiting) < MATCH_SIZE - 1:
+        for player in waiting:
+            store.enqueue_player(player)
+        game_codes.release(game_code)
+        return False
+    game = Game(game_code, public=True)
+    store.add(game)
+    metrics.GAMES_CREATED.inc()
+    metrics.GAMES_MATCHED.inc()
+    schedule_idle_check(game)
+    seat_player(game, name)
+    offer_seats(game, waiting)
+    logger.info(f"Matched {len(waiting) + 1} waiting players into game {game_code}")
+    return True
+
+def new_game_code(*_):
+    """Allocate the code of a game the handler is about to create, so the
+    game's actor is taken before the handler's transaction starts. Sets
+    g.new_game_code, None when the handler will refuse or codes ran out"""
+    g.new_game_code = None
+    if draining or session.get('watching'):
+        return None
+    try:
+        g.new_game_code = game_codes.allocate()
+    except RuntimeError:
+        pass
+    return g.new_game_code
+
+def pick_open_game(data):
+    """The game for a quick join: the one offered to a queued player, or the
+    best open one, or a new one if enough players are waiting to fill it.
+    It's picked before that game's actor is taken, so the handler must check
+    it still has room"""
+    offered = game_codes.normalize(data.get('gameCode'))
+    g.open_game = offered or store.best_open_game()
+    g.new_game_code = None
+    if not g.open_game and store.queued_count() + 1 >= MATCH_SIZE:
+        return new_game_code()
+    return g.open_game
+
+def local_games_in_play() -> int:
+    """Games being played by at least one client connected to this process"""
+    sids = list(socketio.server.manager.rooms.get('/', {}).get(None, ()))
+    codes = {store.game_code_for(sid) for sid in sids} - {None}
+    return sum(1 for code in codes if (game := store.get(code)) and game.state == 'playing')
+
+def delete_game(game_code):
+    store.delete(game_code)
+    game_codes.release(game_code)
+    event_log.drop(game_code)
+
+def remove_player(game, player):
+    """Take a player out of a game for good, deleting the game once it's empty"""
+    if history and game.state == 'playing' and game.players == [player]:
+        # Recorded while the last player is still on the roster
+        history.record(game, 'abandoned')
+    game.remove_player(player)
+    store.unbind(player.sid)
+    if not game.players:
+        logger.info(f"Game {game.code} ended - no players remaining")
+        if game.spectators:
+            broadcast('game_expired', {'seq': game.next_seq(), 'reason': 'abandoned'},
+                      spectator_room(game.code))
+            socketio.close_room(spectator_room(game.code))
+        notify_lobby(game, removed=True)
+        delete_game(game.code)
+        return
+    # Notify remaining players
+    remaining_players = [p.name for p in game.players]
+    logger.info(f"Player left game {game.code}. Remaining: {remaining_players}")
+    broadcast_to_game(game, 'player_left', {
+        'seq': game.next_seq(),
+        'players': remaining_players,
+        'currentTurn': game.turn.name if game.turn else None
+    })
+    notify_spectators(game)
+    notify_lobby(game)
+    store.save(game)
+
+def check_resume(game_code, token):
+    """Give up a disconnected player's seat once the grace window is over"""
+    with game_actors.acting_for(game_code), store.transaction():
+        game = store.get(game_code)
+        player = game.by_token.get(token) if game else None
+        if not player or player.disconnected_at is None:
+            return
+        deadline = player.disconnected_at + RESUME_GRACE
+        if time.time() < deadline:
+            timers.call_at(deadline, check_resume, game_code, token)
+            return
+        logger.info(f"{player.name} did not resume game {game_code} in time")
+        remove_player(game, player)
+
+def game_ttl(game) -> float:
+    return WAITING_GAME_TTL if game.state == 'waiting' else PLAYING_GAME_TTL
+
+def schedule_idle_check(game):
+    if game_ttl(game):
+        timers.call_at(game.last_activity + game_ttl(game), check_idle, game.code)
+
+def check_idle(game_code):
+    """Remove a game that has gone quiet, or check again at its new deadline"""
+    with game_actors.acting_for(game_code), store.transaction():
+        game = store.get(game_code)
+        if not game or not game_ttl(game):
+            return
+        deadline = game.last_activity + game_ttl(game)
+        if time.time() < deadline:
+            timers.call_at(deadline, check_idle, game_code)
+            return
+        logger.info(f"Game {game_code} expired after {game_ttl(game):.0f}s without activity")
+        if history and game.state == 'playing':
+            history.record(game, 'expired')
+        response_data = {'seq': game.next_seq(), 'reason': 'idle'}
+        broadcast('game_expired', response_data, game_code)
+        if game.spectators:
+            broadcast('game_expired', response_data, spectator_room(game_code))
+        close_game_rooms(game_code)
+        for p in game.players:
+            store.unbind(p.sid)
+        notify_lobby(game, removed=True)
+        delete_game(game_code)
+        metrics.GAMES_EXPIRED.inc()
+
+def schedule_turn_timeout(game):
+    if TURN_TIMEOUT and game.turn:
+        timers.call_at(game.turn_started + TURN_TIMEOUT, check_turn, game.code)
+
+def check_turn(game_code):
+    """Pass the turn on if its player has run out of time"""
+    with game_actors.acting_for(game_code), store.transaction():
+        game = store.get(game_code)
+        if not game or game.state != 'playing' or not game.turn:
+            return
+        deadline = game.turn_started + TURN_TIMEOUT
+        if time.time() < deadline:
+            # The turn has moved on since this check was scheduled
+            timers.call_at(deadline, check_turn, game_code)
+            return
+        skipped = game.turn
+        game.advance_turn()
+        if game.turn is skipped:
+            # Nobody else can take the turn, so it just starts over
+            store.save(game)
+            schedule_turn_timeout(game)
+            return
+        logger.info(f"Turn timed out in game {game_code}: {skipped.name} -> {game.turn.name}")
+        broadcast_to_game(game, 'turn_passed', {
+            'seq': game.next_seq(),
+            'player': skipped.name,
+            'currentTurn': game.turn.name
+        })
+        notify_spectators(game)
+        store.save(game)
+        metrics.TURNS_PASSED.inc()
+        schedule_turn_timeout(game)
+
+def send_resume_token(game, player):
+    """Give a player the token they need to resume after a dropped connection"""
+    # Not logged, since the token is all it takes to play as this player
+    response_data = {'token': f'{game.code}.{player.token}'}
+    emit('resume_token', response_data, room=player.sid)
+
+def in_game_actor(code_from=None):
+    """Run a socket handler as the next event of its client and of its game.
+
+    The game is the one the client is in, or for a client not yet in one,
+    ``code_from(data)``. The handler runs inside a store transaction.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            sid = request.sid
+            with client_actors.acting_for(sid):
+                # Only this client's own events bind it to a game, so this
+                # can't change while we wait; it can only be unbound, which
+                # the handler sees as the game being gone
+                game_code = store.game_code_for(sid) or (code_from(*args) if code_from else None)
+                with game_actors.acting_for(game_code), store.transaction():
+                    return handler(*args, **kwargs)
+        return wrapper
+    return decorator
 
 @app.route('/')
 def index():
     logger.info(f"Index page requested from {request.remote_addr}")
     return render_template('index.html')
 
+@app.template_global()
+def asset_url(path):
+    """URL of a static file, under its content-hashed name once built"""
+    if path in ASSET_MANIFEST:
+        return url_for('built_asset', filename=ASSET_MANIFEST[path])
+    return url_for('static', filename=path)
+
+@app.route('/assets/<path:filename>')
+def built_asset(filename):
+    """A built asset, precompressed if the client accepts it"""
+    accepted = request.accept_encodings
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[candidate] and os.path.isfile(os.path.join(ASSET_DIR, filename + suffix)):
+            encoding = candidate
+            break
+    served = filename + {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+    # The hash is in the name, so the name and encoding make a strong ETag
+    response = send_from_directory(os.path.abspath(ASSET_DIR), served,
+                                   mimetype=mimetypes.guess_type(filename)[0],
+                                   etag=f'{filename}:{encoding or "identity"}', max_age=ASSET_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/metrics')
+def metrics_page():
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up and answering requests"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: the store is reachable and new games are being accepted"""
+    if draining:
+        return jsonify({'status': 'draining', 'gamesInPlay': local_games_in_play()}), 503
+    try:
+        store.connected_count()
+    except Exception as e:
+        logger.error(f"Readiness check failed: {e}")
+        return jsonify({'status': 'store unavailable'}), 503
+    return jsonify({'status': 'ready'})
+
+def admin_only(view):
+    """Require the ADMIN_TOKEN bearer token; without one set, admin routes don't exist"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = os.environ.get('ADMIN_TOKEN')
+        if not token:
+            abort(404)
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/admin/profile', methods=['GET'])
+@admin_only
+def profile_status():
+    return jsonify(profiling.status())
+
+@app.route('/admin/profile', methods=['POST'])
+@admin_only
+def profile_start():
+    options = request.get_json(silent=True) or {}
+    try:
+        sessions = profiling.start(
+            options.get('events') or [],
+            mode=options.get('mode', 'cprofile'),
+            seconds=float(options.get('seconds', 30)),
+            fraction=float(options.get('fraction', 1.0)),
+            interval=float(options.get('interval', 0.005)))
+    except (TypeError, ValueError) as e:
+        return jsonify({'message': str(e)}), 400
+    logger.warning(f"Profiling started from {request.remote_addr}: {sessions}")
+    return jsonify({'active': sessions})
+
+@app.route('/admin/profile', methods=['DELETE'])
+@admin_only
+def profile_stop():
+    return jsonify({'finished': profiling.stop(request.args.get('event'))})
+
+@app.route('/admin/profile/<path:name>')
+@admin_only
+def profile_download(name):
+    return send_from_directory(os.path.abspath(profiling.PROFILE_DIR), name, as_attachment=True)
+
 @socketio.on('connect')
-def handle_connect():
+@metrics.instrument('connect')
+@profiling.profiled('connect')
+def handle_connect(auth=None):
     logger.info(f"Client connected: {request.sid}")
     session['connected'] = True
+    # Clients may ask for the compact binary encoding of hot events
+    session['encoding'] = wire.negotiate((auth or {}).get('encoding'))
 
 @socketio.on('disconnect')
-def handle_disconnect():
+@metrics.instrument('disconnect')
+@profiling.profiled('disconnect')
+@in_game_actor(lambda *_: session.get('watching'))
+def handle_disconnect(reason=None):
     sid = request.sid
     logger.info(f"Client disconnecting: {sid}")
-    if sid in players:
-        game_code = players[sid]
-        if game_code in games:
-            game = games[game_code]
-            # Remove player from game
-            game['players'] = [p for p in game['players'] if p['sid'] != sid]
-            # If no players left, remove the game
-            if not game['players']:
-                logger.info(f"Game {game_code} ended - no players remaining")
-                del games[game_code]
-            else:
-                # Notify remaining players
-                remaining_players = [p['name'] for p in game['players']]
-                logger.info(f"Player left game {game_code}. Remaining: {remaining_players}")
-                emit('player_left', {
-                    'players': remaining_players
-                }, room=game_code)
-        del players[sid]
-    connected_users.discard(sid)
+    leave_queue()
+    if session.get('watching'):
+        stop_watching(sid)
+        return
+    game_code = store.game_code_for(sid)
+    game = store.get(game_code) if game_code else None
+    player = game.get_player(sid) if game else None
+    if player is None:
+        store.unbind(sid)
+        return
+    if RESUME_GRACE:
+        # Hold the seat quietly; the other players only hear about it if
+        # the player doesn't come back in time
+        game.hold_seat(player)
+        store.save(game)
+        store.unbind(sid)
+        timers.call_at(player.disconnected_at + RESUME_GRACE, check_resume, game_code, player.token)
+        logger.info(f"Holding {player.name}'s seat in game {game_code} for {RESUME_GRACE:.0f}s")
+    else:
+        remove_player(game, player)
 
 @socketio.on('create_game')
+@metrics.instrument('create_game')
+@profiling.profiled('create_game')
+@in_game_actor(new_game_code)
 def on_create_game(data):
     sid = request.sid
     log_socket_event(logger, "RECEIVED", "create_game", data)
     
-    if sid in players:
+    if store.game_code_for(sid) or session.get('watching'):
         error_msg = {'message': 'You are already in a game'}
         log_socket_event(logger, "SENT", "error", error_msg)
         emit('error', error_msg)
         return
 
-    game_code = generate_game_code()
+    if draining:
+        error_msg = {'message': 'Server is restarting, try again in a moment'}
+        log_socket_event(logger, "SENT", "error", error_msg)
+        emit('error', error_msg)
+        return
+
+    # Allocated by new_game_code, so anyone joining as soon as the game is
+    # visible waits on its actor until the host is set up
+    game_code = g.new_game_code
+    if not game_code:
+        error_msg = {'message': 'No game codes available, try again later'}
+        log_socket_event(logger, "SENT", "error", error_msg)
+        emit('error', error_msg)
+        return
     host_name = data.get('playerName')
+    leave_queue()
     
-    games[game_code] = {
-        'players': [{
-            'name': host_name,
-            'sid': sid,
-            'is_host': True,
-            'color': PLAYER_COLORS[0]
-        }],
-        'current_sentence': [],
-        'current_turn_index': 0,
-        'guesser_index': None,
-        'subject': None,
-        'state': 'waiting',
-        'guesses': [],
-        'score': 10  # Start with 10 points
-    }
+    game = Game(game_code, public=bool(data.get('public')))
+    game.add_player(sid, host_name)
+    store.add(game)
+    notify_lobby(game)
+    metrics.GAMES_CREATED.inc()
+    schedule_idle_check(game)
     
-    players[sid] = game_code
-    connected_users.add(sid)
-    join_room(game_code)
+    store.bind(sid, game_code)
+    join_game_rooms(game_code)
     
     response_data = {
+        'seq': game.seq,
         'gameCode': game_code,
-        'players': [{
-            'name': host_name,
-            'color': PLAYER_COLORS[0],
-            'isHost': True
-        }]
+        'players': game.roster()
     }
     log_socket_event(logger, "SENT", "game_created", response_data)
     emit('game_created', response_data)
+    send_resume_token(game, game.get_player(sid))
+
+    if game.public:
+        # Players waiting for a game get this one
+        offer_seats(game, store.dequeue_players(game.open_slots()))
 
 @socketio.on('join_game')
+@metrics.instrument('join_game')
+@profiling.profiled('join_game')
+@in_game_actor(lambda data: game_codes.normalize(data.get('gameCode')))
 def on_join_game(data):
     sid = request.sid
     log_socket_event(logger, "RECEIVED", "join_game", data)
     
-    if sid in players:
+    if store.game_code_for(sid) or session.get('watching'):
         error_msg = {'message': 'You are already in a game'}
         log_socket_event(logger, "SENT", "error", error_msg)
         emit('error', error_msg)
         return
 
-    game_code = data.get('gameCode')
+    if draining:
+        error_msg = {'message': 'Server is restarting, try again in a moment'}
+        log_socket_event(logger, "SENT", "error", error_msg)
+        emit('error', error_msg)
+        return
+
+    game_code = game_codes.normalize(data.get('gameCode'))
     player_name = data.get('playerName')
     
-    if game_code not in games:
+    game = store.get(game_code)
+    if not game:
         error_msg = {'message': 'Game not found'}
         log_socket_event(logger, "SENT", "error", error_msg)
         emit('error', error_msg)
         return
         
-    game = games[game_code]
-    if game['state'] != 'waiting':
+    if game.state != 'waiting':
         error_msg = {'message': 'Game has already started'}
         log_socket_event(logger, "SENT", "error", error_msg)
         emit('error', error_msg)
         return
 
-    if any(p['name'] == player_name for p in game['players']):
+    if len(game.players) >= MAX_PLAYERS:
+        error_msg = {'message': 'Game is full'}
+        log_socket_event(logger, "SENT", "error", error_msg)
+        emit('error', error_msg)
+        return
+
+    if player_name in game.by_name:
         error_msg = {'message': 'Name already taken'}
         log_socket_event(logger, "SENT", "error", error_msg)
         emit('error', error_msg)
         return
         
-    # Assign next available color
-    player_color = PLAYER_COLORS[len(game['players']) % len(PLAYER_COLORS)]
-    
-    game['players'].append({
-        'name': player_name,
-        'sid': sid,
-        'is_host': False,
-        'color': player_color
-    })
-    
-    players[sid] = game_code
-    connected_users.add(sid)
-    join_room(game_code)
-    
-    # Send updated player list with colors
-    player_info = [{
-        'name': p['name'],
-        'color': p['color'],
-        'isHost': p['is_host']
-    } for p in game['players']]
-    
-    response_data = {
-        'players': player_info,
-        'gameCode': game_code
-    }
-    log_socket_event(logger, "SENT", "player_joined", response_data)
-    emit('player_joined', response_data, room=game_code)
+    seat_player(game, player_name)
 
 @socketio.on('start_game')
+@metrics.instrument('start_game')
+@profiling.profiled('start_game')
+@in_game_actor()
 def on_start_game(data):
     sid = request.sid
     log_socket_event(logger, "RECEIVED", "start_game", data)
     
-    game_code = players.get(sid)
-    if not game_code or game_code not in games:
+    game_code = store.game_code_for(sid)
+    game = store.get(game_code) if game_code else None
+    if not game:
         error_msg = {'message': 'Game not found'}
         log_socket_event(logger, "SENT", "error", error_msg)
         emit('error', error_msg)
         return
         
-    game = games[game_code]
-    if not any(p['sid'] == sid and p['is_host'] for p in game['players']):
+    player = game.get_player(sid)
+    if player is None or not player.is_host:
         error_msg = {'message': 'Only host can start the game'}
         log_socket_event(logger, "SENT", "error", error_msg)
         emit('error', error_msg)
         return
     
-    if len(game['players']) < 2:
+    if len(game.players) < 2:
         error_msg = {'message': 'Need at least 2 players to start'}
         log_socket_event(logger, "SENT", "error", error_msg)
         emit('error', error_msg)
         return
         
-    game['state'] = 'playing'
-    game['subject'] = random.choice(TARGETS)
-    logger.info(f"Game {game_code} started with subject: {game['subject']}")
-    
-    # Randomly select guesser
-    game['guesser_index'] = random.randint(0, len(game['players']) - 1)
-    guesser_name = game['players'][game['guesser_index']]['name']
-    logger.info(f"Selected guesser: {guesser_name}")
+    # Randomly select guesser; the first turn goes to the player after them
+    game.start(WORDS.random_target(), random.choice(game.players))
+    logger.info(f"Game {game_code} started with subject: {game.subject}")
+    logger.info(f"Selected guesser: {game.guesser.name}")
     
-    # Set first turn to the player after the guesser
-    game['current_turn_index'] = (game['guesser_index'] + 1) % len(game['players'])
-    first_turn_player = game['players'][game['current_turn_index']]['name']
-    
-    # Prepare player info for all players
-    player_info = [{
-        'name': p['name'],
-        'color': p['color'],
-        'isGuesser': game['players'].index(p) == game['guesser_index'],
-        'isHost': p['is_host']
-    } for p in game['players']]
-    
-    # Send different information to guesser and other players
-    for player in game['players']:
-        if game['players'].index(player) == game['guesser_index']:
-            response_data = {
-                'isGuesser': True,
-                'subject': None,
-                'currentTurn': first_turn_player,
-                'players': player_info,
-                'score': game['score']  # Send initial score
-            }
-        else:
-            response_data = {
-                'isGuesser': False,
-                'subject': game['subject'],
-                'currentTurn': first_turn_player,
-                'players': player_info,
-                'score': game['score']  # Send initial score
-            }
-        log_socket_event(logger, "SENT", "game_started", response_data)
-        emit('game_started', response_data, room=player['sid'])
-    
-    # Send initial sentence state to all players
-    sentence_data = {
-        'sentence': game['current_sentence'],
-        'currentTurn': first_turn_player,
-        'subject': game['subject'],
-        'players': player_info,
-        'score': game['score']  # Send initial score
+    # game_started doubles as the initial snapshot, so no separate
+    # sentence_updated is needed to seed the (empty) sentence
+    seq = game.next_seq()
+    notify_spectators(game)
+    notify_lobby(game)
+    store.save(game)
+    if not WAITING_GAME_TTL:
+        # Otherwise the idle check scheduled at creation carries on with
+        # the playing TTL
+        schedule_idle_check(game)
+    schedule_turn_timeout(game)
+
+    # Only the guesser's copy differs: no subject
+    response_data = {
+        'seq': seq,
+        'isGuesser': False,
+        'subject': game.subject,
+        'currentTurn': game.turn.name,
+        'players': game.roster(),
+        'score': game.score  # Send initial score
     }
-    log_socket_event(logger, "SENT", "sentence_updated", sentence_data)
-    emit('sentence_updated', sentence_data, room=game_code)
+    emit_by_role(game, 'game_started', response_data,
+                 dict(response_data, isGuesser=True, subject=None))
 
 @socketio.on('add_word')
+@metrics.instrument('add_word')
+@profiling.profiled('add_word')
+@in_game_actor()
 def on_add_word(data):
     sid = request.sid
     log_socket_event(logger, "RECEIVED", "add_word", data)
     
-    game_code = players.get(sid)
-    if not game_code or game_code not in games:
+    game_code = store.game_code_for(sid)
+    game = store.get(game_code) if game_code else None
+    if not game:
         error_msg = {'message': 'Game not found'}
         log_socket_event(logger, "SENT", "error", error_msg)
         emit('error', error_msg)
         return
         
-    game = games[game_code]
-    if game['state'] != 'playing':
+    if game.state != 'playing':
         error_msg = {'message': 'Game is not in playing state'}
         log_socket_event(logger, "SENT", "error", error_msg)
         emit('error', error_msg)
         return
         
-    player_index = next((i for i, p in enumerate(game['players']) if p['sid'] == sid), None)
-    if player_index != game['current_turn_index']:
+    player = game.get_player(sid)
+    if player is None or player is not game.turn:
         error_msg = {'message': 'Not your turn'}
         log_socket_event(logger, "SENT", "error", error_msg)
         emit('error', error_msg)
@@ -295,68 +831,51 @@ def on_add_word(data):
         return
 
     # Verify the word is in our wordlist
-    if word.lower() not in VALID_WORDS:
-        error_msg = {'message': f'"{word}" is not a valid English word'}
+    if word not in WORDS:
+        error_msg = {'message': f'"{word}" is not a valid English word', 'suggestions': suggester.suggest(word)}
         log_socket_event(logger, "SENT", "error", error_msg)
         emit('error', error_msg)
         return
         
-    # Store word with player's color
-    player_color = game['players'][player_index]['color']
-    game['current_sentence'].append({
-        'word': word,
-        'color': player_color,
-        'player': game['players'][player_index]['name']
-    })
+    # Store word with player's color and pass the turn on
+    word_data = game.add_word(player, word)
     logger.info(f"Word added to game {game_code}: {word}")
-    
-    # Apply score penalty if more than 3 words have been added
-    if len(game['current_sentence']) > 3:
-        game['score'] -= 1
-    
-    game['current_turn_index'] = (game['current_turn_index'] + 1) % len(game['players'])
-    if game['current_turn_index'] == game['guesser_index']:
-        game['current_turn_index'] = (game['current_turn_index'] + 1) % len(game['players'])
-        
-    # Prepare player info
-    player_info = [{
-        'name': p['name'],
-        'color': p['color'],
-        'isGuesser': game['players'].index(p) == game['guesser_index'],
-        'isHost': p['is_host']
-    } for p in game['players']]
-    
+
+    # Only the new word is sent; clients append it to their copy of the sentence
     response_data = {
-        'sentence': game['current_sentence'],
-        'currentTurn': game['players'][game['current_turn_index']]['name'],
-        'subject': game['subject'],
-        'players': player_info,
-        'score': game['score']  # Include shared score
+        'seq': game.next_seq(),
+        'word': word_data,
+        'currentTurn': game.turn.name,
+        'score': game.score  # Include shared score
     }
-    log_socket_event(logger, "SENT", "sentence_updated", response_data)
-    emit('sentence_updated', response_data, room=game_code)
+    notify_spectators(game)
+    store.save(game)
+    emit_hot(game, 'sentence_updated', response_data)
 
 @socketio.on('make_guess')
+@metrics.instrument('make_guess')
+@profiling.profiled('make_guess')
+@in_game_actor()
 def on_make_guess(data):
     sid = request.sid
     log_socket_event(logger, "RECEIVED", "make_guess", data)
     
-    game_code = players.get(sid)
-    if not game_code or game_code not in games:
+    game_code = store.game_code_for(sid)
+    game = store.get(game_code) if game_code else None
+    if not game:
         error_msg = {'message': 'Game not found'}
         log_socket_event(logger, "SENT", "error", error_msg)
         emit('error', error_msg)
         return
         
-    game = games[game_code]
-    if game['state'] != 'playing':
+    if game.state != 'playing':
         error_msg = {'message': 'Game is not in playing state'}
         log_socket_event(logger, "SENT", "error", error_msg)
         emit('error', error_msg)
         return
         
-    player_index = next((i for i, p in enumerate(game['players']) if p['sid'] == sid), None)
-    if player_index != game['guesser_index']:
+    player = game.get_player(sid)
+    if player is None or player is not game.guesser:
         error_msg = {'message': 'You are not the guesser'}
         log_socket_event(logger, "SENT", "error", error_msg)
         emit('error', error_msg)
@@ -369,77 +888,249 @@ def on_make_guess(data):
         emit('error', error_msg)
         return
 
-    # Store the guess with player info and timestamp
-    game['guesses'].append({
-        'guess': guess,
-        'player': game['players'][player_index]['name'],
-        'color': game['players'][player_index]['color'],
-        'timestamp': datetime.now().isoformat()
-    })
-
-    # Only check if the guess matches the subject
-    correct = guess == game['subject'].lower()
+    # Store the guess; a correct one finishes the game, a wrong one costs points
+    guess_data, correct = game.add_guess(player, guess)
     logger.info(f"Guess in game {game_code}: {guess} (correct: {correct})")
     
     if correct:
-        game['state'] = 'finished'
-        
         # Create final sentence with words only
-        final_sentence = ' '.join(word_data['word'] for word_data in game['current_sentence'])
+        final_sentence = ' '.join(word_data['word'] for word_data in game.sentence)
         
         # Send game ended event
         response_data = {
-            'winner': game['players'][player_index]['name'],
-            'subject': game['subject'],
+            'seq': game.next_seq(),
+            'winner': player.name,
+            'subject': game.subject,
             'sentence': final_sentence,
-            'score': game['score'],  # Send final score
-            'guesses': game['guesses']
+            'score': game.score,  # Send final score
+            'guesses': game.guesses
         }
         log_socket_event(logger, "SENT", "game_ended", response_data)
         emit('game_ended', response_data, room=game_code)
+        if game.spectators:
+            emit('game_ended', response_data, room=spectator_room(game_code))
         
-        logger.info(f"Game {game_code} ended. Winner: {game['players'][player_index]['name']}")
+        logger.info(f"Game {game_code} ended. Winner: {player.name}")
+        metrics.GAMES_FINISHED.inc()
+        if history:
+            history.record(game, 'solved', winner=player.name)
         
-        # Clean up the game
-        for player in game['players']:
-            leave_room(game_code, player['sid'])
-            if player['sid'] in players:
-                del players[player['sid']]
-            if player['sid'] in connected_users:
-                connected_users.discard(player['sid'])
+        # Clean up the game; closing the room also reaches players
+        # connected to other server processes
+        close_game_rooms(game_code)
+        for p in game.players:
+            store.unbind(p.sid)
         
         # Remove the game
-        if game_code in games:
-            del games[game_code]
+        delete_game(game_code)
     else:
-        # Apply penalty for incorrect guess
-        game['score'] -= 2
-        
-        # Prepare player info
-        player_info = [{
-            'name': p['name'],
-            'color': p['color'],
-            'isGuesser': game['players'].index(p) == game['guesser_index'],
-            'isHost': p['is_host']
-        } for p in game['players']]
-        
+        # How close the guess came; kept with the guess so snapshots have it too
+        closeness = embedding_table.closeness(game.subject, guess) if embedding_table else None
+        if closeness:
+            guess_data['similarity'] = round(closeness[0], 3)
+            guess_data['rank'] = closeness[1]
+
+        # Only the new guess is sent; clients append it to their guess history
         response_data = {
+            'seq': game.next_seq(),
             'correct': False,
-            'guesser': game['players'][player_index]['name'],
+            'guesser': player.name,
             'guess': guess,
-            'color': game['players'][player_index]['color'],
-            'guesses': game['guesses'],
-            'players': player_info,
-            'score': game['score']  # Include updated shared score
+            'color': player.color,
+            'timestamp': guess_data['timestamp'],
+            'similarity': guess_data.get('similarity'),
+            'rank': guess_data.get('rank'),
+            'score': game.score  # Include updated shared score
         }
-        log_socket_event(logger, "SENT", "guess_result", response_data)
-        emit('guess_result', response_data, room=game_code)
+        notify_spectators(game)
+        store.save(game)
+        emit_hot(game, 'guess_result', response_data)
+
+@socketio.on('request_snapshot')
+@metrics.instrument('request_snapshot')
+@profiling.profiled('request_snapshot')
+@in_game_actor()
+def on_request_snapshot(data):
+    sid = request.sid
+    log_socket_event(logger, "RECEIVED", "request_snapshot", data)
+
+    game_code = store.game_code_for(sid)
+    game = store.get(game_code) if game_code else None
+    if not game:
+        error_msg = {'message': 'Game not found'}
+        log_socket_event(logger, "SENT", "error", error_msg)
+        emit('error', error_msg)
+        return
+
+    response_data = game.snapshot_for(sid)
+    log_socket_event(logger, "SENT", "game_snapshot", response_data)
+    emit('game_snapshot', response_data)
+
+@socketio.on('resume_session')
+@metrics.instrument('resume_session')
+@profiling.profiled('resume_session')
+@in_game_actor(lambda data: str(data.get('token', '')).rpartition('.')[0])
+def on_resume_session(data):
+    sid = request.sid
+    game_code, _, token = str(data.get('token', '')).rpartition('.')
+    log_socket_event(logger, "RECEIVED", "resume_session", {'gameCode': game_code, 'lastSeq': data.get('lastSeq')})
+
+    if store.game_code_for(sid) or session.get('watching'):
+        error_msg = {'message': 'You are already in a game'}
+        log_socket_event(logger, "SENT", "error", error_msg)
+        emit('error', error_msg)
+        return
+
+    game = store.get(game_code) if game_code else None
+    player = game.by_token.get(token) if game else None
+    if player is None:
+        error_msg = {'message': 'Session expired'}
+        log_socket_event(logger, "SENT", "error", error_msg)
+        emit('error', error_msg)
+        return
+
+    if player.disconnected_at is None:
+        # The old connection hasn't been noticed as dropped yet; this one takes over
+        store.unbind(player.sid)
+        leave_game_rooms(game_code, player.sid)
+    game.resume(player, sid)
+    store.bind(sid, game_code)
+    join_game_rooms(game_code)
+    store.save(game)
+    logger.info(f"{player.name} resumed game {game_code}")
+
+    response_data = {'gameCode': game_code, 'playerName': player.name, 'state': game.state}
+    log_socket_event(logger, "SENT", "session_resumed", response_data)
+    emit('session_resumed', response_data)
+
+    # Replay just the missed events if we still have them all, otherwise
+    # send the whole state
+    last_seq = data.get('lastSeq')
+    missed = event_log.since(game_code, last_seq, game.seq) if isinstance(last_seq, int) and last_seq > 0 else None
+    if missed is None:
+        response_data = game.snapshot_for(sid)
+        log_socket_event(logger, "SENT", "game_snapshot", response_data)
+        emit('game_snapshot', response_data)
+    else:
+        binary = session.get('encoding') == 'msgpack'
+        for event, response_data in missed:
+            log_socket_event(logger, "SENT", event, response_data)
+            emit(event, wire.encode(event, response_data) if binary and event in wire.SCHEMAS else response_data)
+
+@socketio.on('watch_game')
+@metrics.instrument('watch_game')
+@profiling.profiled('watch_game')
+@in_game_actor(lambda data: game_codes.normalize(data.get('gameCode')))
+def on_watch_game(data):
+    sid = request.sid
+    log_socket_event(logger, "RECEIVED", "watch_game", data)
+
+    if store.game_code_for(sid) or session.get('watching'):
+        error_msg = {'message': 'You are already in a game'}
+        log_socket_event(logger, "SENT", "error", error_msg)
+        emit('error', error_msg)
+        return
+
+    game_code = game_codes.normalize(data.get('gameCode'))
+    game = store.get(game_code)
+    if not game:
+        error_msg = {'message': 'Game not found'}
+        log_socket_event(logger, "SENT", "error", error_msg)
+        emit('error', error_msg)
+        return
+
+    # Spectators join only their own room, so they never get the players'
+    # events or the subject; what they see comes from spectator updates
+    game.spectators += 1
+    store.save(game)
+    session['watching'] = game_code
+    join_room(spectator_room(game_code))
+
+    response_data = game.spectator_snapshot()
+    log_socket_event(logger, "SENT", "spectator_snapshot", response_data)
+    emit('spectator_snapshot', response_data)
+
+@socketio.on('stop_watching')
+@metrics.instrument('stop_watching')
+@profiling.profiled('stop_watching')
+@in_game_actor(lambda data=None: session.get('watching'))
+def on_stop_watching(data=None):
+    log_socket_event(logger, "RECEIVED", "stop_watching", data)
+    stop_watching(request.sid)
+
+@socketio.on('quick_join')
+@metrics.instrument('quick_join')
+@profiling.profiled('quick_join')
+@in_game_actor(pick_open_game)
+def on_quick_join(data):
+    sid = request.sid
+    log_socket_event(logger, "RECEIVED", "quick_join", data)
+
+    if store.game_code_for(sid) or session.get('watching'):
+        error_msg = {'message': 'You are already in a game'}
+        log_socket_event(logger, "SENT", "error", error_msg)
+        emit('error', error_msg)
+        return
+
+    if draining:
+        error_msg = {'message': 'Server is restarting, try again in a moment'}
+        log_socket_event(logger, "SENT", "error", error_msg)
+        emit('error', error_msg)
+        return
+
+    player_name = data.get('playerName')
+    game = store.get(g.open_game) if g.open_game else None
+    if game and game.open_slots():
+        seat_player(game, player_name)
+        # Anyone already waiting comes along
+        offer_seats(game, store.dequeue_players(game.open_slots()))
+        return
+
+    # Nothing open: start a game if pick_open_game found enough players
+    # waiting, counting this one, otherwise wait for a public game or for
+    # more players
+    if g.new_game_code and create_matched_game(player_name, g.new_game_code):
+        return
+    session['queued'] = True
+    waiting = store.enqueue_player((sid, player_name, session.get('encoding', 'json')))
+    response_data = {'playersWaiting': waiting}
+    log_socket_event(logger, "SENT", "queued", response_data)
+    emit('queued', response_data)
+
+@socketio.on('leave_queue')
+@metrics.instrument('leave_queue')
+@profiling.profiled('leave_queue')
+@in_game_actor()
+def on_leave_queue(data=None):
+    log_socket_event(logger, "RECEIVED", "leave_queue", data)
+    leave_queue()
+
+@socketio.on('subscribe_lobby')
+@metrics.instrument('subscribe_lobby')
+@profiling.profiled('subscribe_lobby')
+@in_game_actor()
+def on_subscribe_lobby(data=None):
+    log_socket_event(logger, "RECEIVED", "subscribe_lobby", data)
+    join_room(LOBBY_ROOM)
+    # Only the best few; lobby_update keeps the client's copy current
+    games = [store.get(code) for code in store.open_games(LOBBY_LISTING_LIMIT)]
+    response_data = {
+        'games': [game.lobby_entry() for game in games if game],
+        'openGames': store.open_game_count(),
+        'playersWaiting': store.queued_count()
+    }
+    log_socket_event(logger, "SENT", "lobby_snapshot", response_data)
+    emit('lobby_snapshot', response_data)
 
-def generate_game_code() -> str:
-    """Generate a unique 4-digit game code."""
-    timestamp = datetime.now().strftime('%f')  # microseconds
-    return f"{int(timestamp) % 10000:04d}"  # Take last 4 digits and pad with zeros
+@socketio.on('unsubscribe_lobby')
+@metrics.instrument('unsubscribe_lobby')
+@profiling.profiled('unsubscribe_lobby')
+@in_game_actor()
+def on_unsubscribe_lobby(data=None):
+    log_socket_event(logger, "RECEIVED", "unsubscribe_lobby", data)
+    leave_room(LOBBY_ROOM)
 
 if __name__ == '__main__':
+    # Development server with the debugger and reloader; use serve.py in production
     logger.info("Starting server...")
     socketio.run(app, debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
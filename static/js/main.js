@@ -1,5 +1,6 @@
-// Initialize Socket.IO connection
-const socket = io();
+// Initialize Socket.IO connection; ask for the compact encoding of frequent
+// events when the MessagePack decoder has loaded
+const socket = io(window.MessagePack ? { auth: { encoding: 'msgpack' } } : {});
 
 // Game state
 let isHost = false;
@@ -8,6 +9,19 @@ let currentGameCode = null;
 let isInGame = false;  // Track if user is in a game
 let playerName = '';   // Store the player's name
 let currentTurnName = ''; // Store whose turn it is
+let currentSubject = null; // Secret subject (null for the guesser)
+let gamePlayers = [];  // Player list for the current game
+let lastSeq = 0;       // Sequence number of the last applied game event
+let snapshotPending = false;  // Whether a snapshot request is in flight
+let resumeToken = sessionStorage.getItem('resumeToken');  // Lets us take our seat back after a dropped connection
+let gameScore = 0;     // Current team score
+let lobbyPlayers = []; // Player list while waiting for the game to start
+let sentenceWords = [];  // Words in the sentence so far, in order
+let guessHistory = [];   // Guesses made so far, in order
+let isSpectator = false;  // Watching a game rather than playing in it
+let spectatedState = '';  // State of the game being watched
+let lobbyGames = new Map();  // Open public games by code, while the join page is shown
+let isQueued = false;    // Waiting for a quick join to find a game
 
 // DOM Elements
 const pages = {
@@ -39,12 +53,19 @@ document.getElementById('create-game-btn').addEventListener('click', () => {
 document.getElementById('join-game-btn').addEventListener('click', () => {
     if (!isInGame) {
         showPage('joinGame');
+        socket.emit('subscribe_lobby', {});
     }
 });
 
 document.querySelectorAll('.back-btn').forEach(btn => {
     btn.addEventListener('click', () => {
         if (!isInGame) {
+            leaveLobby();
+            if (isQueued) {
+                socket.emit('leave_queue', {});
+                isQueued = false;
+                resetGameState();
+            }
             showPage('landing');
         }
     });
@@ -55,7 +76,7 @@ document.getElementById('host-form').addEventListener('submit', (e) => {
     e.preventDefault();
     if (!isInGame) {
         playerName = document.getElementById('host-name').value;
-        socket.emit('create_game', { playerName });
+        socket.emit('create_game', { playerName, public: document.getElementById('public-game').checked });
         isHost = true;
         
         // Disable form
@@ -88,6 +109,40 @@ document.getElementById('join-form').addEventListener('submit', (e) => {
     }
 });
 
+document.getElementById('watch-btn').addEventListener('click', () => {
+    const gameCode = document.getElementById('game-code').value;
+    if (!isInGame && !isSpectator && gameCode) {
+        socket.emit('watch_game', { gameCode });
+
+        // Show status
+        const statusDiv = document.getElementById('join-status');
+        statusDiv.textContent = `Connecting to game ${gameCode}...`;
+        statusDiv.style.display = 'block';
+    }
+});
+
+document.getElementById('quick-join-btn').addEventListener('click', () => {
+    playerName = document.getElementById('player-name').value;
+    if (!isInGame && !isQueued && playerName) {
+        socket.emit('quick_join', { playerName });
+
+        // Disable form
+        document.getElementById('game-code').disabled = true;
+        document.getElementById('player-name').disabled = true;
+        document.getElementById('join-submit-btn').disabled = true;
+
+        // Show status
+        const statusDiv = document.getElementById('join-status');
+        statusDiv.textContent = `Finding a game for ${playerName}...`;
+        statusDiv.style.display = 'block';
+    }
+});
+
+document.getElementById('stop-watching-btn').addEventListener('click', () => {
+    resetGameState();
+    showPage('landing');
+});
+
 // Game Controls
 document.getElementById('start-game-btn').addEventListener('click', () => {
     if (isHost) {
@@ -159,7 +214,33 @@ document.getElementById('new-game-btn').addEventListener('click', () => {
 });
 
 // Socket Event Handlers
+socket.on('connect', () => {
+    // Socket.IO reconnects on its own; take our seat back if we had one
+    if (resumeToken) {
+        socket.emit('resume_session', { token: resumeToken, lastSeq });
+    } else if (isSpectator) {
+        // The snapshot only adds what we missed
+        socket.emit('watch_game', { gameCode: currentGameCode });
+    }
+});
+
+socket.on('resume_token', (data) => {
+    resumeToken = data.token;
+    sessionStorage.setItem('resumeToken', resumeToken);
+});
+
+socket.on('session_resumed', (data) => {
+    // The missed events or a snapshot follow
+    playerName = data.playerName;
+    currentGameCode = data.gameCode;
+    isInGame = true;
+    document.getElementById('displayed-game-code').textContent = data.gameCode;
+    showPage(data.state === 'playing' ? 'gameRoom' : 'waitingRoom');
+    updateTurnStatus();
+});
+
 socket.on('game_created', (data) => {
+    lastSeq = data.seq;
     currentGameCode = data.gameCode;
     document.getElementById('displayed-game-code').textContent = data.gameCode;
     isInGame = true;
@@ -178,7 +259,35 @@ socket.on('game_created', (data) => {
     showPage('waitingRoom');
 });
 
+socket.on('queued', (data) => {
+    isQueued = true;
+    setText(document.getElementById('join-status'),
+            `No open games yet, waiting for more players (${data.playersWaiting} waiting)...`);
+});
+
+socket.on('game_found', (data) => {
+    // A seat came up while we were queued; take it like any quick join
+    if (isQueued && !isInGame) {
+        socket.emit('quick_join', { playerName, gameCode: data.gameCode });
+    }
+});
+
+socket.on('matched', (data) => {
+    // We have a seat; the name may have been numbered to keep it unique.
+    // player_joined follows with the rest
+    isQueued = false;
+    playerName = data.playerName;
+    currentGameCode = data.gameCode;
+    isInGame = true;
+    leaveLobby();
+});
+
 socket.on('player_joined', (data) => {
+    // player_joined carries the full roster, so it resets our sequence
+    lastSeq = data.seq;
+    // A game formed from the matchmaking queue is hosted by whoever waited longest
+    isHost = data.players.some(player => player.name === playerName && player.isHost);
+
     // Update player list with colors
     updatePlayerList(data.players);
     isInGame = true;
@@ -201,190 +310,226 @@ socket.on('player_joined', (data) => {
 });
 
 socket.on('player_left', (data) => {
-    const playersList = document.getElementById('players-list');
-    playersList.innerHTML = '';
-    data.players.forEach(player => {
-        const li = document.createElement('li');
-        li.textContent = player;
-        playersList.appendChild(li);
-    });
+    if (!acceptSeq(data.seq)) return;
+
+    // Keep the in-game player list in sync as well; the turn moves on if
+    // it belonged to the player who left
+    gamePlayers = gamePlayers.filter(player => data.players.includes(player.name));
+    if (data.currentTurn && data.currentTurn !== currentTurnName) {
+        currentTurnName = data.currentTurn;
+        updateTurnStatus();
+    }
+    updateGamePlayersList(gamePlayers, currentTurnName, gameScore);
+    updatePlayerList(lobbyPlayers.filter(player => data.players.includes(player.name)));
 });
 
-function updateGamePlayersList(players, currentTurn, score) {
-    const playersList = document.getElementById('game-players-list');
-    playersList.innerHTML = '';
-    
-    players.forEach(player => {
-        const li = document.createElement('li');
-        if (player.name === currentTurn) {
-            li.classList.add('current-turn');
-        }
-        
-        const playerBubble = document.createElement('span');
-        playerBubble.className = 'player-bubble';
-        playerBubble.style.backgroundColor = player.color;
-        playerBubble.textContent = player.name;
-        
-        const roleSpan = document.createElement('span');
-        roleSpan.className = 'player-role';
-        roleSpan.textContent = player.isGuesser ? 'Guesser' : 'Word Builder';
-        
-        li.appendChild(playerBubble);
-        li.appendChild(roleSpan);
-        
-        // Add "You" indicator if this is the current player
-        if (player.name === playerName) {
-            const youSpan = document.createElement('span');
-            youSpan.className = 'player-indicator';
-            youSpan.textContent = '(You)';
-            li.appendChild(youSpan);
-        }
-        
-        // Add host indicator
-        if (player.isHost) {
-            const hostSpan = document.createElement('span');
-            hostSpan.className = 'host-indicator';
-            hostSpan.textContent = '(Host)';
-            li.appendChild(hostSpan);
-        }
-        
-        playersList.appendChild(li);
+// The lobby: a snapshot of the best open games, then only what changed
+socket.on('lobby_snapshot', (data) => {
+    lobbyGames = new Map(data.games.map(game => [game.gameCode, game]));
+    renderLobby();
+});
+
+socket.on('lobby_update', (data) => {
+    if (!pages.joinGame.classList.contains('active')) return;
+    data.removed.forEach(code => lobbyGames.delete(code));
+    data.games.forEach(game => lobbyGames.set(game.gameCode, game));
+    renderLobby();
+});
+
+function leaveLobby() {
+    if (pages.joinGame.classList.contains('active')) {
+        socket.emit('unsubscribe_lobby', {});
+    }
+    lobbyGames = new Map();
+}
+
+function renderLobby() {
+    // Nearly full games first, as quick join picks them
+    const games = Array.from(lobbyGames.values())
+        .sort((a, b) => a.openSlots - b.openSlots)
+        .slice(0, 20);
+    queueWrite('open-games', () => {
+        setText(document.getElementById('open-games-count'), `(${lobbyGames.size})`);
+        syncKeyedList(document.getElementById('open-games-list'), games, game => game.gameCode,
+                      createOpenGameNode, updateOpenGameNode);
+    });
+}
+
+function createOpenGameNode(game) {
+    const li = document.createElement('li');
+    li.className = 'open-game';
+    li.addEventListener('click', () => {
+        document.getElementById('game-code').value = game.gameCode;
     });
+    return li;
+}
+
+function updateOpenGameNode(li, game) {
+    setText(li, `${game.gameCode}: ${game.host}'s game, ${game.players} playing, ` +
+                `${game.openSlots} seat${game.openSlots === 1 ? '' : 's'} free`);
+}
 
-    // Update score display
-    const scoreValue = document.querySelector('#score-display .score-value');
-    scoreValue.textContent = score || 0;
+function updateGamePlayersList(players, currentTurn, score) {
+    gameScore = score || 0;
+    queueWrite('game-players', () => {
+        // Badges are kept per player and only changed where they differ
+        syncKeyedList(document.getElementById('game-players-list'), players, player => player.name,
+                      createGamePlayerNode, (li, player) => updateGamePlayerNode(li, player, currentTurn));
+        setText(document.querySelector('#score-display .score-value'), gameScore);
+    });
 }
 
 socket.on('game_started', (data) => {
+    lastSeq = data.seq;
     isGuesser = data.isGuesser;
+    currentSubject = data.subject;
+    gamePlayers = data.players;
     showPage('gameRoom');
-    
-    // Update player role display
-    const roleText = isGuesser ? 'Guesser' : 'Word Builder';
-    document.getElementById('player-role').textContent = roleText;
+    showRole();
     
     // Set initial turn
     currentTurnName = data.currentTurn;
-    
-    const wordInputSection = document.getElementById('word-input-section');
-    const guessSection = document.getElementById('guess-section');
-    
-    if (isGuesser) {
-        wordInputSection.style.display = 'none';
-        guessSection.style.display = 'flex';
-        document.getElementById('turn-status').textContent = 'Wait for others to build the sentence';
-    } else {
-        wordInputSection.style.display = 'flex';
-        guessSection.style.display = 'none';
-        
-        let statusMessage = '';
-        if (data.subject) {
-            statusMessage = `The subject is: "${data.subject}"`;
-        }
-        
-        // Add turn information to the status message
-        if (currentTurnName === playerName) {
-            statusMessage += statusMessage ? '\n' : '';
-            statusMessage += 'It\'s your turn to add a word!';
-        } else {
-            statusMessage += statusMessage ? '\n' : '';
-            statusMessage += `Waiting for ${currentTurnName} to add a word...`;
-        }
-        
-        const turnStatus = document.getElementById('turn-status');
-        turnStatus.style.whiteSpace = 'pre-line';  // Preserve newlines
-        turnStatus.textContent = statusMessage;
-    }
+
+    // A new game starts with an empty sentence and guess history
+    sentenceWords = [];
+    guessHistory = [];
+    renderSentence();
+    renderGuesses();
+
+    updateTurnStatus();
     
     // Update players list with roles
-    updateGamePlayersList(data.players, currentTurnName, data.score);
+    updateGamePlayersList(gamePlayers, currentTurnName, data.score);
 });
 
+// Compact events are arrays of values in a fixed order (see SOCKET_API.md);
+// what the roster already says is filled back in here
+function playerColor(name) {
+    const player = gamePlayers.find(p => p.name === name);
+    return player ? player.color : undefined;
+}
+
+function decodeSentenceUpdated(packed) {
+    const [seq, word, player, currentTurn, score] = MessagePack.decode(new Uint8Array(packed));
+    return { seq, word: { word, player, color: playerColor(player) }, currentTurn, score };
+}
+
+function decodeGuessResult(packed) {
+    const [seq, guess, timestamp, score, similarity, rank] = MessagePack.decode(new Uint8Array(packed));
+    const guesser = gamePlayers.find(p => p.isGuesser);
+    return {
+        seq, correct: false, guess, timestamp, score, similarity, rank,
+        guesser: guesser ? guesser.name : undefined,
+        color: guesser ? guesser.color : undefined
+    };
+}
+
 socket.on('sentence_updated', (data) => {
-    // Update sentence with colored word bubbles
-    const sentenceContainer = document.getElementById('current-sentence');
-    sentenceContainer.innerHTML = '';
-    
-    data.sentence.forEach((wordData, index) => {
-        const wordSpan = document.createElement('span');
-        wordSpan.textContent = wordData.word;
-        wordSpan.className = 'word-bubble';
-        wordSpan.style.backgroundColor = wordData.color;
-        wordSpan.title = `Added by ${wordData.player}`;
-        
-        // Add space between words
-        if (index > 0) {
-            sentenceContainer.appendChild(document.createTextNode(' '));
-        }
-        
-        sentenceContainer.appendChild(wordSpan);
-    });
+    if (data instanceof ArrayBuffer) data = decodeSentenceUpdated(data);
+    if (!acceptSeq(data.seq)) return;
+
+    // Only the new word is sent, so append it to the sentence
+    sentenceWords.push(data.word);
+    renderSentence();
     
     currentTurnName = data.currentTurn;
-    
-    // Update turn status while preserving subject
-    const turnStatus = document.getElementById('turn-status');
-    turnStatus.style.whiteSpace = 'pre-line';  // Ensure newlines are preserved
-    
-    let statusMessage = '';
-    if (data.subject) {
-        statusMessage = `The subject is: "${data.subject}"`;
-    }
-    
-    // Add turn information
-    if (currentTurnName === playerName) {
-        if (isGuesser) {
-            statusMessage = 'It\'s your turn to guess!';
-        } else {
-            statusMessage += statusMessage ? '\n' : '';
-            statusMessage += 'It\'s your turn to add a word!';
-        }
-    } else {
-        if (isGuesser) {
-            statusMessage = 'Wait for others to build the sentence';
-        } else {
-            statusMessage += statusMessage ? '\n' : '';
-            statusMessage += `Waiting for ${currentTurnName} to add a word...`;
-        }
-    }
-    
-    turnStatus.textContent = statusMessage;
+    updateTurnStatus();
     
     // Update players list and score
-    updateGamePlayersList(data.players, currentTurnName, data.score);
+    updateGamePlayersList(gamePlayers, currentTurnName, data.score);
+});
+
+socket.on('turn_passed', (data) => {
+    if (!acceptSeq(data.seq)) return;
+
+    // The player whose turn it was ran out of time
+    currentTurnName = data.currentTurn;
+    updateTurnStatus();
+    updateGamePlayersList(gamePlayers, currentTurnName, gameScore);
 });
 
 socket.on('guess_result', (data) => {
-    // Update guess history
-    const guessList = document.getElementById('guess-list');
-    guessList.innerHTML = ''; // Clear existing guesses
-    
-    data.guesses.forEach(guessData => {
-        const guessDiv = document.createElement('div');
-        guessDiv.className = 'guess-entry';
-        
-        const guessBubble = document.createElement('span');
-        guessBubble.className = 'guess-bubble';
-        guessBubble.style.backgroundColor = guessData.color;
-        guessBubble.textContent = guessData.guess;
-        
-        const guessTime = document.createElement('span');
-        guessTime.className = 'guess-time';
-        const timestamp = new Date(guessData.timestamp);
-        guessTime.textContent = timestamp.toLocaleTimeString();
-        
-        guessDiv.appendChild(guessBubble);
-        guessDiv.appendChild(guessTime);
-        guessList.appendChild(guessDiv);
+    if (data instanceof ArrayBuffer) data = decodeGuessResult(data);
+    if (!acceptSeq(data.seq)) return;
+
+    // Only the new guess is sent, so append it to the guess history
+    guessHistory.push({
+        guess: data.guess,
+        color: data.color,
+        timestamp: data.timestamp,
+        similarity: data.similarity,
+        rank: data.rank
     });
+    renderGuesses();
 
     // Update player list and score
-    if (data.players) {
-        updateGamePlayersList(data.players, currentTurnName, data.score);
+    updateGamePlayersList(gamePlayers, currentTurnName, data.score);
+});
+
+socket.on('game_snapshot', (data) => {
+    snapshotPending = false;
+    if (data.seq < lastSeq) return;
+    lastSeq = data.seq;
+
+    isGuesser = data.isGuesser;
+    currentSubject = data.subject;
+    gamePlayers = data.players;
+    currentTurnName = data.currentTurn || '';
+
+    isHost = gamePlayers.some(player => player.name === playerName && player.isHost);
+
+    if (data.state !== 'playing') {
+        updatePlayerList(gamePlayers);
+        document.getElementById('host-controls').style.display = isHost ? 'block' : 'none';
+        return;
     }
+    showRole();
+
+    // The sentence and guesses only grow during a game, so we only need
+    // what the snapshot has beyond what we already show
+    sentenceWords.push(...data.sentence.slice(sentenceWords.length));
+    guessHistory.push(...data.guesses.slice(guessHistory.length));
+    renderSentence();
+    renderGuesses();
+
+    updateTurnStatus();
+    updateGamePlayersList(gamePlayers, currentTurnName, data.score);
 });
 
+// Spectators get a snapshot when they start watching, then at most one
+// update every so often with everything that changed since the last
+socket.on('spectator_snapshot', (data) => {
+    isSpectator = true;
+    currentGameCode = data.gameCode;
+    document.getElementById('join-status').style.display = 'none';
+    document.getElementById('player-role').textContent = `Spectator (game ${data.gameCode})`;
+    document.getElementById('word-input-section').style.display = 'none';
+    document.getElementById('guess-section').style.display = 'none';
+    document.getElementById('stop-watching-btn').style.display = 'block';
+    leaveLobby();
+    showPage('gameRoom');
+    applySpectatorView(data);
+});
+
+socket.on('spectator_update', (data) => {
+    if (isSpectator) applySpectatorView(data);
+});
+
+function applySpectatorView(data) {
+    // The sentence and guesses are sent from where the last update left
+    // off, which may be before what we already have
+    sentenceWords.push(...data.sentence.slice(sentenceWords.length - data.sentenceFrom));
+    guessHistory.push(...data.guesses.slice(guessHistory.length - data.guessesFrom));
+    renderSentence();
+    renderGuesses();
+
+    spectatedState = data.state;
+    gamePlayers = data.players;
+    currentTurnName = data.currentTurn || '';
+    updateTurnStatus();
+    updateGamePlayersList(gamePlayers, currentTurnName, data.score);
+}
+
 socket.on('game_ended', (data) => {
     showPage('gameOver');
     
@@ -397,25 +542,8 @@ socket.on('game_ended', (data) => {
     document.querySelector('#final-score .score-value').textContent = data.score;
     
     // Update final guess history
-    const finalGuessList = document.getElementById('final-guess-list');
-    finalGuessList.innerHTML = '';
-    data.guesses.forEach(guessData => {
-        const guessDiv = document.createElement('div');
-        guessDiv.className = 'guess-entry';
-        
-        const guessBubble = document.createElement('span');
-        guessBubble.className = 'guess-bubble';
-        guessBubble.style.backgroundColor = guessData.color;
-        guessBubble.textContent = guessData.guess;
-        
-        const guessTime = document.createElement('span');
-        guessTime.className = 'guess-time';
-        const timestamp = new Date(guessData.timestamp);
-        guessTime.textContent = timestamp.toLocaleTimeString();
-        
-        guessDiv.appendChild(guessBubble);
-        guessDiv.appendChild(guessTime);
-        finalGuessList.appendChild(guessDiv);
+    queueWrite('final-guesses', () => {
+        syncAppendOnly(document.getElementById('final-guess-list'), data.guesses, createGuessNode);
     });
     
     // Reset game state
@@ -425,9 +553,39 @@ socket.on('game_ended', (data) => {
     currentGameCode = null;
     playerName = '';
     currentTurnName = '';
+    currentSubject = null;
+    gamePlayers = [];
+    sentenceWords = [];
+    guessHistory = [];
+    lastSeq = 0;
+    forgetResumeToken();
+    stopWatching();
+});
+
+socket.on('game_expired', (data) => {
+    alert(data.reason === 'abandoned' ? 'Everyone has left the game.'
+                                      : 'The game was closed after too long without any activity.');
+    resetGameState();
+    showPage('landing');
 });
 
 socket.on('error', (data) => {
+    if (data.message === 'Session expired') {
+        // Our seat was given up while we were away
+        forgetResumeToken();
+        if (isInGame) {
+            alert('You were away too long and have been removed from the game.');
+            resetGameState();
+            showPage('landing');
+        }
+        return;
+    }
+    if (data.suggestions && data.suggestions.length) {
+        // A rejected word: offer the closest valid one, ready to send
+        alert(`${data.message}. Did you mean: ${data.suggestions.join(', ')}?`);
+        document.getElementById('word-input').value = data.suggestions[0];
+        return;
+    }
     alert(data.message);
     
     // Re-enable forms if there was an error
@@ -447,7 +605,12 @@ socket.on('error', (data) => {
 
 // Handle disconnection
 socket.on('disconnect', () => {
-    if (isInGame) {
+    if ((isInGame && resumeToken) || isSpectator) {
+        // Our seat is held for a while; the connect handler resumes
+        queueWrite('turn-status', () => {
+            document.getElementById('turn-status').textContent = 'Connection lost, reconnecting...';
+        });
+    } else if (isInGame) {
         alert('You have been disconnected from the game.');
         resetGameState();
         showPage('landing');
@@ -455,6 +618,269 @@ socket.on('disconnect', () => {
 });
 
 // Utility Functions
+
+// Returns true if the event with this sequence number should be applied.
+// Stale events are dropped; a gap means an event was missed, so a full
+// snapshot is requested instead.
+function acceptSeq(seq) {
+    if (seq <= lastSeq) {
+        return false;
+    }
+    if (seq !== lastSeq + 1) {
+        requestSnapshot();
+        return false;
+    }
+    lastSeq = seq;
+    return true;
+}
+
+function requestSnapshot() {
+    if (!snapshotPending) {
+        snapshotPending = true;
+        socket.emit('request_snapshot', {});
+    }
+}
+
+function forgetResumeToken() {
+    resumeToken = null;
+    sessionStorage.removeItem('resumeToken');
+}
+
+function stopWatching() {
+    if (isSpectator) {
+        socket.emit('stop_watching', {});
+        isSpectator = false;
+        spectatedState = '';
+        document.getElementById('stop-watching-btn').style.display = 'none';
+    }
+}
+
+function showRole() {
+    document.getElementById('player-role').textContent = isGuesser ? 'Guesser' : 'Word Builder';
+    document.getElementById('word-input-section').style.display = isGuesser ? 'none' : 'flex';
+    document.getElementById('guess-section').style.display = isGuesser ? 'flex' : 'none';
+}
+
+// Rendering. DOM writes are queued and applied together on the next
+// animation frame; a write queued under a key that is already pending
+// replaces it, so a burst of events updates each part of the page once.
+const pendingWrites = new Map();
+let frameRequested = false;
+
+function queueWrite(key, write) {
+    pendingWrites.set(key, write);
+    if (!frameRequested) {
+        frameRequested = true;
+        requestAnimationFrame(flushWrites);
+    }
+}
+
+function flushWrites() {
+    frameRequested = false;
+    const writes = Array.from(pendingWrites.values());
+    pendingWrites.clear();
+    writes.forEach(write => write());
+}
+
+function setText(element, text) {
+    // Only touch the DOM when the text actually changes
+    text = String(text);
+    if (element.textContent !== text) {
+        element.textContent = text;
+    }
+}
+
+// Make a container show `items`, one node per key: nodes for keys that
+// are gone are removed, new ones created, and the rest updated in place
+// and moved only if they are out of order.
+function syncKeyedList(container, items, keyOf, createNode, updateNode) {
+    const nodes = container.keyedNodes || (container.keyedNodes = new Map());
+    const keys = new Set(items.map(keyOf));
+    nodes.forEach((node, key) => {
+        if (!keys.has(key)) {
+            node.remove();
+            nodes.delete(key);
+        }
+    });
+    items.forEach((item, i) => {
+        const key = keyOf(item);
+        let node = nodes.get(key);
+        if (!node) {
+            node = createNode(item);
+            nodes.set(key, node);
+        }
+        updateNode(node, item);
+        if (container.children[i] !== node) {
+            container.insertBefore(node, container.children[i] || null);
+        }
+    });
+}
+
+// Make a container show a list that only ever grows: just the items it
+// hasn't shown yet are appended. A different array (a new game) starts
+// the container over.
+function syncAppendOnly(container, items, createNode) {
+    if (container.renderedItems !== items) {
+        container.textContent = '';
+        container.renderedItems = items;
+        container.renderedCount = 0;
+    }
+    if (container.renderedCount === items.length) return;
+    const fragment = document.createDocumentFragment();
+    for (let i = container.renderedCount; i < items.length; i++) {
+        fragment.appendChild(createNode(items[i], i));
+    }
+    container.appendChild(fragment);
+    container.renderedCount = items.length;
+}
+
+function renderSentence() {
+    queueWrite('sentence', () => {
+        syncAppendOnly(document.getElementById('current-sentence'), sentenceWords, createWordNode);
+    });
+}
+
+function renderGuesses() {
+    queueWrite('guesses', () => {
+        syncAppendOnly(document.getElementById('guess-list'), guessHistory, createGuessNode);
+    });
+}
+
+function createWordNode(wordData, index) {
+    const fragment = document.createDocumentFragment();
+    const wordSpan = document.createElement('span');
+    wordSpan.textContent = wordData.word;
+    wordSpan.className = 'word-bubble';
+    wordSpan.style.backgroundColor = wordData.color;
+    wordSpan.title = `Added by ${wordData.player}`;
+    
+    // Add space between words
+    if (index > 0) {
+        fragment.appendChild(document.createTextNode(' '));
+    }
+    
+    fragment.appendChild(wordSpan);
+    return fragment;
+}
+
+function createGuessNode(guessData) {
+    const guessDiv = document.createElement('div');
+    guessDiv.className = 'guess-entry';
+    
+    const guessBubble = document.createElement('span');
+    guessBubble.className = 'guess-bubble';
+    guessBubble.style.backgroundColor = guessData.color;
+    guessBubble.textContent = guessData.guess;
+    
+    const guessTime = document.createElement('span');
+    guessTime.className = 'guess-time';
+    const timestamp = new Date(guessData.timestamp);
+    guessTime.textContent = timestamp.toLocaleTimeString();
+    
+    guessDiv.appendChild(guessBubble);
+    if (guessData.rank != null) {
+        // How close the guess came: 1 is the closest word in the dictionary
+        const closeness = document.createElement('span');
+        closeness.className = 'guess-closeness';
+        closeness.textContent = `#${guessData.rank}`;
+        closeness.title = `Similarity ${guessData.similarity}`;
+        guessDiv.appendChild(closeness);
+    }
+    guessDiv.appendChild(guessTime);
+    return guessDiv;
+}
+
+function createGamePlayerNode() {
+    const li = document.createElement('li');
+    const playerBubble = document.createElement('span');
+    playerBubble.className = 'player-bubble';
+    const roleSpan = document.createElement('span');
+    roleSpan.className = 'player-role';
+    const youSpan = document.createElement('span');
+    youSpan.className = 'player-indicator';
+    youSpan.textContent = '(You)';
+    const hostSpan = document.createElement('span');
+    hostSpan.className = 'host-indicator';
+    hostSpan.textContent = '(Host)';
+    li.append(playerBubble, roleSpan, youSpan, hostSpan);
+    return li;
+}
+
+function updateGamePlayerNode(li, player, currentTurn) {
+    const [playerBubble, roleSpan, youSpan, hostSpan] = li.children;
+    li.classList.toggle('current-turn', player.name === currentTurn);
+    if (li.dataset.color !== player.color) {
+        li.dataset.color = player.color;
+        playerBubble.style.backgroundColor = player.color;
+    }
+    setText(playerBubble, player.name);
+    setText(roleSpan, player.isGuesser ? 'Guesser' : 'Word Builder');
+    // "You" and "Host" indicators
+    if (youSpan.hidden !== (player.name !== playerName)) {
+        youSpan.hidden = player.name !== playerName;
+    }
+    if (hostSpan.hidden !== !player.isHost) {
+        hostSpan.hidden = !player.isHost;
+    }
+}
+
+function createLobbyPlayerNode() {
+    const li = document.createElement('li');
+    const playerBubble = document.createElement('span');
+    playerBubble.className = 'player-bubble';
+    li.appendChild(playerBubble);
+    return li;
+}
+
+function updateLobbyPlayerNode(li, player) {
+    const playerBubble = li.firstChild;
+    if (li.dataset.color !== player.color) {
+        li.dataset.color = player.color;
+        playerBubble.style.backgroundColor = player.color;
+    }
+    setText(playerBubble, player.name + (player.isHost ? ' (Host)' : ''));
+}
+
+function updateTurnStatus() {
+    queueWrite('turn-status', renderTurnStatus);
+}
+
+function renderTurnStatus() {
+    // Update turn status while preserving subject
+    const turnStatus = document.getElementById('turn-status');
+    turnStatus.style.whiteSpace = 'pre-line';  // Ensure newlines are preserved
+    
+    if (isSpectator) {
+        setText(turnStatus, spectatedState === 'playing' ? `${currentTurnName} is adding a word...`
+                                                         : 'Waiting for the game to start...');
+        return;
+    }
+
+    let statusMessage = '';
+    if (currentSubject) {
+        statusMessage = `The subject is: "${currentSubject}"`;
+    }
+    
+    // Add turn information
+    if (currentTurnName === playerName) {
+        if (isGuesser) {
+            statusMessage = 'It\'s your turn to guess!';
+        } else {
+            statusMessage += statusMessage ? '\n' : '';
+            statusMessage += 'It\'s your turn to add a word!';
+        }
+    } else {
+        if (isGuesser) {
+            statusMessage = 'Wait for others to build the sentence';
+        } else {
+            statusMessage += statusMessage ? '\n' : '';
+            statusMessage += `Waiting for ${currentTurnName} to add a word...`;
+        }
+    }
+    
+    setText(turnStatus, statusMessage);
+}
+
 function resetGameState() {
     isHost = false;
     isGuesser = false;
@@ -462,6 +888,16 @@ function resetGameState() {
     currentGameCode = null;
     playerName = '';
     currentTurnName = '';
+    currentSubject = null;
+    gamePlayers = [];
+    lobbyPlayers = [];
+    sentenceWords = [];
+    guessHistory = [];
+    gameScore = 0;
+    lastSeq = 0;
+    snapshotPending = false;
+    forgetResumeToken();
+    stopWatching();
     
     // Reset and enable all form inputs
     const inputs = ['host-name', 'game-code', 'player-name', 'subject-input', 'word-input', 'guess-input'];
@@ -498,16 +934,10 @@ function resetGameState() {
 
 // Helper function to update player list with colored bubbles
 function updatePlayerList(players) {
-    const playersList = document.getElementById('players-list');
-    playersList.innerHTML = '';
-    players.forEach(player => {
-        const li = document.createElement('li');
-        const playerBubble = document.createElement('span');
-        playerBubble.className = 'player-bubble';
-        playerBubble.style.backgroundColor = player.color;
-        playerBubble.textContent = player.name + (player.isHost ? ' (Host)' : '');
-        li.appendChild(playerBubble);
-        playersList.appendChild(li);
+    lobbyPlayers = players;
+    queueWrite('lobby-players', () => {
+        syncKeyedList(document.getElementById('players-list'), players, player => player.name,
+                      createLobbyPlayerNode, updateLobbyPlayerNode);
     });
 }
 
@@ -601,6 +1031,22 @@ style.textContent = `
         font-size: 0.8em;
         color: #666;
     }
+
+    .guess-closeness {
+        font-size: 0.8em;
+        font-weight: bold;
+        color: #444;
+    }
+
+    #open-games-list {
+        list-style: none;
+        padding: 0;
+    }
+
+    .open-game {
+        cursor: pointer;
+        padding: 4px 0;
+    }
     
     .score-text {
         text-align: center;
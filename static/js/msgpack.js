@@ -0,0 +1,73 @@
+// Minimal MessagePack decoder for the compact game events (see wire.py).
+// It covers every type msgpack.packb writes for them, so the page doesn't
+// need a third-party script; exposes window.MessagePack.decode like the
+// @msgpack/msgpack bundle did.
+(function () {
+    const utf8 = new TextDecoder();
+
+    function decode(bytes) {
+        const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+        let pos = 0;
+
+        function take(length) {
+            const slice = bytes.subarray(pos, pos + length);
+            pos += length;
+            return slice;
+        }
+
+        function array(length) {
+            const items = [];
+            for (let i = 0; i < length; i++) items.push(next());
+            return items;
+        }
+
+        function map(length) {
+            const result = {};
+            for (let i = 0; i < length; i++) {
+                const key = next();
+                result[key] = next();
+            }
+            return result;
+        }
+
+        function next() {
+            const type = view.getUint8(pos++);
+            let value;
+            if (type <= 0x7f) return type;
+            if (type >= 0xe0) return type - 0x100;
+            if (type >= 0xa0 && type <= 0xbf) return utf8.decode(take(type & 0x1f));
+            if (type >= 0x90 && type <= 0x9f) return array(type & 0x0f);
+            if (type >= 0x80 && type <= 0x8f) return map(type & 0x0f);
+            switch (type) {
+                case 0xc0: return null;
+                case 0xc2: return false;
+                case 0xc3: return true;
+                case 0xc4: value = view.getUint8(pos); pos += 1; return take(value);
+                case 0xc5: value = view.getUint16(pos); pos += 2; return take(value);
+                case 0xc6: value = view.getUint32(pos); pos += 4; return take(value);
+                case 0xca: value = view.getFloat32(pos); pos += 4; return value;
+                case 0xcb: value = view.getFloat64(pos); pos += 8; return value;
+                case 0xcc: value = view.getUint8(pos); pos += 1; return value;
+                case 0xcd: value = view.getUint16(pos); pos += 2; return value;
+                case 0xce: value = view.getUint32(pos); pos += 4; return value;
+                case 0xcf: value = Number(view.getBigUint64(pos)); pos += 8; return value;
+                case 0xd0: value = view.getInt8(pos); pos += 1; return value;
+                case 0xd1: value = view.getInt16(pos); pos += 2; return value;
+                case 0xd2: value = view.getInt32(pos); pos += 4; return value;
+                case 0xd3: value = Number(view.getBigInt64(pos)); pos += 8; return value;
+                case 0xd9: value = view.getUint8(pos); pos += 1; return utf8.decode(take(value));
+                case 0xda: value = view.getUint16(pos); pos += 2; return utf8.decode(take(value));
+                case 0xdb: value = view.getUint32(pos); pos += 4; return utf8.decode(take(value));
+                case 0xdc: value = view.getUint16(pos); pos += 2; return array(value);
+                case 0xdd: value = view.getUint32(pos); pos += 4; return array(value);
+                case 0xde: value = view.getUint16(pos); pos += 2; return map(value);
+                case 0xdf: value = view.getUint32(pos); pos += 4; return map(value);
+            }
+            throw new Error(`Unsupported MessagePack type 0x${type.toString(16)}`);
+        }
+
+        return next();
+    }
+
+    window.MessagePack = { decode };
+})();
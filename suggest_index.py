@@ -0,0 +1,214 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from typing import Iterator, List, Set
+
+try:
+    import wordfreq
+except ImportError:  # Frequency ranking is optional; `pip install wordfreq` to enable it
+    wordfreq = None
+
+from word_index import INDEX_PATH as WORD_INDEX_PATH, WordIndex
+
+SUGGEST_INDEX_PATH = 'data/suggest.idx'
+
+# Corrections up to this many edits (insertions, deletions, substitutions or
+# swaps of neighbouring letters) are found. Only the first PREFIX_LENGTH
+# letters of each word are indexed, which keeps the index small; the rest
+# of the word is still compared when candidates are checked
+MAX_DISTANCE = 2
+PREFIX_LENGTH = 7
+
+# Header: magic, version, byte-order mark, max distance, prefix length,
+# entry count, and the fingerprint and word count of the word index the
+# entries point into. After the entries comes one byte per word: ten times
+# its Zipf frequency (0 for unknown words, about 77 for "the")
+MAGIC = b'PCSI'
+VERSION = 2
+BYTE_ORDER_MARK = 0x01020304
+HEADER = struct.Struct('=4s7I')
+
+
+def deletes(word: str, max_distance: int) -> Set[str]:
+    """The word and every string left by deleting up to max_distance letters"""
+    result = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - result
+        result |= frontier
+    return result
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Optimal string alignment distance, or max_distance + 1 if it's more"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    # Candidates mostly share a prefix and suffix with the word, and those
+    # letters never change the distance
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return max(len(a), len(b))
+
+    # Only cells within max_distance of the diagonal can stay in range
+    too_far = max_distance + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [too_far] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        row_min = current[0]
+        letter = a[i - 1]
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            # Written out rather than with min(), which doubles the cost
+            distance = previous[j - 1] + (letter != b[j - 1])
+            if previous[j] + 1 < distance:
+                distance = previous[j] + 1
+            if current[j - 1] + 1 < distance:
+                distance = current[j - 1] + 1
+            if (i > 1 and j > 1 and letter == b[j - 2] and a[i - 2] == b[j - 1]
+                    and previous2[j - 2] + 1 < distance):
+                distance = previous2[j - 2] + 1
+            current[j] = distance
+            if distance < row_min:
+                row_min = distance
+        if row_min > max_distance:
+            return too_far
+        previous2, previous = previous, current
+    return min(previous[-1], too_far)
+
+
+class SuggestIndex:
+    """Read-only SymSpell deletion index over a compiled word index.
+
+    For every word, the strings left by deleting up to ``max_distance``
+    letters from its prefix are hashed and stored, sorted, next to the
+    word's position in the word index. A misspelling within
+    ``max_distance`` edits of a word shares at least one of those strings
+    with it, so finding candidates is a few binary searches over the
+    memory-mapped file; only the candidates are then compared letter by
+    letter, and the closest are ranked by how common they are.
+    """
+
+    def __init__(self, words: WordIndex, path: str = SUGGEST_INDEX_PATH):
+        self.words = words
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, bom, self.max_distance, self.prefix_length, count,
+         fingerprint, word_count) = HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != VERSION or bom != BYTE_ORDER_MARK:
+            raise ValueError(f"{path} is not a compatible suggestion index")
+        if fingerprint != words.fingerprint() or word_count != len(words):
+            raise ValueError(f"{path} was built from a different word index")
+
+        view = memoryview(self._mm)
+        self._hashes = view[HEADER.size:HEADER.size + count * 4].cast('I')
+        self._positions = view[HEADER.size + count * 4:HEADER.size + count * 8].cast('I')
+        self._frequencies = view[HEADER.size + count * 8:HEADER.size + count * 8 + word_count]
+
+    def candidates(self, word: str, max_distance: int) -> Iterator[int]:
+        """Positions of words that may be within max_distance edits of ``word``"""
+        hashes, positions = self._hashes, self._positions
+        for d in deletes(word[:self.prefix_length], max_distance):
+            key = zlib.crc32(d.encode('ascii'))
+            i = bisect_left(hashes, key)
+            while i < len(hashes) and hashes[i] == key:
+                yield positions[i]
+                i += 1
+
+    def suggest(self, word: str, limit: int = 3) -> List[str]:
+        """Up to ``limit`` valid words closest to ``word``, closest first"""
+        word = word.lower()
+        if not word.isascii() or not word.isalpha():
+            return []
+        matches = {}
+        # Short words have hundreds of words two edits away, so only look
+        # that far if there aren't enough one edit away
+        for max_distance in range(1, self.max_distance + 1):
+            for position in set(self.candidates(word, max_distance)) - matches.keys():
+                candidate = self.words.word(position)
+                distance = edit_distance(word, candidate, max_distance)
+                if 0 < distance <= max_distance:
+                    # Fewest edits first, then the most common word
+                    matches[position] = (distance, -self._frequencies[position], candidate)
+            if len(matches) >= limit:
+                break
+        return [match[-1] for match in sorted(matches.values())[:limit]]
+
+
+def build_index(words: WordIndex, output_path: str = SUGGEST_INDEX_PATH,
+                max_distance: int = MAX_DISTANCE, prefix_length: int = PREFIX_LENGTH) -> None:
+    """Compile the deletion index for a word index"""
+    if wordfreq is None:
+        print("wordfreq is not installed, suggestions won't be ranked by frequency", file=sys.stderr)
+    entries = set()
+    for position in range(len(words)):
+        for d in deletes(words.word(position)[:prefix_length], max_distance):
+            entries.add(zlib.crc32(d.encode('ascii')) << 32 | position)
+    entries = sorted(entries)
+    hashes = array('I', (entry >> 32 for entry in entries))
+    positions = array('I', (entry & 0xFFFFFFFF for entry in entries))
+    frequencies = bytes(min(255, round(wordfreq.zipf_frequency(words.word(position), 'en') * 10))
+                        if wordfreq else 0 for position in range(len(words)))
+
+    header = HEADER.pack(MAGIC, VERSION, BYTE_ORDER_MARK, max_distance, prefix_length,
+                         len(entries), words.fingerprint(), len(words))
+    # Write to a temporary file and swap it in, so concurrent readers never
+    # see a partial index
+    tmp_path = f'{output_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(hashes.tobytes())
+        f.write(positions.tobytes())
+        f.write(frequencies)
+    os.replace(tmp_path, output_path)
+
+
+def load_or_build(words: WordIndex, path: str = SUGGEST_INDEX_PATH, logger=None) -> SuggestIndex:
+    """Open the index, compiling it first if it is missing or was built from
+    another word index"""
+    try:
+        return SuggestIndex(words, path)
+    except (OSError, ValueError) as e:
+        if logger:
+            logger.info(f"Building suggestion index ({e})")
+    start = time.perf_counter()
+    build_index(words, path)
+    if logger:
+        logger.info(f"Built suggestion index {path} in {time.perf_counter() - start:.1f}s")
+    return SuggestIndex(words, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile the "did you mean" index for the word index')
+    parser.add_argument('--words', default=WORD_INDEX_PATH,
+                        help=f'Compiled word index (default: {WORD_INDEX_PATH})')
+    parser.add_argument('-o', '--output', default=SUGGEST_INDEX_PATH,
+                        help=f'Output index (default: {SUGGEST_INDEX_PATH})')
+    parser.add_argument('--max-distance', type=int, default=MAX_DISTANCE,
+                        help=f'Largest number of edits to correct (default: {MAX_DISTANCE})')
+    parser.add_argument('--prefix-length', type=int, default=PREFIX_LENGTH,
+                        help=f'Letters of each word to index (default: {PREFIX_LENGTH})')
+    args = parser.parse_args()
+
+    words = WordIndex(args.words)
+    start = time.perf_counter()
+    build_index(words, args.output, args.max_distance, args.prefix_length)
+    print(f"Wrote {args.output}: {(os.path.getsize(args.output) - HEADER.size - len(words)) // 8} entries, "
+          f"{os.path.getsize(args.output)} bytes in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, List, Tuple
+
+from logging_utils import setup_logger
+
+logger = setup_logger('timers', 'timers.log')
+
+
+class TimerScheduler:
+    """Runs callbacks at their deadlines from one background task.
+
+    Timers sit in a heap ordered by deadline, so scheduling is O(log n) and
+    a tick with nothing due is O(1) however many timers are pending. There
+    is no cancel: callbacks re-check the state they were scheduled for and
+    return early if it has moved on, which keeps each game to a fixed number
+    of pending timers instead of one per event.
+    """
+
+    def __init__(self, resolution: float = 0.25):
+        self.resolution = resolution  # Seconds between ticks
+        self._heap: List[Tuple[float, int, Callable, tuple]] = []
+        self._counter = itertools.count()  # Tie-breaker so callbacks are never compared
+        self._lock = threading.Lock()
+
+    def call_at(self, when: float, callback: Callable, *args) -> None:
+        """Run ``callback(*args)`` at ``when`` (a time.time() timestamp)"""
+        with self._lock:
+            heapq.heappush(self._heap, (when, next(self._counter), callback, args))
+
+    def call_later(self, delay: float, callback: Callable, *args) -> None:
+        self.call_at(time.time() + delay, callback, *args)
+
+    def run_due(self, now: float = None) -> int:
+        """Run every timer whose deadline has passed; returns how many ran"""
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap))
+        for _, _, callback, args in due:
+            try:
+                callback(*args)
+            except Exception:
+                logger.exception(f"Timer callback {callback.__name__}{args} failed")
+        return len(due)
+
+    def run_forever(self, sleep: Callable[[float], None] = time.sleep) -> None:
+        """Tick until the process exits; pass socketio.sleep under eventlet or gevent"""
+        while True:
+            self.run_due()
+            sleep(self.resolution)
+
+    def __len__(self) -> int:
+        return len(self._heap)
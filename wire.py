@@ -0,0 +1,46 @@
+"""Compact MessagePack encoding of the most frequent game events.
+
+Clients that ask for it on connect (``auth={'encoding': 'msgpack'}``) get
+``sentence_updated`` and ``guess_result`` as a MessagePack array sent as a
+binary attachment rather than a JSON object. The array holds only the
+values, in a fixed order, and leaves out what the client already knows
+from the roster (player colours, who the guesser is). Every other event,
+and every client that doesn't ask, stays on JSON.
+"""
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+try:
+    import msgpack
+except ImportError:  # Binary encoding is optional; `pip install msgpack` to offer it
+    msgpack = None
+
+ENCODINGS = ('json', 'msgpack')
+
+
+def negotiate(requested: Optional[str]) -> str:
+    """The encoding to use for a client that asked for ``requested``"""
+    return 'msgpack' if requested == 'msgpack' and msgpack else 'json'
+
+
+def _sentence_updated(data: dict) -> List:
+    # [seq, word, player, currentTurn, score]; the colour is the player's
+    word = data['word']
+    return [data['seq'], word['word'], word['player'], data['currentTurn'], data['score']]
+
+
+def _guess_result(data: dict) -> List:
+    # [seq, guess, timestamp (ms since the epoch), score, similarity, rank];
+    # only wrong guesses by the guesser are sent, so those are left out
+    timestamp = int(datetime.fromisoformat(data['timestamp']).timestamp() * 1000)
+    return [data['seq'], data['guess'], timestamp, data['score'], data['similarity'], data['rank']]
+
+
+SCHEMAS: Dict[str, Callable[[dict], List]] = {
+    'sentence_updated': _sentence_updated,
+    'guess_result': _guess_result,
+}
+
+
+def encode(event: str, data: dict) -> bytes:
+    return msgpack.packb(SCHEMAS[event](data), use_single_float=True)
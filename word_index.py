@@ -0,0 +1,171 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import zlib
+from array import array
+from typing import Iterator, List
+
+WORDLIST_PATH = 'data/wordlist.txt'
+TARGETS_PATH = 'data/targets.txt'
+INDEX_PATH = 'data/words.idx'
+
+# Header: magic, version, byte-order mark, word count, target count, and the
+# file positions of the word offsets, word blob, target offsets and target blob
+MAGIC = b'PCWI'
+VERSION = 1
+BYTE_ORDER_MARK = 0x01020304
+HEADER = struct.Struct('=4s8I')
+
+
+class WordIndex:
+    """Read-only view of a compiled word index.
+
+    Words are stored sorted in a single blob with an offset table, so a
+    lookup is a binary search over the memory-mapped file. Nothing is
+    loaded per word, and every process that maps the same file shares its
+    pages.
+    """
+
+    def __init__(self, path: str = INDEX_PATH):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, bom, self._word_count, self._target_count,
+         word_offsets_pos, word_blob_pos, target_offsets_pos,
+         target_blob_pos) = HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != VERSION or bom != BYTE_ORDER_MARK:
+            raise ValueError(f"{path} is not a compatible word index")
+
+        view = memoryview(self._mm)
+        self._word_offsets = view[word_offsets_pos:word_blob_pos].cast('I')
+        self._word_blob = word_blob_pos
+        self._target_offsets = view[target_offsets_pos:target_blob_pos].cast('I')
+        self._target_blob = target_blob_pos
+
+    def __len__(self) -> int:
+        return self._word_count
+
+    def fingerprint(self) -> int:
+        """Checksum of the whole file, for indexes built on top of this one"""
+        return zlib.crc32(self._mm)
+
+    def __contains__(self, word: str) -> bool:
+        return self.find(word) >= 0
+
+    def word(self, i: int) -> str:
+        """The i-th word in sorted order"""
+        start = self._word_blob + self._word_offsets[i]
+        end = self._word_blob + self._word_offsets[i + 1]
+        return self._mm[start:end].decode('ascii')
+
+    def find(self, word: str) -> int:
+        """Position of a word in sorted order, or -1 if it isn't present"""
+        try:
+            key = word.lower().encode('ascii')
+        except UnicodeEncodeError:
+            return -1
+        mm, offsets, base = self._mm, self._word_offsets, self._word_blob
+        lo, hi = 0, self._word_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probe = mm[base + offsets[mid]:base + offsets[mid + 1]]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    @property
+    def target_count(self) -> int:
+        return self._target_count
+
+    def target(self, i: int) -> str:
+        """The i-th target, in the order of the targets file"""
+        start = self._target_blob + self._target_offsets[i]
+        end = self._target_blob + self._target_offsets[i + 1]
+        return self._mm[start:end].decode('utf-8')
+
+    def random_target(self, rng: random.Random = random) -> str:
+        return self.target(rng.randrange(self._target_count))
+
+    def targets(self) -> Iterator[str]:
+        return (self.target(i) for i in range(self._target_count))
+
+
+def _read_lines(path: str) -> List[str]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _pack(items: List[bytes]) -> bytes:
+    """Offset table (len(items) + 1 entries) followed by the joined items"""
+    offsets = array('I', [0])
+    for item in items:
+        offsets.append(offsets[-1] + len(item))
+    return offsets.tobytes() + b''.join(items)
+
+
+def build_index(wordlist_path: str = WORDLIST_PATH, targets_path: str = TARGETS_PATH,
+                output_path: str = INDEX_PATH) -> None:
+    """Compile the word list and targets into a binary index"""
+    words = sorted({line.lower().encode('ascii') for line in _read_lines(wordlist_path)})
+    targets = [line.encode('utf-8') for line in _read_lines(targets_path)]
+
+    word_offsets_pos = HEADER.size
+    word_blob_pos = word_offsets_pos + (len(words) + 1) * 4
+    word_section = _pack(words)
+    # Keep the target offset table 4-byte aligned
+    target_offsets_pos = word_offsets_pos + len(word_section)
+    padding = -target_offsets_pos % 4
+    target_offsets_pos += padding
+    target_blob_pos = target_offsets_pos + (len(targets) + 1) * 4
+
+    header = HEADER.pack(MAGIC, VERSION, BYTE_ORDER_MARK, len(words), len(targets),
+                         word_offsets_pos, word_blob_pos, target_offsets_pos, target_blob_pos)
+
+    # Write to a temporary file and swap it in, so concurrent readers never
+    # see a partial index
+    tmp_path = f'{output_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(word_section)
+        f.write(b'\0' * padding)
+        f.write(_pack(targets))
+    os.replace(tmp_path, output_path)
+
+
+def is_stale(output_path: str = INDEX_PATH, *sources: str) -> bool:
+    """Whether the index is missing or older than any of its sources"""
+    if not os.path.exists(output_path):
+        return True
+    built = os.path.getmtime(output_path)
+    return any(os.path.getmtime(source) > built for source in sources)
+
+
+def load_or_build(index_path: str = INDEX_PATH, wordlist_path: str = WORDLIST_PATH,
+                  targets_path: str = TARGETS_PATH) -> WordIndex:
+    """Open the index, compiling it first if it is missing or out of date"""
+    if is_stale(index_path, wordlist_path, targets_path):
+        build_index(wordlist_path, targets_path, index_path)
+    return WordIndex(index_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile the word list and targets into a binary index')
+    parser.add_argument('--wordlist', default=WORDLIST_PATH, help=f'Word list (default: {WORDLIST_PATH})')
+    parser.add_argument('--targets', default=TARGETS_PATH, help=f'Targets file (default: {TARGETS_PATH})')
+    parser.add_argument('-o', '--output', default=INDEX_PATH, help=f'Output index (default: {INDEX_PATH})')
+    args = parser.parse_args()
+
+    build_index(args.wordlist, args.targets, args.output)
+    index = WordIndex(args.output)
+    print(f"Wrote {args.output}: {len(index)} words, {index.target_count} targets, "
+          f"{os.path.getsize(args.output)} bytes", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()